@@ -0,0 +1,94 @@
+"""
+Cache court des identités authentifiées : une clé de jeton DRF ou de
+session admin est associée à l'utilisateur résolu, sans requête tant que
+l'entrée est valide.
+
+Deux niveaux : un LRU par processus, puis le cache 'auth' (Redis) partagé
+par les workers lorsqu'il est configuré. Les entrées sont retirées
+explicitement à la déconnexion, à la désactivation et au changement de mot
+de passe ; la durée de vie borne le reste (modifications hors signaux).
+"""
+import hashlib
+import pickle
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from driving_schools.tenancy import LRUCache
+
+AUTH_CACHE_ALIAS = 'auth'
+# Entrées conservées par processus
+AUTH_CACHE_SIZE = 4096
+
+TOKEN = 'token'
+ADMIN_SESSION = 'admin_session'
+
+
+def _shared_cache():
+    if AUTH_CACHE_ALIAS in settings.CACHES:
+        return caches[AUTH_CACHE_ALIAS]
+    return None
+
+
+# Avec Redis, le LRU local n'est pas invalidé par les autres workers : durée courte
+_local = LRUCache(
+    AUTH_CACHE_SIZE,
+    settings.AUTH_CACHE_LOCAL_TTL if AUTH_CACHE_ALIAS in settings.CACHES else settings.AUTH_CACHE_TTL
+)
+
+
+def _cache_key(kind, key):
+    # Empreinte plutôt que le secret lui-même dans Redis
+    return f'auth:{kind}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def remember(kind, key, user, expires_at=None):
+    """
+    Mémorise l'utilisateur résolu pour `key`. L'utilisateur est sérialisé :
+    chaque requête reçoit sa propre instance, sans état laissé par une autre.
+    """
+    entry = (pickle.dumps(user, pickle.HIGHEST_PROTOCOL), expires_at)
+    cache_key = _cache_key(kind, key)
+    _local.set(cache_key, entry)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(cache_key, entry, timeout=settings.AUTH_CACHE_TTL)
+
+
+def recall(kind, key):
+    """(utilisateur, expiration) mémorisés pour `key`, ou None"""
+    cache_key = _cache_key(kind, key)
+    entry = _local.get(cache_key)
+    if entry is None:
+        shared = _shared_cache()
+        entry = shared.get(cache_key) if shared is not None else None
+        if entry is None:
+            return None
+        _local.set(cache_key, entry)
+    pickled_user, expires_at = entry
+    return pickle.loads(pickled_user), expires_at
+
+
+def forget(kind, keys):
+    cache_keys = [_cache_key(kind, key) for key in keys]
+    for cache_key in cache_keys:
+        _local.delete(cache_key)
+    shared = _shared_cache()
+    if shared is not None and cache_keys:
+        shared.delete_many(cache_keys)
+
+
+def forget_on_commit(kind, keys):
+    """
+    Retire les entrées tout de suite, puis après la validation : une requête
+    concurrente a pu mémoriser l'ancien état avant le commit.
+    """
+    keys = list(keys)
+    forget(kind, keys)
+    transaction.on_commit(lambda: forget(kind, keys))
+
+
+def clear_local():
+    # Le cache Redis est partagé avec les statistiques : pas de flush global
+    _local.clear()
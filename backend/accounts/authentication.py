@@ -0,0 +1,35 @@
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .auth_cache import TOKEN, recall, remember
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication servie depuis le cache d'authentification : aucune
+    requête tant que le jeton y figure (voir accounts.auth_cache).
+    """
+
+    def authenticate_credentials(self, key):
+        cached = recall(TOKEN, key)
+        if cached is not None:
+            user, _expires_at = cached
+            # Jeton reconstruit sans requête, pour request.auth
+            return user, Token(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        remember(TOKEN, key, user)
+        return user, token
+
+
+def get_token_user(key):
+    """Utilisateur actif du jeton `key`, ou None (WebSockets)"""
+    cached = recall(TOKEN, key)
+    if cached is not None:
+        return cached[0]
+
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    remember(TOKEN, key, token.user)
+    return token.user
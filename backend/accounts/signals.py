@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .auth_cache import TOKEN, forget_on_commit
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=Token)
+def forget_token_on_change(sender, instance, **kwargs):
+    """Jeton supprimé à la déconnexion ou régénéré au changement de mot de passe"""
+    forget_on_commit(TOKEN, [instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_tokens_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    """Désactivation, nouveau mot de passe ou profil modifié : l'utilisateur mémorisé est périmé"""
+    # La connexion (last_login) ne change rien pour l'authentification
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    forget_on_commit(TOKEN, Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
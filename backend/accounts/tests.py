@@ -1,3 +1,57 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from .auth_cache import clear_local
+from .authentication import CachedTokenAuthentication, get_token_user
+from .models import User
+
+
+class TokenAuthCacheTests(TestCase):
+    """Jetons DRF résolus depuis le cache d'authentification"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='candidat', password='ancien-pass', user_type='student')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_cached_token_costs_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+        # Une instance par requête
+        self.assertIsNot(self.authenticate()[0], user)
+
+    def test_logout_invalidates_token(self):
+        self.authenticate()
+        self.assertEqual(self.client.post(reverse('accounts:logout')).status_code, 200)
+        self.assertIsNone(get_token_user(self.token.key))
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 401)
+
+    def test_password_change_and_deactivation_invalidate_token(self):
+        response = self.client.post(reverse('accounts:change_password'), {
+            'old_password': 'ancien-pass', 'new_password': 'nouveau-pass',
+            'new_password_confirm': 'nouveau-pass',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 401)
@@ -0,0 +1,31 @@
+from django.utils import timezone
+
+from accounts.auth_cache import ADMIN_SESSION, recall, remember
+from .models import AdminSession
+
+ADMIN_USER_TYPES = ('admin', 'administrateur')
+
+
+def get_session_admin(session_key):
+    """
+    Administrateur actif de la session admin active `session_key`, ou None. Servi
+    depuis le cache d'authentification : aucune requête pour une session
+    déjà résolue (l'expiration est vérifiée à chaque appel).
+    """
+    cached = recall(ADMIN_SESSION, session_key)
+    if cached is None:
+        session = AdminSession.objects.select_related('admin_user').filter(
+            session_key=session_key,
+            is_active=True,
+            expires_at__gt=timezone.now(),
+            admin_user__is_active=True
+        ).first()
+        if session is None:
+            return None
+        remember(ADMIN_SESSION, session_key, session.admin_user, session.expires_at)
+        cached = session.admin_user, session.expires_at
+
+    admin_user, expires_at = cached
+    if expires_at <= timezone.now():
+        return None
+    return admin_user
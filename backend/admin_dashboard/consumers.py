@@ -1,13 +1,18 @@
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
-from .models import AdminSession
+from permini_project.instrumentation import InstrumentedConsumerMixin
+from .authentication import get_session_admin
 
-class AdminNotificationConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+
+class AdminNotificationConsumer(InstrumentedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         """Connexion WebSocket pour les notifications admin"""
-        print("🔗 Tentative de connexion WebSocket admin notifications")
+        logger.debug("Tentative de connexion WebSocket admin notifications")
         
         # Accepter la connexion immédiatement
         await self.accept()
@@ -18,7 +23,7 @@ class AdminNotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        print("✅ WebSocket admin notifications connecté et ajouté au groupe")
+        logger.debug("WebSocket admin notifications connecté et ajouté au groupe")
         
         # Envoyer un message de confirmation
         await self.send(text_data=json.dumps({
@@ -28,7 +33,7 @@ class AdminNotificationConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Déconnexion WebSocket"""
-        print(f"🔌 Déconnexion WebSocket admin notifications: {close_code}")
+        logger.debug("Déconnexion WebSocket admin notifications: %s", close_code)
         
         # Retirer du groupe des notifications admin
         await self.channel_layer.group_discard(
@@ -50,7 +55,7 @@ class AdminNotificationConsumer(AsyncWebsocketConsumer):
                 }))
                 
         except Exception as e:
-            print(f"❌ Erreur dans receive admin notifications: {e}")
+            logger.exception("Erreur dans receive admin notifications: %s", e)
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Erreur serveur'
@@ -59,7 +64,7 @@ class AdminNotificationConsumer(AsyncWebsocketConsumer):
     async def admin_notification(self, event):
         """Envoyer une notification admin au client"""
         try:
-            print(f"📨 Envoi notification admin via WebSocket: {event['notification']['title']}")
+            logger.debug("Envoi notification admin via WebSocket: %s", event['notification']['title'])
             
             # Envoyer la notification au client
             await self.send(text_data=json.dumps({
@@ -68,17 +73,9 @@ class AdminNotificationConsumer(AsyncWebsocketConsumer):
             }))
             
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi de la notification admin: {e}")
+            logger.exception("Erreur lors de l'envoi de la notification admin: %s", e)
 
     @database_sync_to_async
     def verify_admin_session(self, session_key):
         """Vérifier si la session admin est valide"""
-        try:
-            session = AdminSession.objects.get(
-                session_key=session_key,
-                is_active=True,
-                expires_at__gt=timezone.now()
-            )
-            return session.admin_user
-        except AdminSession.DoesNotExist:
-            return None
+        return get_session_admin(session_key)
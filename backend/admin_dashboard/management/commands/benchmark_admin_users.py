@@ -0,0 +1,75 @@
+import time as timer
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from admin_dashboard.models import AdminSession
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Mesure la latence de la liste des utilisateurs du dashboard admin, filtres '
+            'compris (données synthétiques annulées à la fin)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000,
+                            help='Utilisateurs synthétiques créés')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requêtes mesurées')
+
+    def handle(self, *args, **options):
+        # Le client de test s'annonce comme 'testserver'
+        with override_settings(ALLOWED_HOSTS=['*']), transaction.atomic():
+            session_key = self._build_users(options['users'])
+            queries, latencies = self._run(session_key, options['requests'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{len(latencies)} requêtes : {queries} requêtes SQL par appel, '
+            f'latence moyenne {sum(latencies) / len(latencies):.2f} ms, '
+            f'médiane {percentile(latencies, 0.5):.2f} ms, p95 {percentile(latencies, 0.95):.2f} ms'
+        )
+
+    def _build_users(self, count):
+        admin = User.objects.create_user(username='benchmark_admin', user_type='admin')
+        User.objects.bulk_create([
+            User(username=f'benchmark_{index}', email=f'benchmark{index}@example.com',
+                 password='!', user_type='student' if index % 2 else 'instructor',
+                 is_active=index % 5 != 0)
+            for index in range(count)
+        ])
+        session_key = str(uuid.uuid4())
+        AdminSession.objects.create(
+            admin_user=admin, session_key=session_key, ip_address='127.0.0.1',
+            user_agent='benchmark', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        return session_key
+
+    def _run(self, session_key, count):
+        client = Client(HTTP_AUTHORIZATION=f'AdminSession {session_key}')
+        url = reverse('admin_users')
+        params = {'user_type': 'student', 'is_active': 'true', 'search': 'benchmark'}
+
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url, params)
+        assert response.status_code == 200, response.content
+        # Avant les requêtes suivantes, qui vident le journal des requêtes
+        queries = len(captured.captured_queries)
+
+        latencies = []
+        for _index in range(count):
+            started = timer.perf_counter()
+            client.get(url, params)
+            latencies.append((timer.perf_counter() - started) * 1000)
+        return queries, latencies
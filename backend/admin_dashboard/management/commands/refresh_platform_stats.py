@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_dashboard.platform_stats import refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le snapshot des statistiques globales affichées par le dashboard admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Recalcule en continu toutes les N secondes (0 : une seule fois)')
+
+    def handle(self, *args, **options):
+        while True:
+            snapshot = refresh_snapshot()
+            self.stdout.write(self.style.SUCCESS(
+                f'Statistiques recalculées le {snapshot.computed_at:%d/%m/%Y %H:%M:%S}'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
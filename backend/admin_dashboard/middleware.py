@@ -1,7 +1,6 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
-from .models import AdminSession
-from accounts.models import User
+from .authentication import get_session_admin
 
 
 class AdminAuthenticationMiddleware(MiddlewareMixin):
@@ -17,28 +16,14 @@ class AdminAuthenticationMiddleware(MiddlewareMixin):
             if auth_header.startswith('AdminSession '):
                 session_key = auth_header.replace('AdminSession ', '')
                 
-                try:
-                    # Récupérer la session admin
-                    admin_session = AdminSession.objects.select_related('admin_user__user').get(
-                        session_key=session_key,
-                        is_active=True
-                    )
-                    
-                    # Vérifier si la session n'a pas expiré
-                    from django.utils import timezone
-                    if admin_session.expires_at > timezone.now():
-                        # Attacher la session admin à la requête
-                        request.admin_session = admin_session
-                        # Attacher l'utilisateur admin à la requête
-                        request.user = admin_session.admin_user.user
-                        return None
-                    else:
-                        # Session expirée
-                        admin_session.is_active = False
-                        admin_session.save()
-                        
-                except AdminSession.DoesNotExist:
-                    pass
+                # Session admin résolue via le cache d'authentification,
+                # sans nouvelle requête dans AdminPermission
+                admin_user = get_session_admin(session_key)
+                if admin_user is not None:
+                    # Attacher l'utilisateur admin à la requête
+                    request.admin_user = admin_user
+                    request.user = admin_user
+                    return None
             
             # Si pas d'authentification valide pour une route admin
             return JsonResponse({
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0005_adminnotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Statistiques plateforme',
+                'verbose_name_plural': 'Statistiques plateforme',
+                'db_table': 'admin_platform_stats',
+            },
+        ),
+    ]
@@ -462,3 +462,20 @@ class AdminNotification(models.Model):
             'urgent': 'text-red-500',
         }
         return colors.get(self.priority, 'text-blue-500')
+
+
+class PlatformStatsSnapshot(models.Model):
+    """
+    Dernières statistiques globales de la plateforme, recalculées par la
+    commande refresh_platform_stats (une seule ligne, lue par le dashboard admin)
+    """
+    payload = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'admin_platform_stats'
+        verbose_name = _('Statistiques plateforme')
+        verbose_name_plural = _('Statistiques plateforme')
+
+    def __str__(self):
+        return f"Statistiques du {self.computed_at:%d/%m/%Y %H:%M}"
@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from accounts.models import User
+from driving_schools.models import DrivingSchool, UpgradeRequest
+from exams.models import Exam
+from instructors.models import Instructor
+from students.models import Student
+from vehicles.models import Vehicle
+
+from .models import AdminSession, ContactFormSubmission, PlatformStatsSnapshot
+
+# Ligne unique du snapshot
+SNAPSHOT_ID = 1
+
+
+def _system_uptime(first_created_at, now):
+    # Approximation depuis la création de la première auto-école
+    if first_created_at is None:
+        return "99.9%"
+    uptime_days = (now - first_created_at).days
+    return f"{uptime_days} jours" if uptime_days >= 1 else "< 1 jour"
+
+
+def _database_size():
+    if connection.vendor != 'postgresql':
+        return "2.5 MB"
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()))")
+        return cursor.fetchone()[0]
+
+
+def compute_platform_stats():
+    """
+    Statistiques du dashboard admin avec une requête groupée par table
+    (compteurs conditionnels) au lieu d'un COUNT par statistique.
+    """
+    now = timezone.now()
+    today = now.date()
+    week_ago = today - timedelta(days=7)
+
+    schools = DrivingSchool.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(status='approved')),
+        pending=Count('pk', filter=Q(status='pending')),
+        standard=Count('pk', filter=Q(current_plan='standard')),
+        premium=Count('pk', filter=Q(current_plan='premium')),
+        today=Count('pk', filter=Q(created_at__date=today)),
+        week=Count('pk', filter=Q(created_at__date__gte=week_ago)),
+        first_created_at=Min('created_at'),
+    )
+    users = User.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(is_active=True)),
+        recent_logins=Count('pk', filter=Q(last_login__gte=now - timedelta(days=7))),
+    )
+    total_instructors = Instructor.objects.count()
+    total_students = Student.objects.count()
+    total_vehicles = Vehicle.objects.count()
+    upcoming_exams = Exam.objects.filter(exam_date__gte=now, result='pending').count()
+    pending_contact_forms = ContactFormSubmission.objects.filter(status='new').count()
+    pending_payments = UpgradeRequest.objects.filter(status='pending').count()
+    active_sessions = AdminSession.objects.filter(is_active=True, expires_at__gt=now).count()
+
+    # Estimation du stockage (~100KB par enregistrement)
+    total_records = schools['total'] + users['total'] + total_instructors + total_students
+
+    return {
+        'total_driving_schools': schools['total'],
+        'active_driving_schools': schools['active'],
+        'pending_driving_schools': schools['pending'],
+        'total_users': users['total'],
+        'active_users': users['active'],
+        'total_instructors': total_instructors,
+        'total_students': total_students,
+        'total_vehicles': total_vehicles,
+        'upcoming_exams': upcoming_exams,
+        'new_registrations_today': schools['today'],
+        'new_registrations_week': schools['week'],
+        'pending_contact_forms': pending_contact_forms,
+        'pending_payments': pending_payments,
+        'active_sessions': active_sessions,
+        'standard_schools': schools['standard'],
+        'premium_schools': schools['premium'],
+        'recent_logins': users['recent_logins'],
+        'system_uptime': _system_uptime(schools['first_created_at'], now),
+        'database_size': _database_size(),
+        'storage_used': f"{total_records * 0.1:.1f} MB",
+    }
+
+
+def refresh_snapshot():
+    """Recalcule les statistiques et remplace le snapshot"""
+    snapshot, _created = PlatformStatsSnapshot.objects.update_or_create(
+        pk=SNAPSHOT_ID,
+        defaults={'payload': compute_platform_stats(), 'computed_at': timezone.now()}
+    )
+    return snapshot
+
+
+def get_snapshot(fresh=False):
+    """
+    Snapshot des statistiques en une lecture ; recalculé s'il est absent,
+    plus ancien que PLATFORM_STATS_MAX_AGE secondes, ou si `fresh`.
+    """
+    if not fresh:
+        snapshot = PlatformStatsSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+        max_age = timedelta(seconds=settings.PLATFORM_STATS_MAX_AGE)
+        if snapshot is not None and snapshot.computed_at >= timezone.now() - max_age:
+            return snapshot
+    return refresh_snapshot()
@@ -228,6 +228,7 @@ class SystemStatsSerializer(serializers.Serializer):
     system_uptime = serializers.CharField()
     database_size = serializers.CharField()
     storage_used = serializers.CharField()
+    computed_at = serializers.DateTimeField(required=False)
 
 
 class DashboardStatsSerializer(serializers.Serializer):
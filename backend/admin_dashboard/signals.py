@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.auth_cache import ADMIN_SESSION, forget_on_commit
+from accounts.models import User
+from .models import AdminSession
+
+
+@receiver([post_save, post_delete], sender=AdminSession)
+def forget_admin_session_on_change(sender, instance, **kwargs):
+    """Session fermée à la déconnexion (is_active) ou supprimée"""
+    forget_on_commit(ADMIN_SESSION, [instance.session_key])
+
+
+@receiver(post_save, sender=User)
+def forget_admin_sessions_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    """Administrateur désactivé, rétrogradé ou nouveau mot de passe"""
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    forget_on_commit(
+        ADMIN_SESSION,
+        AdminSession.objects.filter(admin_user_id=instance.pk, is_active=True).values_list('session_key', flat=True)
+    )
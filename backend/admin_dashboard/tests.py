@@ -1,3 +1,279 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.auth_cache import ADMIN_SESSION, clear_local, remember
+from accounts.models import User
+from driving_schools.cache import get_stats_cache
+from driving_schools.middleware import DrivingSchoolApprovalMiddleware
+from driving_schools.tests import create_instructor, create_school, create_student
+from notifications.models import Notification, OutboxEvent
+from permini_project.instrumentation import registry
+
+from .authentication import get_session_admin
+from .models import AdminSession, PlatformStatsSnapshot
+from .platform_stats import refresh_snapshot
+
+
+def create_admin_session(username='admin'):
+    admin = User.objects.create_user(username=username, password='pass', user_type='admin')
+    return AdminSession.objects.create(
+        admin_user=admin, session_key=f'session-{username}', ip_address='127.0.0.1',
+        user_agent='tests', expires_at=timezone.now() + timedelta(hours=1)
+    )
+
+
+class SystemNotificationTests(TestCase):
+    """Notifications système diffusées par segment d'utilisateurs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+        cls.school = create_school('owner')
+        cls.students = [create_student(cls.school, index) for index in range(3)]
+        cls.instructor = create_instructor(cls.school, 0)
+        User.objects.filter(pk=cls.instructor.user_id).update(user_type='instructor')
+        User.objects.filter(pk=cls.students[2].user_id).update(is_active=False)
+
+    def setUp(self):
+        clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+        self.url = reverse('admin_send_notification')
+
+    def send(self, target_audience):
+        return self.client.post(self.url, {
+            'title': 'Maintenance', 'message': 'Coupure ce soir',
+            'target_audience': target_audience, 'notification_type': 'maintenance',
+        }, format='json')
+
+    def test_segment_recipients_are_notified_in_bulk(self):
+        # Session admin et son utilisateur, destinataires en flux, puis une
+        # insertion groupée des notifications et une des événements
+        with self.assertNumQueries(7):
+            response = self.send('students')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['recipients'], 2)
+        recipients = set(Notification.objects.values_list('recipient_id', flat=True))
+        self.assertEqual(recipients, {student.user_id for student in self.students[:2]})
+        self.assertEqual(set(Notification.objects.values_list('priority', flat=True)), {'high'})
+        self.assertEqual(
+            set(OutboxEvent.objects.values_list('group', flat=True)),
+            {f'user_{user_id}' for user_id in recipients}
+        )
+
+    def test_all_audience_and_validation(self):
+        response = self.send('all')
+        self.assertEqual(response.data['recipients'], 4)
+        self.assertFalse(Notification.objects.filter(recipient=self.session.admin_user).exists())
+
+        self.assertEqual(self.send('everyone').status_code, 400)
+
+
+class PlatformStatsSnapshotTests(TestCase):
+    """Statistiques du dashboard admin servies depuis un snapshot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+        cls.school = create_school('owner', status='approved', current_plan='premium')
+        create_school('pending')
+        create_student(cls.school, 0)
+
+    def setUp(self):
+        clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+        self.url = reverse('admin_dashboard_stats')
+
+    def test_snapshot_served_in_a_single_read(self):
+        call_command('refresh_platform_stats', stdout=StringIO())
+        create_school('later')
+
+        # Session admin avec son utilisateur, puis le snapshot
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_driving_schools'], 2)
+        self.assertEqual(response.data['active_driving_schools'], 1)
+        self.assertEqual(response.data['pending_driving_schools'], 1)
+        self.assertEqual(response.data['premium_schools'], 1)
+        self.assertEqual(response.data['total_students'], 1)
+        self.assertEqual(response.data['active_sessions'], 1)
+        self.assertIn('computed_at', response.data)
+
+        response = self.client.get(self.url, {'fresh': '1'})
+        self.assertEqual(response.data['total_driving_schools'], 3)
+        self.assertEqual(PlatformStatsSnapshot.objects.get().payload['total_driving_schools'], 3)
+
+    def test_missing_or_stale_snapshot_is_recomputed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_users'], 4)
+        self.assertEqual(PlatformStatsSnapshot.objects.count(), 1)
+
+        refresh_snapshot()
+        PlatformStatsSnapshot.objects.update(computed_at=timezone.now() - timedelta(hours=1))
+        create_school('later')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_driving_schools'], 3)
+
+
+class AdminSessionCacheTests(TestCase):
+    """Sessions admin résolues depuis le cache d'authentification"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+
+    def setUp(self):
+        clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+        self.url = reverse('admin_dashboard_stats')
+        refresh_snapshot()
+
+    def test_cached_session_costs_no_query(self):
+        self.client.get(self.url)
+        # Seul le snapshot est lu
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_invalidates_session(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.post(reverse('admin_logout'))
+        self.assertIsNone(get_session_admin(self.session.session_key))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivation_and_expiry_invalidate_session(self):
+        admin = self.session.admin_user
+        self.assertEqual(get_session_admin(self.session.session_key), admin)
+
+        admin.is_active = False
+        admin.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        # Expiration vérifiée même pour une entrée encore en cache
+        remember(ADMIN_SESSION, 'expired', admin, timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(get_session_admin('expired'))
+
+
+class SchoolApprovalStatusTests(TestCase):
+    """Statut d'approbation lu en cache par le middleware, invalidé par les vues admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+        cls.school = create_school('owner')
+
+    def setUp(self):
+        clear_local()
+        get_stats_cache().clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+        self.middleware = DrivingSchoolApprovalMiddleware(lambda request: HttpResponse('ok'))
+
+    def request(self, path='/api/students/'):
+        request = RequestFactory().get(path)
+        request.user = self.school.owner
+        return self.middleware(request)
+
+    def admin_action(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name, args=[self.school.pk]), format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_status_cached_and_exempt_urls_skipped(self):
+        self.assertEqual(self.request().status_code, 403)
+        with self.assertNumQueries(0):
+            response = self.request()
+            self.assertEqual(self.request('/api/auth/profile/').status_code, 200)
+            self.assertEqual(self.request('/waiting').status_code, 200)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn(b'"status": "pending"', response.content)
+
+    def test_admin_views_invalidate_status(self):
+        self.assertEqual(self.request().status_code, 403)
+
+        self.admin_action('admin_approve_driving_school')
+        self.assertEqual(self.request().status_code, 200)
+
+        self.admin_action('admin_suspend_driving_school')
+        self.assertIn(b'"status": "suspended"', self.request().content)
+
+        self.admin_action('admin_reactivate_driving_school')
+        self.assertEqual(self.request().status_code, 200)
+
+
+class MetricsTests(TestCase):
+    """Métriques par route exposées au format Prometheus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+
+    def setUp(self):
+        clear_local()
+        registry.reset()
+        refresh_snapshot()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+
+    def test_requests_and_queries_recorded_per_route(self):
+        for _index in range(2):
+            self.client.get(reverse('admin_dashboard_stats'))
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'protocol="http",route="/api/admin/dashboard/stats/",method="GET"'
+        self.assertIn(f'permini_requests_total{{{labels},status="200"}} 2', body)
+        self.assertIn(f'permini_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        # Session admin puis snapshot, puis le snapshot seul (session en cache)
+        self.assertIn(f'permini_sql_queries_total{{{labels}}} 3', body)
+        self.assertIn(f'permini_sql_duration_seconds_total{{{labels}}}', body)
+
+    def test_metrics_require_admin_session(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 401)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_logged_with_worst_queries(self):
+        with self.assertLogs('permini_project.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('admin_dashboard_stats'))
+        self.assertIn('GET /api/admin/dashboard/stats/', logs.output[0])
+        self.assertIn('admin_platform_stats', logs.output[0])
+
+
+class UserAdminListLoggingTests(TestCase):
+    """Diagnostics de la liste des utilisateurs limités au niveau DEBUG"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.session = create_admin_session()
+        for index in range(3):
+            User.objects.create_user(username=f'candidat{index}', password='pass', user_type='student')
+
+    def setUp(self):
+        clear_local()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'AdminSession {self.session.session_key}')
+        self.params = {'user_type': 'student', 'is_active': 'true', 'search': 'candidat'}
+
+    def test_debug_counts_only_when_enabled(self):
+        # Session, pagination, page, puis l'auto-école de chaque utilisateur
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('admin_users'), self.params)
+        self.assertEqual(response.data['count'], 3)
+
+        clear_local()
+        with self.assertLogs('admin_dashboard.views', 'DEBUG') as logs, self.assertNumQueries(9):
+            self.client.get(reverse('admin_users'), self.params)
+        self.assertIn("Après recherche 'candidat': 3", logs.output[-1])
@@ -1,8 +1,12 @@
+import logging
+
 from django.utils import timezone
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.db import transaction
+from notifications.outbox import enqueue
 from .models import AdminNotification
 
+logger = logging.getLogger(__name__)
+
 
 def send_admin_notification(
     notification_type,
@@ -17,47 +21,40 @@ def send_admin_notification(
     Envoie une notification aux admins via WebSocket et sauvegarde en base
     """
     try:
-        # Créer la notification en base
-        notification = AdminNotification.objects.create(
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            priority=priority,
-            related_driving_school_id=related_driving_school_id,
-            related_payment_id=related_payment_id,
-            related_user_id=related_user_id
-        )
-
-        # Envoyer via WebSocket à tous les admins connectés
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                "admin_notifications",
-                {
-                    'type': 'admin_notification',
-                    'notification': {
-                        'id': notification.id,
-                        'type': notification.notification_type,
-                        'title': notification.title,
-                        'message': notification.message,
-                        'priority': notification.priority,
-                        'icon': notification.get_icon(),
-                        'color_class': notification.get_color_class(),
-                        'created_at': notification.created_at.isoformat(),
-                        'related_driving_school_id': str(related_driving_school_id) if related_driving_school_id else None,
-                        'related_payment_id': str(related_payment_id) if related_payment_id else None,
-                        'related_user_id': related_user_id,
-                    }
-                }
+        # Notification et événement temps réel validés ensemble ; la diffusion
+        # aux admins connectés est assurée par le répartiteur (dispatch_notifications)
+        with transaction.atomic():
+            notification = AdminNotification.objects.create(
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                priority=priority,
+                related_driving_school_id=related_driving_school_id,
+                related_payment_id=related_payment_id,
+                related_user_id=related_user_id
             )
+            enqueue("admin_notifications", {
+                'type': 'admin_notification',
+                'notification': {
+                    'id': notification.id,
+                    'type': notification.notification_type,
+                    'title': notification.title,
+                    'message': notification.message,
+                    'priority': notification.priority,
+                    'icon': notification.get_icon(),
+                    'color_class': notification.get_color_class(),
+                    'created_at': notification.created_at.isoformat(),
+                    'related_driving_school_id': str(related_driving_school_id) if related_driving_school_id else None,
+                    'related_payment_id': str(related_payment_id) if related_payment_id else None,
+                    'related_user_id': related_user_id,
+                }
+            })
 
-        print(f"📨 Notification admin envoyée: {title}")
+        logger.debug("Notification admin envoyée: %s", title)
         return notification
 
-    except Exception as e:
-        print(f"❌ Erreur lors de l'envoi de la notification admin: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Erreur lors de l'envoi de la notification admin")
         return None
 
 
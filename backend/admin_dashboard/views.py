@@ -1,7 +1,7 @@
 from django.shortcuts import render
 from django.db.models import Count, Q
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -26,6 +26,10 @@ from driving_schools.models import DrivingSchool
 from accounts.models import User
 from instructors.models import Instructor
 from students.models import Student
+from notifications.utils import NOTIFY_MANY_CHUNK_SIZE, notify_many
+from .platform_stats import get_snapshot
+from .authentication import ADMIN_USER_TYPES, get_session_admin
+from permini_project.instrumentation import registry
 from django.contrib.auth import authenticate
 
 logger = logging.getLogger(__name__)
@@ -42,19 +46,13 @@ class AdminPermission(permissions.BasePermission):
 
         session_key = auth_header.replace('AdminSession ', '')
 
-        try:
-            admin_session = AdminSession.objects.get(
-                session_key=session_key,
-                is_active=True,
-                expires_at__gt=timezone.now()
-            )
-            # Vérifier que l'utilisateur est bien un administrateur
-            if admin_session.admin_user.user_type not in ['admin', 'administrateur']:
-                return False
-            request.admin_user = admin_session.admin_user
-            return True
-        except AdminSession.DoesNotExist:
+        # Session et administrateur depuis le cache d'authentification
+        admin_user = get_session_admin(session_key)
+        # Vérifier que l'utilisateur est bien un administrateur
+        if admin_user is None or admin_user.user_type not in ADMIN_USER_TYPES:
             return False
+        request.admin_user = admin_user
+        return True
 
 
 def log_admin_action(admin_user, action_type, description, target_model=None, target_id=None, request=None, metadata=None):
@@ -139,160 +137,19 @@ def admin_logout_view(request):
 @api_view(['GET'])
 @permission_classes([AdminPermission])
 def admin_dashboard_stats_view(request):
-    """Vue pour les statistiques du dashboard admin"""
+    """
+    Vue pour les statistiques du dashboard admin, servies depuis le snapshot
+    de la plateforme (une lecture). ?fresh=1 force le recalcul.
+    """
     try:
-        # Calculer les statistiques
-        now = timezone.now()
-        today = now.date()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-
-        # Statistiques de base
-        total_driving_schools = DrivingSchool.objects.count()
-        active_driving_schools = DrivingSchool.objects.filter(status='approved').count()
-        pending_driving_schools = DrivingSchool.objects.filter(status='pending').count()
-
-        # Debug pour les auto-écoles en attente
-        print(f"🔍 DEBUG: Total auto-écoles: {total_driving_schools}")
-        print(f"🔍 DEBUG: Auto-écoles actives: {active_driving_schools}")
-        print(f"🔍 DEBUG: Auto-écoles en attente: {pending_driving_schools}")
-
-        # Lister toutes les auto-écoles avec leur statut
-        all_schools = DrivingSchool.objects.all()
-        for school in all_schools:
-            print(f"🔍 DEBUG: {school.name} - Statut: '{school.status}'")
-
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        total_instructors = Instructor.objects.count()
-        total_students = Student.objects.count()
-
-        # Nouvelles inscriptions
-        new_registrations_today = DrivingSchool.objects.filter(created_at__date=today).count()
-        new_registrations_week = DrivingSchool.objects.filter(created_at__date__gte=week_ago).count()
-
-        # Formulaires de contact en attente
-        pending_contact_forms = ContactFormSubmission.objects.filter(status='new').count()
-
-        # Sessions actives
-        active_sessions = AdminSession.objects.filter(
-            is_active=True,
-            expires_at__gt=now
-        ).count()
-
-        # Statistiques par plan
-        standard_schools = DrivingSchool.objects.filter(current_plan='standard').count()
-        premium_schools = DrivingSchool.objects.filter(current_plan='premium').count()
-
-        # Activité récente
-        recent_logins = User.objects.filter(
-            last_login__gte=week_ago
-        ).count() if User.objects.filter(last_login__isnull=False).exists() else 0
-
-        # Paiements en attente
-        from driving_schools.models import UpgradeRequest
-        pending_payments = UpgradeRequest.objects.filter(status='pending').count()
-
-        # Calculs système simplifiés (sans psutil)
-        from django.db import connection
-
-        # Uptime système (simulé)
-        try:
-            # Calculer approximativement depuis la création de la première auto-école
-            first_school = DrivingSchool.objects.first()
-            if first_school:
-                uptime_days = (timezone.now() - first_school.created_at).days
-                if uptime_days >= 1:
-                    system_uptime = f"{uptime_days} jours"
-                else:
-                    system_uptime = "< 1 jour"
-            else:
-                system_uptime = "99.9%"
-        except:
-            system_uptime = "99.9%"
-
-        # Taille de la base de données
-        try:
-            with connection.cursor() as cursor:
-                # Essayer PostgreSQL d'abord
-                cursor.execute("SELECT pg_size_pretty(pg_database_size(current_database()));")
-                database_size = cursor.fetchone()[0]
-        except:
-            try:
-                # Fallback pour SQLite ou autres
-                database_size = "2.5 MB"
-            except:
-                database_size = "N/A"
-
-        # Utilisation du stockage (simulé)
-        try:
-            # Estimation basée sur le nombre d'enregistrements
-            total_records = (
-                total_driving_schools +
-                total_users +
-                total_instructors +
-                total_students
-            )
-            estimated_mb = total_records * 0.1  # ~100KB par enregistrement
-            storage_used = f"{estimated_mb:.1f} MB"
-        except:
-            storage_used = "1.2 MB"
-
-        # Véhicules totaux
-        try:
-            from vehicles.models import Vehicle
-            total_vehicles = Vehicle.objects.count()
-        except ImportError:
-            print("⚠️ Module vehicles non trouvé")
-            total_vehicles = 0
-        except Exception as e:
-            print(f"⚠️ Erreur véhicules: {e}")
-            total_vehicles = 0
-
-        # Examens à venir
-        try:
-            from exams.models import Exam
-            upcoming_exams = Exam.objects.filter(
-                exam_date__gte=today,
-                status='scheduled'
-            ).count()
-        except ImportError:
-            print("⚠️ Module exams non trouvé")
-            upcoming_exams = 0
-        except Exception as e:
-            print(f"⚠️ Erreur examens: {e}")
-            upcoming_exams = 0
-
-        stats = {
-            'total_driving_schools': total_driving_schools,
-            'active_driving_schools': active_driving_schools,
-            'pending_driving_schools': pending_driving_schools,
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_instructors': total_instructors,
-            'total_students': total_students,
-            'total_vehicles': total_vehicles,
-            'upcoming_exams': upcoming_exams,
-            'new_registrations_today': new_registrations_today,
-            'new_registrations_week': new_registrations_week,
-            'pending_contact_forms': pending_contact_forms,
-            'pending_payments': pending_payments,
-            'active_sessions': active_sessions,
-            'standard_schools': standard_schools,
-            'premium_schools': premium_schools,
-            'recent_logins': recent_logins,
-            'system_uptime': system_uptime,
-            'database_size': database_size,
-            'storage_used': storage_used
-        }
+        snapshot = get_snapshot(fresh=request.query_params.get('fresh') in ('1', 'true'))
+        stats = dict(snapshot.payload, computed_at=snapshot.computed_at)
 
         serializer = SystemStatsSerializer(stats)
         return Response(serializer.data)
 
     except Exception as e:
-        print(f"❌ Erreur lors du calcul des statistiques: {e}")
-        import traceback
-        print(f"❌ Traceback: {traceback.format_exc()}")
+        logger.exception("Erreur lors du calcul des statistiques: %s", e)
 
         # Retourner des statistiques par défaut
         default_stats = {
@@ -579,26 +436,26 @@ class UserAdminListView(generics.ListCreateAPIView):
     pagination_class = AdminPagination
 
     def get_queryset(self):
-        print(f"🔍 UserAdminListView - Query params: {dict(self.request.query_params)}")
+        # Les comptages de diagnostic coûtent une requête chacun : niveau DEBUG uniquement
+        debug = logger.isEnabledFor(logging.DEBUG)
+        logger.debug("UserAdminListView - paramètres: %s", dict(self.request.query_params))
 
         queryset = User.objects.all()
-        print(f"📊 Initial queryset count: {queryset.count()}")
 
         # Filtres
         user_type = self.request.query_params.get('user_type')
-        print(f"🏷️ user_type param: '{user_type}' (type: {type(user_type)})")
         if user_type and user_type.strip():  # Vérifier que ce n'est pas une chaîne vide
             queryset = queryset.filter(user_type=user_type)
-            print(f"📊 After user_type filter: {queryset.count()}")
+            if debug:
+                logger.debug("Après filtre user_type=%r: %d", user_type, queryset.count())
 
         is_active = self.request.query_params.get('is_active')
-        print(f"✅ is_active param: '{is_active}' (type: {type(is_active)})")
         if is_active and is_active.strip():  # Vérifier que ce n'est pas une chaîne vide
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
-            print(f"📊 After is_active filter: {queryset.count()}")
+            if debug:
+                logger.debug("Après filtre is_active=%r: %d", is_active, queryset.count())
 
         search = self.request.query_params.get('search')
-        print(f"🔍 search param: '{search}' (type: {type(search)})")
         if search and search.strip():  # Vérifier que ce n'est pas une chaîne vide
             queryset = queryset.filter(
                 Q(username__icontains=search) |
@@ -606,12 +463,10 @@ class UserAdminListView(generics.ListCreateAPIView):
                 Q(first_name__icontains=search) |
                 Q(last_name__icontains=search)
             )
-            print(f"📊 After search filter: {queryset.count()}")
-
-        final_queryset = queryset.order_by('-date_joined')
-        print(f"📊 Final queryset count: {final_queryset.count()}")
+            if debug:
+                logger.debug("Après recherche %r: %d", search, queryset.count())
 
-        return final_queryset
+        return queryset.order_by('-date_joined')
 
     def create(self, request, *args, **kwargs):
         from django.contrib.auth.hashers import make_password
@@ -1135,16 +990,13 @@ class PaymentAdminDetailView(generics.RetrieveAPIView):
 def approve_payment_view(request, pk):
     """Vue pour approuver une demande de paiement"""
     try:
-        print(f"🔍 Approve payment request for ID: {pk}")
-        print(f"  - Request data: {request.data}")
-        print(f"  - Admin user: {getattr(request, 'admin_user', 'Not found')}")
+        logger.debug("Approbation du paiement %s par %s: %s", pk, request.admin_user, request.data)
 
         from driving_schools.models import UpgradeRequest
         from django.utils import timezone
 
         upgrade_request = UpgradeRequest.objects.get(pk=pk)
-        print(f"  - Found upgrade request: {upgrade_request}")
-        print(f"  - Current status: {upgrade_request.status}")
+        logger.debug("Demande %s, statut %s", upgrade_request.pk, upgrade_request.status)
 
         if upgrade_request.status != 'pending':
             return Response(
@@ -1166,15 +1018,10 @@ def approve_payment_view(request, pk):
         # Gérer le renouvellement ou la mise à niveau
         old_end_date = driving_school.plan_end_date
 
-        # LOGS TRÈS VISIBLES POUR DÉBOGUER
-        print("=" * 80)
-        print("🚨 ADMIN DASHBOARD - PAYMENT APPROVAL")
-        print(f"🏫 Driving school: {driving_school.name}")
-        print(f"🔄 Is renewal: {upgrade_request.is_renewal}")
-        print(f"📅 Old end date: {old_end_date}")
-        print(f"📅 Current date: {timezone.now().date()}")
-        print(f"📋 Requested plan: {upgrade_request.requested_plan}")
-        print("=" * 80)
+        logger.info(
+            "Approbation du paiement de %s : plan %s, renouvellement %s, ancienne échéance %s",
+            driving_school.name, upgrade_request.requested_plan, upgrade_request.is_renewal, old_end_date
+        )
 
         if upgrade_request.is_renewal:
             # Renouvellement : ajouter 30 jours à la date d'expiration actuelle
@@ -1182,26 +1029,27 @@ def approve_payment_view(request, pk):
                 # Si la date est déjà passée, partir d'aujourd'hui
                 base_date = max(driving_school.plan_end_date.date(), timezone.now().date())
                 new_end_date = base_date + timezone.timedelta(days=30)
-                print(f"  - Base date for renewal: {base_date}")
-                print(f"  - New end date: {new_end_date}")
+                logger.debug("Renouvellement depuis %s, nouvelle échéance %s", base_date, new_end_date)
                 driving_school.plan_end_date = new_end_date
             else:
                 new_end_date = timezone.now().date() + timezone.timedelta(days=30)
-                print(f"  - No previous end date, new end date: {new_end_date}")
+                logger.debug("Pas d'échéance précédente, nouvelle échéance %s", new_end_date)
                 driving_school.plan_end_date = new_end_date
 
             # Pour les renouvellements Standard, augmenter le nombre de comptes
             if upgrade_request.requested_plan == 'standard':
                 driving_school.renewal_count += 1
                 driving_school.max_accounts = 200 + (driving_school.renewal_count * 50)
-                print(f"  - Standard renewal, new renewal count: {driving_school.renewal_count}")
-                print(f"  - New max accounts: {driving_school.max_accounts}")
+                logger.debug(
+                    "Renouvellement Standard n°%d, %d comptes",
+                    driving_school.renewal_count, driving_school.max_accounts
+                )
         else:
             # Nouveau plan : partir d'aujourd'hui
             driving_school.current_plan = upgrade_request.requested_plan
             new_end_date = timezone.now().date() + timezone.timedelta(days=30)
             driving_school.plan_end_date = new_end_date
-            print(f"  - New plan, end date: {new_end_date}")
+            logger.debug("Nouveau plan, échéance %s", new_end_date)
 
             # Définir les limites de comptes pour un nouveau plan
             if upgrade_request.requested_plan == 'standard':
@@ -1242,16 +1090,13 @@ def approve_payment_view(request, pk):
 def reject_payment_view(request, pk):
     """Vue pour rejeter une demande de paiement"""
     try:
-        print(f"🔍 Reject payment request for ID: {pk}")
-        print(f"  - Request data: {request.data}")
-        print(f"  - Admin user: {getattr(request, 'admin_user', 'Not found')}")
+        logger.debug("Rejet du paiement %s par %s: %s", pk, request.admin_user, request.data)
 
         from driving_schools.models import UpgradeRequest
         from django.utils import timezone
 
         upgrade_request = UpgradeRequest.objects.get(pk=pk)
-        print(f"  - Found upgrade request: {upgrade_request}")
-        print(f"  - Current status: {upgrade_request.status}")
+        logger.debug("Demande %s, statut %s", upgrade_request.pk, upgrade_request.status)
 
         if upgrade_request.status != 'pending':
             return Response(
@@ -1406,6 +1251,15 @@ def admin_current_user_view(request):
     return Response(serializer.data)
 
 
+# Types d'utilisateurs de chaque audience des notifications système
+SYSTEM_NOTIFICATION_AUDIENCES = {
+    'all': ('driving_school', 'instructor', 'student'),
+    'driving_schools': ('driving_school',),
+    'instructors': ('instructor',),
+    'students': ('student',),
+}
+
+
 @api_view(['POST'])
 @permission_classes([AdminPermission])
 def send_system_notification_view(request):
@@ -1422,8 +1276,25 @@ def send_system_notification_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Ici vous pouvez implémenter l'envoi de notifications
-        # via WebSocket ou autre système de notification
+        if target_audience not in SYSTEM_NOTIFICATION_AUDIENCES:
+            return Response(
+                {'error': 'Audience invalide'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Destinataires lus en flux (une requête, curseur côté serveur sur
+        # PostgreSQL) et notifiés par lots avec diffusion via l'outbox
+        recipients = User.objects.filter(
+            is_active=True,
+            user_type__in=SYSTEM_NOTIFICATION_AUDIENCES[target_audience]
+        ).values_list('id', flat=True).iterator(chunk_size=NOTIFY_MANY_CHUNK_SIZE)
+        delivered = notify_many(
+            recipients,
+            notification_type='system',
+            title=title,
+            message=message,
+            priority='high' if notification_type in ('warning', 'maintenance') else 'medium'
+        )
 
         # Logger l'action
         log_admin_action(
@@ -1435,11 +1306,12 @@ def send_system_notification_view(request):
                 'title': title,
                 'message': message,
                 'target_audience': target_audience,
-                'notification_type': notification_type
+                'notification_type': notification_type,
+                'recipients': delivered
             }
         )
 
-        return Response({'message': 'Notification envoyée avec succès'})
+        return Response({'message': 'Notification envoyée avec succès', 'recipients': delivered})
 
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi de notification: {e}")
@@ -1456,7 +1328,7 @@ def get_chart_data(request):
     try:
         from driving_schools.models import DrivingSchool, UpgradeRequest
         from django.db.models import Count, Sum
-        from datetime import datetime, timedelta
+        from driving_schools.timeseries import time_series
 
         # Distribution des plans
         plan_distribution = DrivingSchool.objects.values('current_plan').annotate(
@@ -1467,8 +1339,6 @@ def get_chart_data(request):
         colors = {'free': '#6B7280', 'standard': '#3B82F6', 'premium': '#10B981'}
         plan_names = {'free': 'Gratuit', 'standard': 'Standard', 'premium': 'Premium'}
 
-        print(f"📊 Plan distribution query result: {list(plan_distribution)}")
-
         if plan_distribution:
             for item in plan_distribution:
                 plan_name = item['current_plan']
@@ -1484,7 +1354,7 @@ def get_chart_data(request):
                 {'name': 'Premium', 'value': 1, 'color': '#10B981'}
             ]
 
-        print(f"📊 Final plan_data: {plan_data}")
+        logger.debug("Répartition des plans: %s", plan_data)
 
         # Méthodes de paiement (tous les paiements approuvés)
         payment_methods = UpgradeRequest.objects.filter(
@@ -1497,8 +1367,6 @@ def get_chart_data(request):
         method_colors = {'bank_transfer': '#3B82F6', 'card': '#10B981', 'flouci': '#F59E0B'}
         method_names = {'bank_transfer': 'Virement', 'card': 'Carte', 'flouci': 'Flouci'}
 
-        print(f"📊 Payment methods query result: {list(payment_methods)}")
-
         if payment_methods:
             for item in payment_methods:
                 payment_data.append({
@@ -1514,34 +1382,20 @@ def get_chart_data(request):
                 {'name': 'Flouci', 'value': 2, 'color': '#F59E0B'}
             ]
 
-        print(f"📊 Final payment_data: {payment_data}")
-
-        # Revenus mensuels (derniers 6 mois)
-        monthly_revenue = []
-        current_date = timezone.now()
-
-        # Calculer les revenus pour les 6 derniers mois
-        for i in range(6):
-            # Calculer le mois (en partant du mois actuel et en reculant)
-            target_date = current_date - timedelta(days=30 * i)
-            month_start = target_date.replace(day=1)
-
-            # Calculer le dernier jour du mois
-            if month_start.month == 12:
-                month_end = month_start.replace(year=month_start.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                month_end = month_start.replace(month=month_start.month + 1, day=1) - timedelta(days=1)
-
-            revenue = UpgradeRequest.objects.filter(
-                created_at__gte=month_start,
-                created_at__lte=month_end,
-                status='approved'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+        logger.debug("Méthodes de paiement: %s", payment_data)
 
-            monthly_revenue.insert(0, {
-                'date': month_start.strftime('%b'),
-                'value': float(revenue)
-            })
+        # Revenus mensuels (6 derniers mois calendaires, un seul GROUP BY)
+        revenue_series = time_series(
+            UpgradeRequest.objects.filter(status='approved'),
+            'created_at',
+            {'value': Sum('amount')},
+            granularity='month',
+            periods=6,
+        )
+        monthly_revenue = [
+            {'date': point['period'].strftime('%b'), 'value': float(point['value'])}
+            for point in revenue_series
+        ]
 
         # Si aucun revenu, ajouter des données de démonstration
         if all(item['value'] == 0 for item in monthly_revenue):
@@ -1554,23 +1408,20 @@ def get_chart_data(request):
                 {'date': 'Jun', 'value': 2900}
             ]
 
-        print(f"📊 Monthly revenue: {monthly_revenue}")
+        logger.debug("Revenus mensuels: %s", monthly_revenue)
 
-        # Croissance des utilisateurs (dernières 4 semaines)
-        user_growth = []
-        for i in range(4):
-            week_start = timezone.now() - timedelta(weeks=i+1)
-            week_end = timezone.now() - timedelta(weeks=i)
-
-            new_schools = DrivingSchool.objects.filter(
-                created_at__gte=week_start,
-                created_at__lt=week_end
-            ).count()
-
-            user_growth.insert(0, {
-                'date': f'S{4-i}',
-                'value': new_schools
-            })
+        # Croissance des utilisateurs (4 dernières semaines, un seul GROUP BY)
+        growth_series = time_series(
+            DrivingSchool.objects.all(),
+            'created_at',
+            {'value': Count('id')},
+            granularity='week',
+            periods=4,
+        )
+        user_growth = [
+            {'date': f'S{index}', 'value': point['value']}
+            for index, point in enumerate(growth_series, start=1)
+        ]
 
         # Si aucune croissance, ajouter des données de démonstration
         if all(item['value'] == 0 for item in user_growth):
@@ -1581,7 +1432,7 @@ def get_chart_data(request):
                 {'date': 'S4', 'value': 7}
             ]
 
-        print(f"📊 User growth: {user_growth}")
+        logger.debug("Croissance des utilisateurs: %s", user_growth)
 
         return Response({
             'plan_distribution': plan_data,
@@ -1745,29 +1596,23 @@ def admin_notifications_list_view(request):
     try:
         from .models import AdminNotification
 
-        print(f"🔍 API Notifications appelée par: {request.user}")
-
         # Filtres
         is_read = request.query_params.get('is_read')
         notification_type = request.query_params.get('type')
 
         queryset = AdminNotification.objects.filter(is_dismissed=False)
-        print(f"🔍 Notifications non ignorées: {queryset.count()}")
 
         if is_read is not None:
             queryset = queryset.filter(is_read=is_read.lower() == 'true')
-            print(f"🔍 Après filtre is_read={is_read}: {queryset.count()}")
 
         if notification_type:
             queryset = queryset.filter(notification_type=notification_type)
-            print(f"🔍 Après filtre type={notification_type}: {queryset.count()}")
 
         # Pagination
         paginator = AdminPagination()
         page = paginator.paginate_queryset(queryset, request)
         if page is not None:
             serializer = AdminNotificationSerializer(page, many=True)
-            print(f"🔍 Retour paginé: {len(serializer.data)} notifications")
             return paginator.get_paginated_response(serializer.data)
 
         serializer = AdminNotificationSerializer(queryset, many=True)
@@ -1779,13 +1624,10 @@ def admin_notifications_list_view(request):
             'unread_count': unread_count
         }
 
-        print(f"🔍 Retour final: {len(serializer.data)} notifications, {unread_count} non lues")
         return Response(result)
 
     except Exception as e:
-        print(f"❌ Erreur dans admin_notifications_list_view: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erreur dans admin_notifications_list_view: %s", e)
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -2098,3 +1940,10 @@ class PublicContactFormView(generics.CreateAPIView):
                 {'error': 'Une erreur est survenue lors de l\'envoi de votre message. Veuillez réessayer.'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+@api_view(['GET'])
+@permission_classes([AdminPermission])
+def metrics_view(request):
+    """Métriques du processus (requêtes, latence, SQL par route) au format Prometheus"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
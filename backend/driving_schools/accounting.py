@@ -0,0 +1,296 @@
+import logging
+
+from django.db import transaction
+from django.db.models import CharField, DecimalField, Exists, F, Max, OuterRef, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import AccountingEntry, AccountingSyncState, DrivingSchool, VehicleExpense
+
+logger = logging.getLogger(__name__)
+
+
+def _get_sync_state(driving_school):
+    """
+    Récupère (ou initialise) l'état de synchronisation en le verrouillant.
+
+    Lors de la première synchronisation, si l'ancien import par candidat a déjà
+    alimenté la comptabilité, l'historique des paiements est considéré comme
+    importé jusqu'à la dernière écriture créée, pour éviter les doublons.
+    Cette borne n'avance plus ensuite.
+    """
+    state, created = AccountingSyncState.objects.select_for_update().get_or_create(
+        driving_school=driving_school
+    )
+    if created:
+        legacy_import_at = AccountingEntry.objects.filter(
+            driving_school=driving_school,
+            category='student_fees',
+            source_type='',
+            description__startswith='Paiement candidat',
+        ).aggregate(latest=Max('created_at'))['latest']
+        if legacy_import_at:
+            state.payment_log_watermark = legacy_import_at
+            state.save(update_fields=['payment_log_watermark'])
+    return state
+
+
+def import_existing_subscription_to_accounting(driving_school):
+    """
+    Importer l'abonnement actuel comme dépense si ce n'est pas déjà fait
+    """
+    imported_count = 0
+    try:
+        logger.debug("Plan actuel: %s", driving_school.current_plan)
+
+        if driving_school.current_plan in ['standard', 'premium']:
+            plan_prices = {
+                'standard': 50.00,
+                'premium': 100.00
+            }
+
+            # Vérifier si l'abonnement actuel est déjà en comptabilité
+            existing_entry = AccountingEntry.objects.filter(
+                driving_school=driving_school,
+                entry_type='expense',
+                category='subscription'
+            ).first()
+
+            if not existing_entry and driving_school.current_plan in plan_prices:
+                AccountingEntry.objects.create(
+                    driving_school=driving_school,
+                    entry_type='expense',
+                    category='subscription',
+                    description=f"Abonnement plan {driving_school.current_plan.title()}",
+                    amount=plan_prices[driving_school.current_plan],
+                    date=driving_school.plan_start_date.date() if driving_school.plan_start_date else timezone.now().date()
+                )
+                imported_count += 1
+                logger.debug(
+                    "Ajouté abonnement %s - %s DT",
+                    driving_school.current_plan, plan_prices[driving_school.current_plan]
+                )
+            else:
+                logger.debug("Abonnement déjà existant ou plan non payant")
+
+    except Exception:
+        logger.exception("Erreur lors de l'importation de l'abonnement")
+
+    return imported_count
+
+
+def payment_log_entry(driving_school, log):
+    """Écriture de recette référencée par l'identifiant du PaymentLog"""
+    return AccountingEntry(
+        driving_school=driving_school,
+        entry_type='revenue',
+        category='student_fees',
+        description=f"Paiement candidat - {log.student.first_name} {log.student.last_name}",
+        amount=log.amount,
+        date=timezone.localdate(log.created_at),
+        source_type='payment_log',
+        source_id=str(log.pk),
+    )
+
+
+def student_balance_entry(driving_school, student, amount):
+    """Écriture de recette pour un montant payé antérieur à l'historique des paiements"""
+    return AccountingEntry(
+        driving_school=driving_school,
+        entry_type='revenue',
+        category='student_fees',
+        description=f"Paiement candidat - {student.first_name} {student.last_name}",
+        amount=amount,
+        date=timezone.localdate(student.created_at),
+        source_type='student_balance',
+        source_id=str(student.pk),
+    )
+
+
+def vehicle_expense_entry(driving_school, expense):
+    """Écriture de dépense référencée par l'identifiant de la dépense véhicule"""
+    return AccountingEntry(
+        driving_school=driving_school,
+        entry_type='expense',
+        category='vehicle',
+        description=f"Véhicule {expense.vehicle.license_plate} - {expense.description}",
+        amount=expense.amount,
+        date=expense.date,
+        vehicle_expense=expense,
+        source_type='vehicle_expense',
+        source_id=str(expense.pk),
+    )
+
+
+def _create_entries(entries):
+    """Insère les écritures et retourne le nombre réellement créé"""
+    AccountingEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    if not entries:
+        return 0
+    # Les écritures ignorées (déjà créées par une autre synchronisation) ne
+    # sont pas en base sous l'identifiant généré ici
+    return AccountingEntry.objects.filter(pk__in=[entry.pk for entry in entries]).count()
+
+
+def sync_payment_logs(driving_school, state):
+    """
+    Crée les écritures de recette des PaymentLog qui n'en ont pas encore.
+
+    La sélection ne dépend pas de l'ordre de validation des transactions :
+    un paiement validé après un paiement plus récent est tout de même repris.
+    """
+    from payments.models import PaymentLog
+
+    synced = AccountingEntry.objects.filter(
+        driving_school=driving_school,
+        source_type='payment_log',
+        source_id=Cast(OuterRef('pk'), CharField()),
+    )
+    logs = PaymentLog.objects.filter(
+        student__driving_school=driving_school
+    ).filter(~Exists(synced)).select_related('student')
+    if state.payment_log_watermark:
+        # Paiements déjà couverts par l'ancien import par candidat
+        logs = logs.filter(created_at__gt=state.payment_log_watermark)
+
+    return _create_entries([payment_log_entry(driving_school, log) for log in logs])
+
+
+def sync_vehicle_expenses(driving_school):
+    """Crée les écritures de dépense des VehicleExpense qui n'en ont pas encore"""
+    pending = VehicleExpense.objects.filter(
+        driving_school=driving_school,
+        accounting_entry__isnull=True,
+    ).select_related('vehicle')
+
+    return _create_entries([vehicle_expense_entry(driving_school, expense) for expense in pending])
+
+
+def sync_accounting_incremental(driving_school, include_vehicle_expenses=True):
+    """
+    Synchronisation comptable incrémentale d'une auto-école.
+
+    Seules les lignes sans écriture comptable sont lues (anti-jointure sur
+    l'index unique des sources) ; le coût ne dépend donc pas du nombre total
+    de candidats.
+    Retourne le nombre d'écritures créées par source.
+    """
+    with transaction.atomic():
+        state = _get_sync_state(driving_school)
+
+        payments_imported = sync_payment_logs(driving_school, state)
+        vehicle_expenses_imported = 0
+        if include_vehicle_expenses:
+            vehicle_expenses_imported = sync_vehicle_expenses(driving_school)
+
+        state.last_synced_at = timezone.now()
+        state.save()
+
+    subscription_imported = import_existing_subscription_to_accounting(driving_school)
+
+    return {
+        'payments_imported': payments_imported,
+        'vehicle_expenses_imported': vehicle_expenses_imported,
+        'subscription_imported': subscription_imported,
+    }
+
+
+def schedule_accounting_sync(driving_school_id, include_vehicle_expenses=True):
+    """Planifie une synchronisation incrémentale après validation de la transaction"""
+    def run():
+        driving_school = DrivingSchool.objects.filter(
+            pk=driving_school_id, current_plan='premium'
+        ).first()
+        if driving_school:
+            sync_accounting_incremental(
+                driving_school, include_vehicle_expenses=include_vehicle_expenses
+            )
+
+    transaction.on_commit(run)
+
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def _iter_import_candidates(driving_school, batch_size):
+    """Toutes les écritures importables d'une auto-école, par type de source"""
+    from payments.models import PaymentLog
+    from students.models import Student
+
+    logs = PaymentLog.objects.filter(
+        student__driving_school=driving_school
+    ).select_related('student')
+    for log in logs.iterator(chunk_size=batch_size):
+        yield payment_log_entry(driving_school, log)
+
+    # Montants payés qui ne sont couverts par aucun PaymentLog (données historiques)
+    students = Student.objects.filter(
+        driving_school=driving_school
+    ).annotate(
+        logged_amount=Coalesce(
+            Sum('payment_logs__amount'),
+            Value(0, output_field=DecimalField(max_digits=10, decimal_places=3))
+        )
+    ).filter(paid_amount__gt=F('logged_amount'))
+    for student in students.iterator(chunk_size=batch_size):
+        yield student_balance_entry(
+            driving_school, student, student.paid_amount - student.logged_amount
+        )
+
+    expenses = VehicleExpense.objects.filter(
+        driving_school=driving_school
+    ).select_related('vehicle')
+    for expense in expenses.iterator(chunk_size=batch_size):
+        yield vehicle_expense_entry(driving_school, expense)
+
+
+def bulk_import_accounting(driving_school, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importe en masse les paiements et dépenses véhicules existants.
+
+    Chaque écriture est identifiée par sa source (PaymentLog, candidat ou
+    dépense véhicule) : la contrainte d'unicité rend l'import idempotent et
+    bulk_create(ignore_conflicts=True) ignore les lignes déjà importées.
+    Les écritures de l'ancien import par candidat sont supprimées au préalable.
+    Retourne le nombre d'écritures créées (ou à créer en mode dry_run) par source.
+    """
+    imported = {source_type: 0 for source_type, _label in AccountingEntry.SOURCE_TYPES}
+
+    # Les écritures de l'ancien import (sans référence source) sont remplacées
+    legacy_entries = AccountingEntry.objects.filter(
+        driving_school=driving_school,
+        category='student_fees',
+        source_type='',
+        description__startswith='Paiement candidat',
+    )
+    if dry_run:
+        imported['legacy_replaced'] = legacy_entries.count()
+    else:
+        imported['legacy_replaced'], _deleted = legacy_entries.delete()
+
+    existing = set(
+        AccountingEntry.objects.filter(
+            driving_school=driving_school
+        ).exclude(source_type='').values_list('source_type', 'source_id')
+    )
+
+    batch = []
+
+    def flush():
+        if not dry_run:
+            AccountingEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    for entry in _iter_import_candidates(driving_school, batch_size):
+        key = (entry.source_type, entry.source_id)
+        if key in existing:
+            continue
+        existing.add(key)
+        imported[entry.source_type] += 1
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return imported
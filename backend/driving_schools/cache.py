@@ -0,0 +1,141 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import DrivingSchool
+
+STATS_CACHE_ALIAS = 'stats'
+
+
+def get_stats_cache():
+    """Retourne le backend de cache des statistiques (mémoire locale ou Redis)"""
+    return caches[STATS_CACHE_ALIAS]
+
+
+STATS_SCOPE = 'school_stats'
+SCHEDULES_SCOPE = 'school_schedules'
+PARTICIPANTS_SCOPE = 'school_participants'
+
+
+def _version_key(driving_school_id, scope):
+    return f'{scope}:{driving_school_id}:version'
+
+
+def _initial_version():
+    # Horodatage plutôt que 1 : une version évincée du cache ne peut pas
+    # reprendre une valeur déjà distribuée (ETag encore détenu par un client)
+    return time.time_ns() // 1000
+
+
+def get_school_version(driving_school_id, scope):
+    """Version courante des données `scope` d'une auto-école"""
+    cache = get_stats_cache()
+    key = _version_key(driving_school_id, scope)
+    version = cache.get(key)
+    if version is None:
+        # add() évite d'écraser une version posée entre-temps par un autre worker
+        initial = _initial_version()
+        cache.add(key, initial, timeout=None)
+        version = cache.get(key, initial)
+    return version
+
+
+def bump_school_version(driving_school_id, scope):
+    """
+    Incrémente la version des données `scope` d'une auto-école.
+
+    Les entrées ne sont pas supprimées une à une : les anciennes clés
+    deviennent inaccessibles jusqu'à leur expiration.
+    """
+    if not driving_school_id:
+        return
+    cache = get_stats_cache()
+    key = _version_key(driving_school_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def get_stats_version(driving_school_id):
+    """Version courante des statistiques d'une auto-école"""
+    return get_school_version(driving_school_id, STATS_SCOPE)
+
+
+def invalidate_school_stats(driving_school_id):
+    """Invalide toutes les statistiques en cache d'une auto-école"""
+    bump_school_version(driving_school_id, STATS_SCOPE)
+
+
+def invalidate_school_stats_on_commit(driving_school_id):
+    """Invalide les statistiques une fois la transaction courante validée"""
+    if driving_school_id:
+        transaction.on_commit(lambda: invalidate_school_stats(driving_school_id))
+
+
+def get_schedule_version(driving_school_id):
+    """Version de l'emploi du temps d'une auto-école (ETag du calendrier)"""
+    return get_school_version(driving_school_id, SCHEDULES_SCOPE)
+
+
+def invalidate_school_schedules_on_commit(driving_school_id):
+    """Change la version de l'emploi du temps une fois la transaction validée"""
+    if driving_school_id:
+        transaction.on_commit(lambda: bump_school_version(driving_school_id, SCHEDULES_SCOPE))
+
+
+def get_participants_version(driving_school_id):
+    """Version de l'annuaire des participants d'une auto-école (messagerie)"""
+    return get_school_version(driving_school_id, PARTICIPANTS_SCOPE)
+
+
+def invalidate_school_participants_on_commit(driving_school_id):
+    """Change la version de l'annuaire une fois la transaction validée"""
+    if driving_school_id:
+        transaction.on_commit(lambda: bump_school_version(driving_school_id, PARTICIPANTS_SCOPE))
+
+
+def _status_key(owner_id):
+    return f'school_status:{owner_id}'
+
+
+def get_owner_school_status(owner_id):
+    """
+    Statut de l'auto-école d'un propriétaire ('' s'il n'en a pas), lu dans
+    le cache partagé : le middleware d'approbation l'interroge à chaque requête.
+    """
+    cache = get_stats_cache()
+    key = _status_key(owner_id)
+    school_status = cache.get(key)
+    if school_status is None:
+        school_status = DrivingSchool.objects.filter(owner_id=owner_id).values_list(
+            'status', flat=True
+        ).first() or ''
+        cache.set(key, school_status)
+    return school_status
+
+
+def forget_school_status_on_commit(owner_id):
+    """Retire le statut en cache une fois l'approbation, la suspension ou la réactivation validée"""
+    if owner_id:
+        transaction.on_commit(lambda: get_stats_cache().delete(_status_key(owner_id)))
+
+
+def cached_school_stats(driving_school_id, name, compute, timeout=None):
+    """
+    Retourne les statistiques `name` d'une auto-école depuis le cache,
+    en les calculant avec `compute()` si elles sont absentes.
+    """
+    cache = get_stats_cache()
+    version = get_stats_version(driving_school_id)
+    key = f'school_stats:{driving_school_id}:v{version}:{name}'
+
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        if timeout is None:
+            cache.set(key, stats)
+        else:
+            cache.set(key, stats, timeout=timeout)
+    return stats
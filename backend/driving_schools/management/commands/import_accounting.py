@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from driving_schools.models import DrivingSchool
+from driving_schools.accounting import IMPORT_BATCH_SIZE, bulk_import_accounting
+
+
+class Command(BaseCommand):
+    help = 'Importe en masse les paiements et dépenses véhicules existants en comptabilité'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            type=int,
+            help='ID de l\'auto-école à importer',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Importer toutes les auto-écoles Premium',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher les écritures à créer sans rien modifier',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Nombre d\'écritures insérées par requête',
+        )
+
+    def handle(self, *args, **options):
+        if not options['school'] and not options['all']:
+            raise CommandError('Spécifiez --school <id> ou --all')
+
+        driving_schools = DrivingSchool.objects.filter(current_plan='premium')
+        if options['school']:
+            driving_schools = driving_schools.filter(pk=options['school'])
+
+        dry_run = options['dry_run']
+        total_entries = 0
+        for driving_school in driving_schools.iterator():
+            with transaction.atomic():
+                imported = bulk_import_accounting(
+                    driving_school, dry_run=dry_run, batch_size=options['batch_size']
+                )
+            new_entries = sum(
+                count for source, count in imported.items() if source != 'legacy_replaced'
+            )
+            total_entries += new_entries
+            self.stdout.write(
+                f"Auto-école '{driving_school.name}': {new_entries} écritures "
+                f"(paiements: {imported['payment_log']}, soldes: {imported['student_balance']}, "
+                f"véhicules: {imported['vehicle_expense']}, "
+                f"anciennes remplacées: {imported['legacy_replaced']})"
+            )
+
+        verb = 'à créer' if dry_run else 'créées'
+        self.stdout.write(
+            self.style.SUCCESS(f'Importation terminée. {total_entries} écritures {verb}.')
+        )
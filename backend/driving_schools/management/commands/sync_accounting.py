@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from driving_schools.models import DrivingSchool
+from driving_schools.accounting import sync_accounting_incremental
+
+
+class Command(BaseCommand):
+    help = 'Synchronise incrémentalement la comptabilité des auto-écoles Premium'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            type=int,
+            help='ID de l\'auto-école à synchroniser',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Synchroniser toutes les auto-écoles Premium',
+        )
+
+    def handle(self, *args, **options):
+        if not options['school'] and not options['all']:
+            raise CommandError('Spécifiez --school <id> ou --all')
+
+        driving_schools = DrivingSchool.objects.filter(current_plan='premium')
+        if options['school']:
+            driving_schools = driving_schools.filter(pk=options['school'])
+
+        total_entries = 0
+        for driving_school in driving_schools.iterator():
+            result = sync_accounting_incremental(driving_school)
+            new_entries = sum(result.values())
+            total_entries += new_entries
+            if new_entries:
+                self.stdout.write(
+                    f"Auto-école '{driving_school.name}': {new_entries} nouvelles écritures"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Synchronisation terminée. {total_entries} écritures ajoutées.'
+            )
+        )
@@ -1,7 +1,29 @@
+import re
+
 from django.http import JsonResponse
+from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
-from django.urls import reverse
-import json
+
+from .cache import get_owner_school_status
+
+# URLs qui ne nécessitent pas d'approbation
+EXEMPT_PREFIXES = (
+    '/api/auth/',
+    '/api/admin/',
+    '/administrateur_permini/',
+    '/media/',
+    '/static/',
+    '/waiting',
+    '/api/driving-schools/status/',  # Pour vérifier le statut
+)
+# Tous les préfixes en une seule expression, compilée au chargement
+EXEMPT_URLS = re.compile('|'.join(re.escape(prefix) for prefix in EXEMPT_PREFIXES))
+
+STATUS_MESSAGES = {
+    'pending': _('Votre auto-école est en attente d\'approbation'),
+    'rejected': _('Votre auto-école a été rejetée'),
+    'suspended': _('Votre auto-école a été suspendue')
+}
 
 
 class DrivingSchoolApprovalMiddleware:
@@ -9,58 +31,36 @@ class DrivingSchoolApprovalMiddleware:
     Middleware pour vérifier que les auto-écoles sont approuvées
     avant d'accéder aux ressources protégées
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-        
-        # URLs qui ne nécessitent pas d'approbation
-        self.exempt_urls = [
-            '/api/auth/',
-            '/api/admin/',
-            '/administrateur_permini/',
-            '/media/',
-            '/static/',
-            '/waiting',
-            '/api/driving-schools/status/',  # Pour vérifier le statut
-        ]
-    
+
     def __call__(self, request):
         # Vérifier si l'URL est exemptée
-        if any(request.path.startswith(url) for url in self.exempt_urls):
+        if EXEMPT_URLS.match(request.path):
             return self.get_response(request)
-        
+
         # Vérifier seulement pour les utilisateurs authentifiés de type driving_school
-        if (hasattr(request, 'user') and 
-            request.user.is_authenticated and 
-            request.user.user_type == 'driving_school'):
-            
-            try:
-                driving_school = request.user.driving_school
-                
-                # Si l'auto-école n'est pas approuvée, bloquer l'accès
-                if driving_school.status != 'approved':
-                    
-                    # Pour les requêtes API, retourner JSON
-                    if request.path.startswith('/api/'):
-                        status_messages = {
-                            'pending': _('Votre auto-école est en attente d\'approbation'),
-                            'rejected': _('Votre auto-école a été rejetée'),
-                            'suspended': _('Votre auto-école a été suspendue')
-                        }
-                        
-                        return JsonResponse({
-                            'error': status_messages.get(driving_school.status, _('Accès non autorisé')),
-                            'status': driving_school.status,
-                            'redirect': '/waiting'
-                        }, status=403)
-                    
-                    # Pour les autres requêtes, rediriger vers la page d'attente
-                    from django.shortcuts import redirect
-                    return redirect('/waiting')
-                    
-            except Exception as e:
-                # En cas d'erreur, permettre la requête de continuer
-                # (l'utilisateur sera géré par les vues individuelles)
-                pass
-        
+        if (hasattr(request, 'user') and
+                request.user.is_authenticated and
+                request.user.user_type == 'driving_school'):
+
+            # Statut en cache (invalidé à chaque changement de statut) ;
+            # '' si l'utilisateur n'a pas encore d'auto-école
+            school_status = get_owner_school_status(request.user.pk)
+
+            # Si l'auto-école n'est pas approuvée, bloquer l'accès
+            if school_status and school_status != 'approved':
+
+                # Pour les requêtes API, retourner JSON
+                if request.path.startswith('/api/'):
+                    return JsonResponse({
+                        'error': STATUS_MESSAGES.get(school_status, _('Accès non autorisé')),
+                        'status': school_status,
+                        'redirect': '/waiting'
+                    }, status=403)
+
+                # Pour les autres requêtes, rediriger vers la page d'attente
+                return redirect('/waiting')
+
         return self.get_response(request)
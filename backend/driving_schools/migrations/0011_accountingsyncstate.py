@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driving_schools', '0010_alter_drivingschool_current_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountingSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_log_watermark', models.DateTimeField(blank=True, null=True, verbose_name='Dernier paiement synchronisé')),
+                ('vehicle_expense_watermark', models.DateTimeField(blank=True, null=True, verbose_name='Dernière dépense véhicule synchronisée')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière synchronisation')),
+                ('driving_school', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='accounting_sync_state', to='driving_schools.drivingschool', verbose_name='Auto-école')),
+            ],
+            options={
+                'verbose_name': 'État de synchronisation comptable',
+                'verbose_name_plural': 'États de synchronisation comptable',
+            },
+        ),
+    ]
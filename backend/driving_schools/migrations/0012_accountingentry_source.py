@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:23
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def backfill_vehicle_expense_sources(apps, schema_editor):
+    """Référencer les écritures déjà liées à une dépense véhicule"""
+    AccountingEntry = apps.get_model('driving_schools', 'AccountingEntry')
+
+    AccountingEntry.objects.filter(vehicle_expense__isnull=False).update(
+        source_type='vehicle_expense',
+        source_id=Cast('vehicle_expense_id', models.CharField(max_length=64))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driving_schools', '0011_accountingsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accountingentry',
+            name='source_id',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Référence source'),
+        ),
+        migrations.AddField(
+            model_name='accountingentry',
+            name='source_type',
+            field=models.CharField(blank=True, choices=[('payment_log', 'Paiement candidat'), ('student_balance', 'Solde initial candidat'), ('vehicle_expense', 'Dépense véhicule')], default='', max_length=20, verbose_name='Type de source'),
+        ),
+        migrations.RunPython(
+            backfill_vehicle_expense_sources,
+            migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='accountingentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('source_type', ''), _negated=True), fields=('driving_school', 'source_type', 'source_id'), name='unique_accounting_entry_source'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driving_schools', '0012_accountingentry_source'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='accountingsyncstate',
+            name='vehicle_expense_watermark',
+        ),
+    ]
@@ -858,6 +858,27 @@ class AccountingEntry(models.Model):
         verbose_name=_('Date')
     )
 
+    SOURCE_TYPES = (
+        ('payment_log', _('Paiement candidat')),
+        ('student_balance', _('Solde initial candidat')),
+        ('vehicle_expense', _('Dépense véhicule')),
+    )
+
+    # Référence de la donnée importée (vide pour les écritures manuelles)
+    source_type = models.CharField(
+        max_length=20,
+        choices=SOURCE_TYPES,
+        blank=True,
+        default='',
+        verbose_name=_('Type de source')
+    )
+    source_id = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name=_('Référence source')
+    )
+
     # Références optionnelles
     vehicle_expense = models.OneToOneField(
         VehicleExpense,
@@ -893,6 +914,47 @@ class AccountingEntry(models.Model):
         verbose_name = _('Écriture comptable')
         verbose_name_plural = _('Écritures comptables')
         ordering = ['-date', '-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['driving_school', 'source_type', 'source_id'],
+                condition=~models.Q(source_type=''),
+                name='unique_accounting_entry_source',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_entry_type_display()} - {self.description} - {self.amount} DT"
+
+
+class AccountingSyncState(models.Model):
+    """
+    Position de la dernière synchronisation comptable d'une auto-école.
+
+    Le watermark des paiements marque la fin de l'ancien import par candidat :
+    les PaymentLog antérieurs sont déjà comptabilisés.
+    """
+    driving_school = models.OneToOneField(
+        'DrivingSchool',
+        on_delete=models.CASCADE,
+        related_name='accounting_sync_state',
+        verbose_name=_('Auto-école')
+    )
+
+    payment_log_watermark = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Dernier paiement synchronisé')
+    )
+
+    last_synced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Dernière synchronisation')
+    )
+
+    class Meta:
+        verbose_name = _('État de synchronisation comptable')
+        verbose_name_plural = _('États de synchronisation comptable')
+
+    def __str__(self):
+        return f"{self.driving_school} - {self.last_synced_at}"
@@ -1,7 +1,16 @@
+from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from students.models import Student
 from instructors.models import Instructor
+from vehicles.models import Vehicle
+from payments.models import Payment, PaymentLog
+from exams.models import Exam
+from schedules.models import Schedule
+from .models import DrivingSchool, Expense, Revenue
+from .cache import forget_school_status_on_commit, invalidate_school_stats_on_commit
+from .tenancy import forget_tenant
+from .accounting import schedule_accounting_sync
 
 
 @receiver(post_save, sender=Student)
@@ -30,3 +39,51 @@ def update_accounts_on_instructor_delete(sender, instance, **kwargs):
     """Met à jour le compteur de comptes quand un moniteur est supprimé"""
     if instance.driving_school:
         instance.driving_school.update_current_accounts()
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Instructor)
+@receiver([post_save, post_delete], sender=Vehicle)
+@receiver([post_save, post_delete], sender=Payment)
+@receiver([post_save, post_delete], sender=Exam)
+@receiver([post_save, post_delete], sender=Schedule)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Revenue)
+def invalidate_stats_on_change(sender, instance, **kwargs):
+    """Invalide les statistiques en cache de l'auto-école concernée"""
+    invalidate_school_stats_on_commit(instance.driving_school_id)
+
+
+@receiver(post_save, sender=PaymentLog)
+def sync_accounting_on_payment_log_create(sender, instance, created, **kwargs):
+    """Comptabilise un nouveau paiement de candidat (synchronisation incrémentale)"""
+    if created:
+        schedule_accounting_sync(
+            instance.student.driving_school_id, include_vehicle_expenses=False
+        )
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Instructor)
+def forget_tenant_on_member_change(sender, instance, **kwargs):
+    """Rattachement d'un candidat ou moniteur modifié"""
+    forget_tenant(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=DrivingSchool)
+def forget_tenant_on_school_change(sender, instance, **kwargs):
+    forget_tenant(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=DrivingSchool)
+def forget_status_on_school_change(sender, instance, update_fields=None, **kwargs):
+    """Statut modifié par l'admin (approbation, suspension, réactivation)"""
+    if update_fields is None or 'status' in update_fields:
+        forget_school_status_on_commit(instance.owner_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_tenant_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # La connexion (last_login) ne change pas le rôle
+    if update_fields is None or 'user_type' in update_fields:
+        forget_tenant(instance.pk)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DrivingSchool, Expense, Revenue
+
+
+def _school_aggregate(queryset, aggregate, output_field):
+    """
+    Sous-requête corrélée renvoyant un agrégat pour l'auto-école courante.
+
+    Le GROUP BY sur driving_school garantit une seule ligne par auto-école ;
+    Coalesce remplace l'absence de ligne par zéro.
+    """
+    subquery = (
+        queryset.filter(driving_school=OuterRef('pk'))
+        .order_by()
+        .values('driving_school')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    zero = Decimal('0') if isinstance(output_field, DecimalField) else 0
+    return Coalesce(
+        Subquery(subquery, output_field=output_field),
+        Value(zero, output_field=output_field),
+    )
+
+
+def _count(queryset, condition=None):
+    return _school_aggregate(
+        queryset, Count('pk', filter=condition), IntegerField()
+    )
+
+
+def _sum(queryset, field):
+    return _school_aggregate(
+        queryset, Sum(field), DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def dashboard_stats_queryset(now=None):
+    """
+    Queryset DrivingSchool annoté avec toutes les statistiques du tableau de bord.
+
+    Chaque statistique est une sous-requête corrélée : l'ensemble est
+    calculé en un seul aller-retour vers la base de données.
+    """
+    from students.models import Student
+    from instructors.models import Instructor
+    from vehicles.models import Vehicle
+    from payments.models import Payment
+    from exams.models import Exam
+
+    now = now or timezone.now()
+    current_month = timezone.localdate(now).replace(day=1)
+    next_month = (current_month + timedelta(days=32)).replace(day=1)
+    next_week = now + timedelta(days=7)
+
+    return DrivingSchool.objects.annotate(
+        total_students=_count(Student.objects.all()),
+        active_students=_count(Student.objects.all(), Q(is_active=True)),
+        total_instructors=_count(Instructor.objects.all()),
+        total_vehicles=_count(Vehicle.objects.all()),
+        monthly_revenue=_sum(
+            Revenue.objects.filter(date__gte=current_month, date__lt=next_month),
+            'amount'
+        ),
+        monthly_expenses=_sum(
+            Expense.objects.filter(date__gte=current_month, date__lt=next_month),
+            'amount'
+        ),
+        pending_payments=_count(Payment.objects.filter(status='pending')),
+        upcoming_exams=_count(
+            Exam.objects.filter(exam_date__gte=now, exam_date__lte=next_week)
+        ),
+    )
+
+
+DASHBOARD_STATS_FIELDS = (
+    'total_students',
+    'active_students',
+    'total_instructors',
+    'total_vehicles',
+    'monthly_revenue',
+    'monthly_expenses',
+    'pending_payments',
+    'upcoming_exams',
+)
+
+
+def get_dashboard_stats(driving_school_id, now=None):
+    """Retourne le dictionnaire attendu par DashboardStatsSerializer (une requête)"""
+    stats = (
+        dashboard_stats_queryset(now)
+        .filter(pk=driving_school_id)
+        .values(*DASHBOARD_STATS_FIELDS)
+        .first()
+    )
+    if stats is None:
+        return dict.fromkeys(DASHBOARD_STATS_FIELDS, 0)
+    return stats
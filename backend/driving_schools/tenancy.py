@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+
+# Rôle d'un utilisateur dans son auto-école et identifiant de celle-ci
+Tenant = namedtuple('Tenant', ['user_id', 'role', 'driving_school_id'])
+
+# Taille et durée de vie du cache des auto-écoles par utilisateur (par processus)
+TENANT_CACHE_SIZE = 1024
+TENANT_CACHE_TTL = 60
+
+
+class LRUCache:
+    """Petit cache LRU avec expiration, partagé par les threads du processus"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_tenants = LRUCache(TENANT_CACHE_SIZE, TENANT_CACHE_TTL)
+
+
+def _load_tenant(user_id, user_type):
+    """Auto-école de l'utilisateur (propriétaire, candidat ou moniteur) en une requête"""
+    schools = get_user_model().objects.filter(pk=user_id).values_list(
+        F('driving_school__id'),
+        F('student__driving_school_id'),
+        F('instructor_profile__driving_school_id'),
+    ).first()
+    owned, as_student, as_instructor = schools or (None, None, None)
+
+    # Même priorité que les vérifications hasattr() des vues
+    if owned:
+        return Tenant(user_id, 'driving_school', owned)
+    if user_type == 'instructor' and as_instructor:
+        return Tenant(user_id, 'instructor', as_instructor)
+    if user_type == 'student' and as_student:
+        return Tenant(user_id, 'student', as_student)
+    return Tenant(user_id, None, None)
+
+
+def get_tenant(user):
+    """
+    Rôle et auto-école d'un utilisateur : mémorisés sur l'objet utilisateur
+    (donc pour la requête en cours) et dans un cache LRU du processus.
+    """
+    tenant = getattr(user, '_tenant', None)
+    if tenant is None:
+        tenant = _tenants.get(user.pk)
+        if tenant is None:
+            tenant = _load_tenant(user.pk, user.user_type)
+            _tenants.set(user.pk, tenant)
+        user._tenant = tenant
+    return tenant
+
+
+def get_request_tenant(request):
+    """Tenant de l'utilisateur authentifié, résolu une seule fois par requête"""
+    http_request = getattr(request, '_request', request)
+    tenant = getattr(http_request, 'tenant', None)
+    if tenant is None:
+        tenant = get_tenant(request.user)
+        http_request.tenant = tenant
+    return tenant
+
+
+def same_school(user_a, user_b):
+    """Les deux utilisateurs appartiennent-ils à la même auto-école ?"""
+    school_id = get_tenant(user_a).driving_school_id
+    return school_id is not None and school_id == get_tenant(user_b).driving_school_id
+
+
+def forget_tenant(user_id):
+    """Retire un utilisateur du cache après un changement de rattachement"""
+    _tenants.delete(user_id)
+
+
+def clear_tenants():
+    _tenants.clear()
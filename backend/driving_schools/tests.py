@@ -1,3 +1,530 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from exams.models import Exam
+from instructors.models import Instructor
+from payments.models import Payment, PaymentLog
+from students.models import Student
+from vehicles.models import Vehicle
+
+from .cache import get_stats_cache, get_stats_version
+from .accounting import bulk_import_accounting, sync_accounting_incremental
+from .models import AccountingEntry, DrivingSchool, Expense, Revenue
+from .stats import get_dashboard_stats
+from .tenancy import LRUCache, clear_tenants, get_tenant, same_school
+from .timeline import build_timeline, exam_items, schedule_items
+from .timeseries import bucket_starts, time_series
+
+
+def create_school(username, **kwargs):
+    owner = User.objects.create_user(
+        username=username, password='pass', user_type='driving_school'
+    )
+    return DrivingSchool.objects.create(
+        owner=owner, name=f'Auto-école {username}', manager_name='Gérant',
+        address='Tunis', phone='20000000', email=f'{username}@test.tn',
+        cin_document='cin.jpg', legal_documents='legal.pdf', **kwargs
+    )
+
+
+def create_student(driving_school, index, **kwargs):
+    user = User.objects.create_user(username=f'student{index}', password='pass')
+    return Student.objects.create(
+        user=user, driving_school=driving_school, first_name='Candidat',
+        last_name=str(index), cin=f'0000000{index}', phone='20000000',
+        email=f'student{index}@test.tn', date_of_birth=date(2000, 1, 1),
+        address='Tunis', license_type='B', **kwargs
+    )
+
+
+def create_instructor(driving_school, index, **kwargs):
+    user = User.objects.create_user(username=f'instructor{index}', password='pass')
+    return Instructor.objects.create(
+        user=user, driving_school=driving_school, first_name='Moniteur',
+        last_name=str(index), cin=f'1111111{index}', phone='20000000',
+        email=f'instructor{index}@test.tn', license_types='B',
+        hire_date=timezone.localdate(), **kwargs
+    )
+
+
+def create_vehicle(driving_school, index, **kwargs):
+    today = timezone.localdate()
+    kwargs.setdefault('technical_inspection_date', today)
+    kwargs.setdefault('insurance_expiry_date', today)
+    return Vehicle.objects.create(
+        driving_school=driving_school, license_plate=f'{index} TU 4567', brand='Renault',
+        model='Clio', year=2020, color='Blanc', vehicle_type='B', **kwargs
+    )
+
+
+class DashboardStatsTests(TestCase):
+    """Statistiques du tableau de bord calculées en un seul aller-retour"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.owner = cls.school.owner
+        today = timezone.localdate()
+
+        for index, is_active in enumerate([True, True, False]):
+            create_student(cls.school, index, is_active=is_active)
+        cls.student = Student.objects.first()
+
+        create_instructor(cls.school, 0)
+        create_vehicle(cls.school, 0)
+
+        Revenue.objects.create(
+            driving_school=cls.school, source='student_fees', description='Frais',
+            amount=Decimal('150.00'), date=today,
+        )
+        Revenue.objects.create(
+            driving_school=cls.school, source='other', description='Ancien',
+            amount=Decimal('999.00'), date=today.replace(day=1) - timedelta(days=1),
+        )
+        Expense.objects.create(
+            driving_school=cls.school, category='fuel', description='Carburant',
+            amount=Decimal('40.50'), date=today,
+        )
+        for payment_status in ['pending', 'pending', 'paid']:
+            Payment.objects.create(
+                driving_school=cls.school, student=cls.student, payment_type='lesson',
+                amount=Decimal('30.00'), due_date=today, status=payment_status,
+            )
+        Exam.objects.create(
+            driving_school=cls.school, student=cls.student, exam_type='theory',
+            exam_date=timezone.now() + timedelta(days=2),
+        )
+        Exam.objects.create(
+            driving_school=cls.school, student=cls.student, exam_type='theory',
+            exam_date=timezone.now() + timedelta(days=20),
+        )
+
+    def setUp(self):
+        get_stats_cache().clear()
+
+    def test_stats_values(self):
+        stats = get_dashboard_stats(self.school.id)
+
+        self.assertEqual(stats['total_students'], 3)
+        self.assertEqual(stats['active_students'], 2)
+        self.assertEqual(stats['total_instructors'], 1)
+        self.assertEqual(stats['total_vehicles'], 1)
+        self.assertEqual(stats['monthly_revenue'], Decimal('150.00'))
+        self.assertEqual(stats['monthly_expenses'], Decimal('40.50'))
+        self.assertEqual(stats['pending_payments'], 2)
+        self.assertEqual(stats['upcoming_exams'], 1)
+
+    def test_stats_for_empty_school(self):
+        other_school = create_school('other')
+
+        stats = get_dashboard_stats(other_school.id)
+
+        self.assertEqual(stats['total_students'], 0)
+        self.assertEqual(stats['monthly_revenue'], Decimal('0'))
+
+    def test_stats_single_query(self):
+        # Ajouter une statistique ne doit jamais ajouter d'aller-retour
+        with self.assertNumQueries(1):
+            get_dashboard_stats(self.school.id)
+
+    def test_view_query_count(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.owner.pk))
+
+        # 1 requête pour l'auto-école de l'utilisateur + 1 pour les statistiques
+        with self.assertNumQueries(2):
+            response = client.get(reverse('driving_schools:dashboard_stats'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_students'], 3)
+        self.assertEqual(response.data['monthly_revenue'], '150.00')
+
+    def test_view_served_from_cache(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.owner.pk))
+        url = reverse('driving_schools:dashboard_stats')
+        client.get(url)
+
+        client.force_authenticate(User.objects.get(pk=self.owner.pk))
+        # Seule la résolution de l'auto-école touche la base de données
+        with self.assertNumQueries(1):
+            response = client.get(url)
+
+        self.assertEqual(response.data['total_instructors'], 1)
+
+    def test_cache_invalidated_on_change(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        url = reverse('driving_schools:dashboard_stats')
+        client.get(url)
+        version = get_stats_version(self.school.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(
+                driving_school=self.school, category='rent', description='Loyer',
+                amount=Decimal('100.00'), date=timezone.localdate(),
+            )
+
+        self.assertEqual(get_stats_version(self.school.id), version + 1)
+        response = client.get(url)
+        self.assertEqual(response.data['monthly_expenses'], '140.50')
+
+
+class IncrementalAccountingSyncTests(TestCase):
+    """Synchronisation comptable incrémentale des lignes sans écriture"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('premium', current_plan='premium')
+        cls.student = create_student(cls.school, 1)
+
+    def revenue_entries(self):
+        return AccountingEntry.objects.filter(
+            driving_school=self.school, category='student_fees'
+        )
+
+    def test_payment_log_synced_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentLog.objects.create(student=self.student, amount=Decimal('80.000'))
+
+        self.assertEqual(self.revenue_entries().count(), 1)
+
+        result = sync_accounting_incremental(self.school)
+        self.assertEqual(result['payments_imported'], 0)
+        self.assertEqual(self.revenue_entries().get().amount, Decimal('80.00'))
+
+    def test_only_new_rows_processed(self):
+        PaymentLog.objects.create(student=self.student, amount=Decimal('50.000'))
+        sync_accounting_incremental(self.school)
+        PaymentLog.objects.create(student=self.student, amount=Decimal('30.000'))
+
+        result = sync_accounting_incremental(self.school)
+
+        self.assertEqual(result['payments_imported'], 1)
+        self.assertEqual(self.revenue_entries().count(), 2)
+
+    def test_payment_committed_out_of_order_is_synced(self):
+        newer = PaymentLog.objects.create(student=self.student, amount=Decimal('60.000'))
+        sync_accounting_incremental(self.school)
+        # Paiement inséré avant le précédent mais validé après sa synchronisation
+        late = PaymentLog.objects.create(student=self.student, amount=Decimal('40.000'))
+        PaymentLog.objects.filter(pk=late.pk).update(
+            created_at=newer.created_at - timedelta(minutes=5)
+        )
+
+        result = sync_accounting_incremental(self.school)
+
+        self.assertEqual(result['payments_imported'], 1)
+        self.assertEqual(
+            self.revenue_entries().aggregate(total=Sum('amount'))['total'], Decimal('100.00')
+        )
+
+    def test_sourced_entries_do_not_set_legacy_cutoff(self):
+        PaymentLog.objects.create(student=self.student, amount=Decimal('25.000'))
+        # Écriture issue de l'import par source, même libellé que l'ancien import
+        AccountingEntry.objects.create(
+            driving_school=self.school, entry_type='revenue', category='student_fees',
+            description='Paiement candidat - Candidat 1', amount=Decimal('5'),
+            date=timezone.localdate(), source_type='student_balance', source_id=str(self.student.pk),
+        )
+
+        result = sync_accounting_incremental(self.school)
+
+        self.assertEqual(result['payments_imported'], 1)
+
+    def test_financial_summary_does_not_depend_on_students(self):
+        client = APIClient()
+        client.force_authenticate(self.school.owner)
+        url = reverse('driving_schools:financial_summary')
+
+        with CaptureQueriesContext(connection) as before:
+            client.get(url)
+        for index in range(2, 7):
+            student = create_student(self.school, index)
+            PaymentLog.objects.create(student=student, amount=Decimal('10.000'))
+        with CaptureQueriesContext(connection) as after:
+            response = client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(before.captured_queries), len(after.captured_queries))
+
+
+class TimeSeriesTests(TestCase):
+    """Séries temporelles calendaires agrégées en un seul GROUP BY"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('series', current_plan='premium')
+        for day, amount in [(date(2026, 1, 31), '10'), (date(2026, 2, 1), '5'),
+                            (date(2026, 2, 28), '7'), (date(2025, 12, 15), '3')]:
+            AccountingEntry.objects.create(
+                driving_school=cls.school, entry_type='revenue', category='other',
+                description='Recette', amount=Decimal(amount), date=day,
+            )
+
+    def test_bucket_starts_cross_year(self):
+        self.assertEqual(
+            bucket_starts('month', 3, end=date(2026, 1, 31)),
+            [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)]
+        )
+        self.assertEqual(
+            bucket_starts('week', 2, end=date(2026, 3, 4)),
+            [date(2026, 2, 23), date(2026, 3, 2)]
+        )
+
+    def test_month_boundaries_and_zero_fill(self):
+        with self.assertNumQueries(1):
+            series = time_series(
+                AccountingEntry.objects.filter(driving_school=self.school), 'date',
+                {'value': Sum('amount')}, granularity='month', periods=4,
+                end=date(2026, 3, 10),
+            )
+
+        self.assertEqual(
+            [(point['period'], point['value']) for point in series],
+            [(date(2025, 12, 1), Decimal('3')), (date(2026, 1, 1), Decimal('10')),
+             (date(2026, 2, 1), Decimal('12')), (date(2026, 3, 1), 0)]
+        )
+
+    def test_series_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.school.owner)
+
+        response = client.get(reverse('driving_schools:series'), {
+            'metric': 'revenue', 'granularity': 'month', 'periods': 2, 'end': '2026-02-15',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['series'], [
+            {'period': '2026-01-01', 'value': 10.0},
+            {'period': '2026-02-01', 'value': 12.0},
+        ])
+
+    def test_series_endpoint_rejects_unknown_granularity(self):
+        client = APIClient()
+        client.force_authenticate(self.school.owner)
+
+        response = client.get(reverse('driving_schools:series'), {'granularity': 'hour'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkAccountingImportTests(TestCase):
+    """Import en masse idempotent des paiements existants"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('bulk', current_plan='premium')
+        # Deux candidats homonymes ayant payé le même montant
+        cls.first = create_student(cls.school, 1, paid_amount=Decimal('100.000'))
+        cls.second = create_student(cls.school, 2, paid_amount=Decimal('100.000'))
+        Student.objects.filter(pk=cls.second.pk).update(last_name='1')
+        PaymentLog.objects.create(student=cls.first, amount=Decimal('100.000'))
+        PaymentLog.objects.create(student=cls.second, amount=Decimal('60.000'))
+
+    def entries(self):
+        return AccountingEntry.objects.filter(driving_school=self.school)
+
+    def test_import_keys_on_source(self):
+        imported = bulk_import_accounting(self.school)
+
+        self.assertEqual(imported['payment_log'], 2)
+        # 40 DT payés avant l'historique des paiements
+        self.assertEqual(imported['student_balance'], 1)
+        self.assertEqual(
+            self.entries().get(source_type='student_balance').amount, Decimal('40.00')
+        )
+        self.assertEqual(self.entries().count(), 3)
+
+    def test_import_is_idempotent(self):
+        bulk_import_accounting(self.school, batch_size=1)
+        imported = bulk_import_accounting(self.school, batch_size=1)
+
+        self.assertEqual(imported['payment_log'], 0)
+        self.assertEqual(self.entries().count(), 3)
+
+    def test_dry_run_command(self):
+        out = StringIO()
+        call_command('import_accounting', school=self.school.pk, dry_run=True, stdout=out)
+
+        self.assertIn('3 écritures à créer', out.getvalue())
+        self.assertFalse(self.entries().exists())
+
+    def test_view_import_rolls_back_on_failure(self):
+        AccountingEntry.objects.create(
+            driving_school=self.school, entry_type='expense', category='subscription',
+            description='Abonnement plan Premium', amount=Decimal('100'), date=date(2026, 1, 1),
+        )
+        client = APIClient()
+        client.force_authenticate(self.school.owner)
+
+        with mock.patch('driving_schools.views.import_existing_subscription_to_accounting',
+                        side_effect=RuntimeError('échec')):
+            response = client.post(reverse('driving_schools:import_accounting_data'))
+
+        self.assertEqual(response.status_code, 500)
+        # Ni l'abonnement supprimé ni les écritures importées ne sont conservés
+        self.assertEqual(list(self.entries().values_list('category', flat=True)), ['subscription'])
+
+
+class TimelineTests(TestCase):
+    """Fusion chronologique des séances, examens et rappels véhicules"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from schedules.models import Schedule
+
+        cls.school = create_school('owner')
+        cls.student = create_student(cls.school, 0)
+        instructor = create_instructor(cls.school, 0)
+        today = timezone.localdate()
+        cls.tomorrow = today + timedelta(days=1)
+
+        for hour in (14, 8, 11):
+            Schedule.objects.create(
+                driving_school=cls.school, student=cls.student, instructor=instructor,
+                session_type='theory', date=cls.tomorrow,
+                start_time=time(hour, 0), end_time=time(hour + 1, 0),
+            )
+        Exam.objects.create(
+            driving_school=cls.school, student=cls.student, exam_type='theory',
+            exam_date=timezone.make_aware(datetime.combine(cls.tomorrow, time(10, 0))),
+        )
+        for index in range(5):
+            # Contrôle technique proche, assurance lointaine
+            create_vehicle(
+                cls.school, index,
+                technical_inspection_date=today + timedelta(days=2 + index),
+                insurance_expiry_date=today + timedelta(days=365),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+
+    def test_build_timeline_stops_at_limit(self):
+        from schedules.models import Schedule
+
+        with self.assertNumQueries(2):
+            timeline = build_timeline(
+                schedule_items(Schedule.objects.all(), limit=2),
+                exam_items(Exam.objects.all(), limit=2),
+                limit=2,
+            )
+        self.assertEqual([item['type'] for item in timeline], ['schedule', 'exam'])
+        self.assertEqual(timeline[0]['start'].time(), time(8, 0))
+
+    def test_upcoming_events_one_query_per_source(self):
+        # Auto-école, examens, séances, rappels (UNION)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('driving_schools:upcoming_events'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [event['type'] for event in response.data],
+            ['session', 'exam', 'session', 'session'] + ['reminder'] * 5
+        )
+        self.assertEqual(response.data[1]['time'], '10:00')
+        self.assertEqual(response.data[-1]['id'], f'tech_{Vehicle.objects.order_by("pk").last().pk}')
+
+    def test_student_schedule_with_exams_is_chronological(self):
+        response = self.client.get(
+            reverse('students:student_schedule_with_exams', args=[self.student.pk]),
+            {'start': self.tomorrow.isoformat(), 'end': self.tomorrow.isoformat()}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [event['id'].split('_')[0] for event in response.data],
+            ['schedule', 'exam', 'schedule', 'schedule']
+        )
+        self.assertEqual(response.data[0]['title'], 'Code - Moniteur 0')
+
+    def test_instructor_schedule_grouped_by_day(self):
+        instructor = Instructor.objects.get()
+        response = self.client.get(reverse('instructors:instructor_schedule', args=[instructor.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        day = next(entry for entry in response.data if entry['date'] == self.tomorrow.isoformat())
+        self.assertEqual(
+            [session['start_time'] for session in day['sessions']],
+            [time(8, 0), time(11, 0), time(14, 0)]
+        )
+
+
+class TenancyTests(TestCase):
+    """Résolution du rôle et de l'auto-école d'un utilisateur"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.other_school = create_school('other')
+        cls.student = create_student(cls.school, 1)
+        cls.instructor = create_instructor(cls.school, 1)
+        User.objects.filter(pk=cls.instructor.user_id).update(user_type='instructor')
+        cls.outsider = create_student(cls.other_school, 2)
+
+    def setUp(self):
+        clear_tenants()
+
+    def user(self, pk):
+        return User.objects.get(pk=pk)
+
+    def test_roles_resolved_in_one_query(self):
+        expected = {
+            self.school.owner_id: ('driving_school', self.school.id),
+            self.student.user_id: ('student', self.school.id),
+            self.instructor.user_id: ('instructor', self.school.id),
+        }
+        for pk, (role, school_id) in expected.items():
+            user = self.user(pk)
+            with self.assertNumQueries(1):
+                tenant = get_tenant(user)
+                get_tenant(user)
+            self.assertEqual((tenant.role, tenant.driving_school_id), (role, school_id))
+
+        unattached = User.objects.create_user(username='unattached', password='pass')
+        self.assertIsNone(get_tenant(unattached).driving_school_id)
+
+    def test_same_school_uses_lru_cache(self):
+        owner, student = self.user(self.school.owner_id), self.user(self.student.user_id)
+        self.assertTrue(same_school(owner, student))
+        self.assertFalse(same_school(owner, self.user(self.outsider.user_id)))
+
+        # Nouveaux objets utilisateur (requête suivante) : servis par le cache LRU
+        owner, student = self.user(self.school.owner_id), self.user(self.student.user_id)
+        with self.assertNumQueries(0):
+            self.assertTrue(same_school(owner, student))
+
+    def test_membership_change_forgets_cached_tenant(self):
+        self.assertTrue(same_school(self.user(self.school.owner_id), self.user(self.student.user_id)))
+
+        Student.objects.filter(pk=self.student.pk).update(driving_school=self.other_school)
+        self.student.refresh_from_db()
+        self.student.save()
+
+        self.assertFalse(same_school(self.user(self.school.owner_id), self.user(self.student.user_id)))
+
+    def test_lru_cache_evicts_and_expires(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
 
-# Create your tests here.
+        expired = LRUCache(maxsize=2, ttl=-1)
+        expired.set('a', 1)
+        self.assertIsNone(expired.get('a'))
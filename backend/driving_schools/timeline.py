@@ -0,0 +1,111 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import islice
+from operator import itemgetter
+
+from django.db.models import CharField, F, Value
+from django.utils import timezone
+
+# Durée estimée d'un examen
+EXAM_DURATION = timedelta(hours=2)
+# Heure d'affichage des rappels véhicules
+REMINDER_TIME = time(9, 0)
+
+SCHEDULE_FIELDS = (
+    'id', 'date', 'start_time', 'end_time', 'session_type', 'status', 'notes',
+    'student__first_name', 'student__last_name',
+    'instructor__first_name', 'instructor__last_name',
+    'vehicle__brand', 'vehicle__model', 'vehicle__license_plate',
+)
+
+EXAM_FIELDS = (
+    'id', 'exam_date', 'exam_type', 'exam_location', 'result', 'score', 'attempt_number',
+    'student__first_name', 'student__last_name',
+    'instructor__first_name', 'instructor__last_name',
+)
+
+
+def full_name(row, relation):
+    """Nom complet d'une relation projetée par .values(), ou None"""
+    if row[f'{relation}__first_name'] is None:
+        return None
+    return f"{row[f'{relation}__first_name']} {row[f'{relation}__last_name']}"
+
+
+def vehicle_label(row, prefix='vehicle__'):
+    """Libellé d'un véhicule projeté par .values() (comme Vehicle.__str__)"""
+    if row[f'{prefix}license_plate'] is None:
+        return None
+    return f"{row[f'{prefix}brand']} {row[f'{prefix}model']} ({row[f'{prefix}license_plate']})"
+
+
+def _limited(rows, limit):
+    # Une fusion des k premiers éléments n'a besoin que des k premiers de chaque source
+    if limit:
+        rows = rows[:limit]
+    return rows.iterator()
+
+
+def schedule_items(queryset, limit=None):
+    """Séances triées par début, en une requête avec jointures"""
+    rows = queryset.order_by('date', 'start_time', 'id').values(*SCHEDULE_FIELDS)
+    for row in _limited(rows, limit):
+        yield {
+            'type': 'schedule',
+            'id': row['id'],
+            'start': datetime.combine(row['date'], row['start_time']),
+            'end': datetime.combine(row['date'], row['end_time']),
+            'data': row,
+        }
+
+
+def exam_items(queryset, limit=None):
+    """Examens triés par date, en une requête avec jointures"""
+    rows = queryset.order_by('exam_date', 'id').values(*EXAM_FIELDS)
+    for row in _limited(rows, limit):
+        start = row['exam_date']
+        if timezone.is_aware(start):
+            start = timezone.make_naive(start)
+        yield {
+            'type': 'exam',
+            'id': row['id'],
+            'start': start,
+            'end': start + EXAM_DURATION,
+            'data': row,
+        }
+
+
+def vehicle_reminder_items(queryset, until, limit=None):
+    """
+    Échéances de contrôle technique et d'assurance jusqu'à `until`,
+    triées par date, en une seule requête (UNION des deux échéances).
+    """
+    fields = ('id', 'brand', 'model', 'license_plate', 'kind', 'due')
+    inspections = queryset.filter(technical_inspection_date__lte=until).annotate(
+        kind=Value('technical_inspection', output_field=CharField()),
+        due=F('technical_inspection_date'),
+    ).values(*fields)
+    insurances = queryset.filter(insurance_expiry_date__lte=until).annotate(
+        kind=Value('insurance', output_field=CharField()),
+        due=F('insurance_expiry_date'),
+    ).values(*fields)
+
+    rows = inspections.order_by().union(insurances.order_by(), all=True).order_by('due', 'id')
+    for row in _limited(rows, limit):
+        start = datetime.combine(row['due'], REMINDER_TIME)
+        yield {
+            'type': 'reminder',
+            'id': row['id'],
+            'start': start,
+            'end': start,
+            'data': row,
+        }
+
+
+def build_timeline(*sources, limit=None):
+    """
+    Fusionne des sources déjà triées par début (heapq.merge) et s'arrête
+    après `limit` éléments sans matérialiser le reste.
+    """
+    merged = heapq.merge(*sources, key=itemgetter('start'))
+    return list(islice(merged, limit))
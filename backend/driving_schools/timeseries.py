@@ -0,0 +1,114 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import models
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _shift_month(value, months):
+    """Premier jour du mois situé `months` mois après `value`"""
+    years, month_index = divmod(value.month - 1 + months, 12)
+    return date(value.year + years, month_index + 1, 1)
+
+
+def bucket_start(value, granularity):
+    """Début du bucket (jour, lundi de la semaine, 1er du mois) contenant `value`"""
+    if granularity == 'month':
+        return value.replace(day=1)
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    return value
+
+
+def next_bucket(value, granularity):
+    if granularity == 'month':
+        return _shift_month(value, 1)
+    if granularity == 'week':
+        return value + timedelta(weeks=1)
+    return value + timedelta(days=1)
+
+
+def bucket_starts(granularity, periods, end=None):
+    """
+    Liste chronologique des `periods` débuts de buckets se terminant
+    par le bucket qui contient `end` (aujourd'hui par défaut).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularité inconnue: {granularity}")
+
+    last = bucket_start(end or timezone.localdate(), granularity)
+    if granularity == 'month':
+        return [_shift_month(last, -offset) for offset in range(periods - 1, -1, -1)]
+    step = timedelta(weeks=1) if granularity == 'week' else timedelta(days=1)
+    return [last - step * offset for offset in range(periods - 1, -1, -1)]
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def _bound(model, field_name, value):
+    """Convertit une date en borne compatible avec le type du champ filtré"""
+    field = model._meta.get_field(field_name)
+    if isinstance(field, models.DateTimeField):
+        return timezone.make_aware(datetime.combine(value, time.min))
+    return value
+
+
+def time_series(queryset, date_field, aggregates, granularity='month', periods=6, end=None):
+    """
+    Agrège `queryset` par bucket calendaire en un seul GROUP BY.
+
+    `aggregates` associe un nom de colonne à une expression d'agrégat
+    (ex. {'value': Sum('amount')}). Les buckets sans ligne sont complétés par
+    des zéros. Retourne une liste chronologique de dicts
+    {'period': date, <nom>: valeur, ...}.
+    """
+    starts = bucket_starts(granularity, periods, end)
+    range_end = next_bucket(starts[-1], granularity)
+    model = queryset.model
+    trunc = GRANULARITIES[granularity]
+
+    rows = (
+        queryset.filter(**{
+            f'{date_field}__gte': _bound(model, date_field, starts[0]),
+            f'{date_field}__lt': _bound(model, date_field, range_end),
+        })
+        .order_by()
+        .annotate(period=trunc(date_field))
+        .values('period')
+        .annotate(**aggregates)
+    )
+
+    by_period = {}
+    for row in rows:
+        period = _as_date(row.pop('period'))
+        by_period[period] = row
+
+    series = []
+    for start in starts:
+        row = by_period.get(start, {})
+        point = {'period': start}
+        for name in aggregates:
+            value = row.get(name)
+            point[name] = value if value is not None else 0
+        series.append(point)
+    return series
+
+
+def to_number(value):
+    """Valeur JSON-sérialisable (les Decimal deviennent des float)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
@@ -26,6 +26,7 @@ urlpatterns = [
     path('vehicle-expenses/', views.vehicle_expenses_view, name='vehicle_expenses'),
     path('accounting-entries/', views.accounting_entries_view, name='accounting_entries'),
     path('financial-summary/', views.financial_summary_view, name='financial_summary'),
+    path('series/', views.series_view, name='series'),
     path('import-accounting-data/', views.import_existing_data_to_accounting, name='import_accounting_data'),
     path('sync-accounting-data/', views.sync_accounting_data, name='sync_accounting_data'),
     path('debug-students-payments/', views.debug_students_payments, name='debug_students_payments'),
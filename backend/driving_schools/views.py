@@ -1,6 +1,7 @@
 from rest_framework import generics, permissions, status, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -13,6 +14,14 @@ from .serializers import (
     DrivingSchoolUpdateSerializer, ExpenseSerializer, RevenueSerializer,
     DashboardStatsSerializer, SubscriptionSerializer
 )
+from .stats import get_dashboard_stats
+from .timeline import build_timeline, exam_items, full_name, schedule_items, vehicle_reminder_items
+from .timeseries import GRANULARITIES, time_series, to_number
+from .cache import cached_school_stats
+from .accounting import (
+    bulk_import_accounting, import_existing_subscription_to_accounting,
+    sync_accounting_incremental, vehicle_expense_entry
+)
 
 
 class DrivingSchoolCreateView(generics.CreateAPIView):
@@ -181,47 +190,12 @@ def dashboard_stats_view(request):
         return Response({'error': _('Auto-école non trouvée')},
                        status=status.HTTP_404_NOT_FOUND)
 
-    driving_school = user.driving_school
-
-    # Calculer les statistiques
-    total_students = driving_school.students.count()
-    active_students = driving_school.students.filter(is_active=True).count()
-    total_instructors = driving_school.instructors.count()
-    total_vehicles = driving_school.vehicles.count()
-
-    # Statistiques du mois en cours
-    current_month = timezone.now().replace(day=1)
-    next_month = (current_month + timedelta(days=32)).replace(day=1)
-
-    monthly_revenue = driving_school.revenues.filter(
-        date__gte=current_month,
-        date__lt=next_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    monthly_expenses = driving_school.expenses.filter(
-        date__gte=current_month,
-        date__lt=next_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    pending_payments = driving_school.payments.filter(status='pending').count()
-
-    # Examens à venir (7 prochains jours)
-    next_week = timezone.now() + timedelta(days=7)
-    upcoming_exams = driving_school.exams.filter(
-        exam_date__gte=timezone.now(),
-        exam_date__lte=next_week
-    ).count()
-
-    stats = {
-        'total_students': total_students,
-        'active_students': active_students,
-        'total_instructors': total_instructors,
-        'total_vehicles': total_vehicles,
-        'monthly_revenue': monthly_revenue,
-        'monthly_expenses': monthly_expenses,
-        'pending_payments': pending_payments,
-        'upcoming_exams': upcoming_exams,
-    }
+    # Toutes les statistiques sont calculées en une seule requête, puis mises en cache
+    driving_school_id = user.driving_school.id
+    stats = cached_school_stats(
+        driving_school_id, 'dashboard',
+        lambda: get_dashboard_stats(driving_school_id)
+    )
 
     serializer = DashboardStatsSerializer(stats)
     return Response(serializer.data)
@@ -720,28 +694,17 @@ def vehicle_expenses_view(request):
             )
 
             # Créer automatiquement une écriture comptable pour la dépense véhicule
-            from .models import AccountingEntry
-            AccountingEntry.objects.create(
-                driving_school=driving_school,
-                entry_type='expense',
-                category='vehicle',
-                description=f"Véhicule {vehicle.license_plate} - {description}",
-                amount=amount,
-                date=date,
-                vehicle_expense=expense
-            )
+            vehicle_expense_entry(driving_school, expense).save()
 
             # Envoyer une notification à l'auto-école si c'est un moniteur qui a ajouté la dépense
             if user.user_type == 'instructor':
                 try:
-                    from notifications.models import Notification
-                    from channels.layers import get_channel_layer
-                    from asgiref.sync import async_to_sync
+                    from notifications.utils import create_notification
 
                     driving_school_user = driving_school.owner
                     instructor_name = f"{user.instructor_profile.first_name} {user.instructor_profile.last_name}"
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=driving_school_user,
                         notification_type='vehicle_expense',
                         title='Nouvelle dépense véhicule',
@@ -750,25 +713,6 @@ def vehicle_expenses_view(request):
                         related_vehicle_id=vehicle.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{driving_school_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
                     print(f"📨 Notification de dépense véhicule envoyée à l'auto-école {driving_school_user.username}")
                 except Exception as e:
                     print(f"❌ Erreur lors de l'envoi de la notification de dépense: {e}")
@@ -809,9 +753,8 @@ def accounting_entries_view(request):
             from .models import AccountingEntry, VehicleExpense
             from datetime import datetime, timedelta
 
-            # Synchroniser automatiquement toutes les données à chaque appel
-            sync_all_accounting_data(driving_school)
-
+            # La synchronisation comptable est faite par les signaux et
+            # la commande sync_accounting, pas dans la lecture
             # Filtrer par période
             period = request.GET.get('period', 'month')
             today = timezone.now().date()
@@ -925,9 +868,6 @@ def financial_summary_view(request):
         from datetime import datetime, timedelta
         from django.db.models import Sum, Q
 
-        # Synchroniser automatiquement toutes les données
-        sync_all_accounting_data(driving_school)
-
         # Filtrer par période
         period = request.GET.get('period', 'month')
         today = timezone.now().date()
@@ -987,30 +927,28 @@ def financial_summary_view(request):
                 'percentage': percentage
             })
 
-        # Données mensuelles (pour les 6 derniers mois)
-        monthly_data = []
-        for i in range(6):
-            month_start = today.replace(day=1) - timedelta(days=i*30)
-            month_end = month_start + timedelta(days=30)
-
-            month_entries = entries.filter(date__gte=month_start, date__lt=month_end)
-
-            month_revenue = month_entries.filter(entry_type='revenue').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-
-            month_expenses = month_entries.filter(entry_type='expense').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-
-            monthly_data.append({
-                'month': month_start.strftime('%B %Y'),
-                'revenue': float(month_revenue),
-                'expenses': float(month_expenses),
-                'profit': float(month_revenue - month_expenses)
-            })
+        # Données mensuelles (6 derniers mois calendaires, un seul GROUP BY)
+        monthly_series = time_series(
+            AccountingEntry.objects.filter(driving_school=driving_school),
+            'date',
+            {
+                'revenue': Sum('amount', filter=Q(entry_type='revenue')),
+                'expenses': Sum('amount', filter=Q(entry_type='expense')),
+            },
+            granularity='month',
+            periods=6,
+            end=today,
+        )
 
-        monthly_data.reverse()  # Ordre chronologique
+        monthly_data = [
+            {
+                'month': point['period'].strftime('%B %Y'),
+                'revenue': float(point['revenue']),
+                'expenses': float(point['expenses']),
+                'profit': float(point['revenue'] - point['expenses'])
+            }
+            for point in monthly_series
+        ]
 
         summary = {
             'total_revenue': float(total_revenue),
@@ -1027,115 +965,117 @@ def financial_summary_view(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def create_subscription_accounting_entry(driving_school, plan_type, amount, is_renewal=False):
-    """
-    Créer automatiquement une écriture comptable pour les abonnements
+SERIES_MAX_PERIODS = 60
+SERIES_FINANCIAL_METRICS = ('revenue', 'expenses')
+
+
+def _series_metrics(driving_school):
+    """Séries disponibles pour une auto-école: (queryset, champ date, agrégats)"""
+    from .models import AccountingEntry
+    from payments.models import PaymentLog
+    from schedules.models import Schedule
+    from students.models import Student
+
+    entries = AccountingEntry.objects.filter(driving_school=driving_school)
+    return {
+        'revenue': (entries.filter(entry_type='revenue'), 'date', {'value': Sum('amount')}),
+        'expenses': (entries.filter(entry_type='expense'), 'date', {'value': Sum('amount')}),
+        'payments': (
+            PaymentLog.objects.filter(student__driving_school=driving_school),
+            'created_at', {'value': Sum('amount')}
+        ),
+        'students': (
+            Student.objects.filter(driving_school=driving_school),
+            'created_at', {'value': Count('id')}
+        ),
+        'schedules': (
+            Schedule.objects.filter(driving_school=driving_school),
+            'date', {'value': Count('id')}
+        ),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def series_view(request):
     """
-    try:
-        from .models import AccountingEntry
+    Série temporelle générique pour l'auto-école.
 
-        description = f"{'Renouvellement' if is_renewal else 'Achat'} plan {plan_type.title()}"
+    Paramètres: metric, granularity (day/week/month), periods, end (AAAA-MM-JJ).
+    """
+    user = request.user
 
-        AccountingEntry.objects.create(
-            driving_school=driving_school,
-            entry_type='expense',
-            category='subscription',
-            description=description,
-            amount=amount,
-            date=timezone.now().date()
-        )
-    except Exception as e:
-        print(f"Erreur lors de la création de l'écriture comptable d'abonnement: {e}")
+    # Déterminer l'auto-école selon le type d'utilisateur
+    driving_school = None
+    if hasattr(user, 'driving_school'):
+        driving_school = user.driving_school
+    elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
+        driving_school = user.instructor_profile.driving_school
 
+    if not driving_school:
+        return Response({'error': _('Auto-école non trouvée')},
+                       status=status.HTTP_404_NOT_FOUND)
 
-def import_existing_payments_to_accounting(driving_school):
-    """
-    Importer automatiquement tous les paiements existants des candidats en tant que revenus
-    """
-    imported_count = 0
-    try:
-        from .models import AccountingEntry
-        from students.models import Student
+    metrics = _series_metrics(driving_school)
+    metric = request.GET.get('metric', 'revenue')
+    granularity = request.GET.get('granularity', 'month')
 
-        # Récupérer tous les candidats de l'auto-école avec des paiements
-        students = Student.objects.filter(
-            driving_school=driving_school,
-            paid_amount__gt=0  # Seulement ceux qui ont payé quelque chose
-        )
+    if metric not in metrics:
+        return Response({'error': _('Métrique inconnue'), 'metrics': list(metrics)},
+                       status=status.HTTP_400_BAD_REQUEST)
+    if granularity not in GRANULARITIES:
+        return Response({'error': _('Granularité invalide'), 'granularities': list(GRANULARITIES)},
+                       status=status.HTTP_400_BAD_REQUEST)
 
-        print(f"Trouvé {students.count()} candidats avec des paiements")
+    try:
+        periods = int(request.GET.get('periods', 6))
+        end = request.GET.get('end')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+    except ValueError:
+        return Response({'error': _('Paramètres invalides')},
+                       status=status.HTTP_400_BAD_REQUEST)
+    periods = max(1, min(periods, SERIES_MAX_PERIODS))
 
-        for student in students:
-            # Importer le montant payé par le candidat
-            if student.paid_amount > 0:
-                # Vérifier si cette écriture existe déjà
-                existing_entry = AccountingEntry.objects.filter(
-                    driving_school=driving_school,
-                    entry_type='revenue',
-                    category='student_fees',
-                    description__contains=f"{student.first_name} {student.last_name}",
-                    amount=student.paid_amount
-                ).first()
-
-                if not existing_entry:
-                    AccountingEntry.objects.create(
-                        driving_school=driving_school,
-                        entry_type='revenue',
-                        category='student_fees',
-                        description=f"Paiement candidat - {student.first_name} {student.last_name}",
-                        amount=student.paid_amount,
-                        date=student.created_at.date()
-                    )
-                    imported_count += 1
-                    print(f"Ajouté paiement de {student.paid_amount} DT pour {student.first_name} {student.last_name}")
+    # Les séries financières sont réservées au plan Premium
+    if metric in SERIES_FINANCIAL_METRICS and driving_school.current_plan != 'premium':
+        return Response({'error': _('Fonctionnalité disponible uniquement pour le plan Premium')},
+                       status=status.HTTP_403_FORBIDDEN)
 
-    except Exception as e:
-        print(f"Erreur lors de l'importation des paiements: {e}")
+    queryset, date_field, aggregates = metrics[metric]
+    series = time_series(
+        queryset, date_field, aggregates,
+        granularity=granularity, periods=periods, end=end
+    )
 
-    return imported_count
+    return Response({
+        'metric': metric,
+        'granularity': granularity,
+        'series': [
+            {'period': point['period'].isoformat(), 'value': to_number(point['value'])}
+            for point in series
+        ],
+    })
 
 
-def import_existing_subscription_to_accounting(driving_school):
+def create_subscription_accounting_entry(driving_school, plan_type, amount, is_renewal=False):
     """
-    Importer l'abonnement actuel comme dépense si ce n'est pas déjà fait
+    Créer automatiquement une écriture comptable pour les abonnements
     """
-    imported_count = 0
     try:
         from .models import AccountingEntry
 
-        print(f"Plan actuel: {driving_school.current_plan}")
-
-        if driving_school.current_plan in ['standard', 'premium']:
-            plan_prices = {
-                'standard': 50.00,
-                'premium': 100.00
-            }
-
-            # Vérifier si l'abonnement actuel est déjà en comptabilité
-            existing_entry = AccountingEntry.objects.filter(
-                driving_school=driving_school,
-                entry_type='expense',
-                category='subscription'
-            ).first()
-
-            if not existing_entry and driving_school.current_plan in plan_prices:
-                AccountingEntry.objects.create(
-                    driving_school=driving_school,
-                    entry_type='expense',
-                    category='subscription',
-                    description=f"Abonnement plan {driving_school.current_plan.title()}",
-                    amount=plan_prices[driving_school.current_plan],
-                    date=driving_school.plan_start_date.date() if driving_school.plan_start_date else timezone.now().date()
-                )
-                imported_count += 1
-                print(f"Ajouté abonnement {driving_school.current_plan} - {plan_prices[driving_school.current_plan]} DT")
-            else:
-                print(f"Abonnement déjà existant ou plan non payant")
+        description = f"{'Renouvellement' if is_renewal else 'Achat'} plan {plan_type.title()}"
 
+        AccountingEntry.objects.create(
+            driving_school=driving_school,
+            entry_type='expense',
+            category='subscription',
+            description=description,
+            amount=amount,
+            date=timezone.now().date()
+        )
     except Exception as e:
-        print(f"Erreur lors de l'importation de l'abonnement: {e}")
-
-    return imported_count
+        print(f"Erreur lors de la création de l'écriture comptable d'abonnement: {e}")
 
 
 def create_payment_accounting_entry(driving_school, student, amount, payment_date=None):
@@ -1179,24 +1119,21 @@ def import_existing_data_to_accounting(request):
     try:
         from .models import AccountingEntry
 
-        # Supprimer SEULEMENT les écritures automatiques spécifiques (pas les dépenses véhicules ni les manuelles)
+        # Suppressions et import validés ensemble : un échec en cours de route
+        # laisse la comptabilité inchangée
+        with transaction.atomic():
+            # Supprimer SEULEMENT les écritures automatiques spécifiques (pas les dépenses véhicules ni les manuelles)
 
-        # Supprimer seulement les abonnements automatiques
-        AccountingEntry.objects.filter(
-            driving_school=driving_school,
-            category='subscription'  # Abonnements automatiques
-        ).delete()
-
-        # Supprimer seulement les paiements étudiants automatiques (pas les revenus manuels)
-        AccountingEntry.objects.filter(
-            driving_school=driving_school,
-            category='student_fees',
-            description__contains='Paiement candidat'  # Seulement les automatiques
-        ).delete()
+            # Supprimer seulement les abonnements automatiques
+            AccountingEntry.objects.filter(
+                driving_school=driving_school,
+                category='subscription'  # Abonnements automatiques
+            ).delete()
 
-        # Importer seulement les données manquantes
-        payments_imported = import_existing_payments_to_accounting(driving_school)
-        subscription_imported = import_existing_subscription_to_accounting(driving_school)
+            # Importer seulement les données manquantes (import idempotent par référence source)
+            imported = bulk_import_accounting(driving_school)
+            payments_imported = imported['payment_log'] + imported['student_balance'] + imported['vehicle_expense']
+            subscription_imported = import_existing_subscription_to_accounting(driving_school)
 
         # Compter les écritures créées
         total_entries = AccountingEntry.objects.filter(driving_school=driving_school).count()
@@ -1468,6 +1405,24 @@ def recent_activities_view(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+UPCOMING_EVENTS_LIMIT = 15
+
+VEHICLE_REMINDERS = {
+    'technical_inspection': {
+        'prefix': 'tech',
+        'title': 'Contrôle technique',
+        'location': 'Centre de contrôle',
+        'color': 'text-red-600 dark:text-red-400',
+    },
+    'insurance': {
+        'prefix': 'insurance',
+        'title': 'Renouvellement assurance',
+        'location': 'Assurance',
+        'color': 'text-yellow-600 dark:text-yellow-400',
+    },
+}
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def upcoming_events_view(request):
@@ -1480,111 +1435,77 @@ def upcoming_events_view(request):
     driving_school = user.driving_school
 
     try:
-        events = []
+        from exams.models import Exam
+        from schedules.models import Schedule
+        from vehicles.models import Vehicle
 
-        # Import des modèles avec gestion d'erreur
-        try:
-            from exams.models import Exam
-        except ImportError:
-            Exam = None
+        now = timezone.now()
+        today = timezone.localdate()
 
-        try:
-            from schedules.models import Schedule
-        except ImportError:
-            Schedule = None
-
-        try:
-            from vehicles.models import Vehicle
-        except ImportError:
-            Vehicle = None
-
-        # Examens à venir (30 prochains jours)
-        if Exam:
-            upcoming_exams = Exam.objects.filter(
-                student__driving_school=driving_school,
-                exam_date__gte=timezone.now(),
-                exam_date__lte=timezone.now() + timedelta(days=30)
-            ).order_by('exam_date')[:10]
+        timeline = build_timeline(
+            # Examens à venir (30 prochains jours)
+            exam_items(Exam.objects.filter(
+                driving_school=driving_school,
+                exam_date__gte=now,
+                exam_date__lte=now + timedelta(days=30)
+            ), limit=10),
+            # Séances programmées (7 prochains jours)
+            schedule_items(Schedule.objects.filter(
+                driving_school=driving_school,
+                date__gte=today,
+                date__lte=today + timedelta(days=7),
+                status='scheduled'
+            ), limit=10),
+            # Rappels véhicules (contrôle technique, assurance dans les 30 prochains jours)
+            vehicle_reminder_items(Vehicle.objects.filter(
+                driving_school=driving_school,
+                status='active'
+            ), until=today + timedelta(days=30), limit=UPCOMING_EVENTS_LIMIT),
+            limit=UPCOMING_EVENTS_LIMIT
+        )
 
-            for exam in upcoming_exams:
-                events.append({
-                    'id': f'exam_{exam.id}',
+        events = []
+        for item in timeline:
+            row = item['data']
+            event = {
+                'date': item['start'].date().isoformat(),
+                'time': item['start'].strftime('%H:%M'),
+            }
+            if item['type'] == 'exam':
+                event.update({
+                    'id': f"exam_{row['id']}",
                     'type': 'exam',
-                    'title': f'Examen {exam.exam_type}',
-                    'description': f'{exam.student.first_name} {exam.student.last_name}',
-                    'date': exam.exam_date.date().isoformat(),
-                    'time': exam.exam_date.time().strftime('%H:%M'),
-                    'location': exam.exam_location or 'Centre d\'examen',
+                    'title': f"Examen {row['exam_type']}",
+                    'description': full_name(row, 'student'),
+                    'location': row['exam_location'] or 'Centre d\'examen',
                     'icon': 'ClipboardDocumentListIcon',
                     'color': 'text-purple-600 dark:text-purple-400'
                 })
-
-        # Séances programmées (7 prochains jours)
-        if Schedule:
-            upcoming_sessions = Schedule.objects.filter(
-                student__driving_school=driving_school,
-                date__gte=timezone.now().date(),
-                date__lte=timezone.now().date() + timedelta(days=7),
-                status='scheduled'
-            ).order_by('date', 'start_time')[:10]
-
-            for session in upcoming_sessions:
-                instructor_name = ""
-                if hasattr(session, 'instructor') and session.instructor:
-                    instructor_name = f" avec {session.instructor.first_name} {session.instructor.last_name}"
-
-                events.append({
-                    'id': f'session_{session.id}',
+            elif item['type'] == 'schedule':
+                instructor_name = full_name(row, 'instructor')
+                event.update({
+                    'id': f"session_{row['id']}",
                     'type': 'session',
-                    'title': f'Séance {session.session_type}',
-                    'description': f'{session.student.first_name} {session.student.last_name}{instructor_name}',
-                    'date': session.date.isoformat(),
-                    'time': session.start_time.strftime('%H:%M'),
+                    'title': f"Séance {row['session_type']}",
+                    'description': full_name(row, 'student') + (f" avec {instructor_name}" if instructor_name else ''),
                     'location': 'Auto-école',
                     'icon': 'CalendarDaysIcon',
                     'color': 'text-blue-600 dark:text-blue-400'
                 })
+            else:
+                reminder = VEHICLE_REMINDERS[row['kind']]
+                event.update({
+                    'id': f"{reminder['prefix']}_{row['id']}",
+                    'type': 'reminder',
+                    'title': reminder['title'],
+                    'description': f"{row['brand']} {row['model']} - {row['license_plate']}",
+                    'location': reminder['location'],
+                    'icon': 'ExclamationTriangleIcon',
+                    'color': reminder['color']
+                })
+            events.append(event)
 
-        # Rappels véhicules (contrôle technique, assurance)
-        if Vehicle:
-            vehicles_reminders = Vehicle.objects.filter(
-                driving_school=driving_school,
-                status='active'
-            )
-
-            for vehicle in vehicles_reminders:
-                # Contrôle technique dans les 30 prochains jours
-                if vehicle.technical_inspection_date and vehicle.technical_inspection_date <= timezone.now().date() + timedelta(days=30):
-                    events.append({
-                        'id': f'tech_{vehicle.id}',
-                        'type': 'reminder',
-                        'title': 'Contrôle technique',
-                        'description': f'{vehicle.brand} {vehicle.model} - {vehicle.license_plate}',
-                        'date': vehicle.technical_inspection_date.isoformat(),
-                        'time': '09:00',
-                        'location': 'Centre de contrôle',
-                        'icon': 'ExclamationTriangleIcon',
-                        'color': 'text-red-600 dark:text-red-400'
-                    })
-
-                # Assurance dans les 30 prochains jours
-                if vehicle.insurance_expiry_date and vehicle.insurance_expiry_date <= timezone.now().date() + timedelta(days=30):
-                    events.append({
-                        'id': f'insurance_{vehicle.id}',
-                        'type': 'reminder',
-                        'title': 'Renouvellement assurance',
-                        'description': f'{vehicle.brand} {vehicle.model} - {vehicle.license_plate}',
-                        'date': vehicle.insurance_expiry_date.isoformat(),
-                        'time': '09:00',
-                        'location': 'Assurance',
-                        'icon': 'ExclamationTriangleIcon',
-                        'color': 'text-yellow-600 dark:text-yellow-400'
-                    })
-
-        # Trier par date croissante
-        events.sort(key=lambda x: (x['date'], x['time']))
-
-        return Response(events[:15])  # Limiter à 15 événements
+        return Response(events)
 
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1646,13 +1567,14 @@ def sync_accounting_data(request):
     try:
         from .models import AccountingEntry
 
-        # Importer seulement les nouvelles données (sans supprimer)
-        payments_imported = import_existing_payments_to_accounting(driving_school)
-        subscription_imported = import_existing_subscription_to_accounting(driving_school)
+        # Importer seulement les données créées depuis la dernière synchronisation
+        result = sync_accounting_incremental(driving_school)
+        payments_imported = result['payments_imported']
+        subscription_imported = result['subscription_imported']
 
         # Compter les écritures totales
         total_entries = AccountingEntry.objects.filter(driving_school=driving_school).count()
-        new_entries = payments_imported + subscription_imported
+        new_entries = sum(result.values())
 
         return Response({
             'message': f'Synchronisation terminée. {new_entries} nouvelles écritures ajoutées.',
@@ -1666,59 +1588,6 @@ def sync_accounting_data(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def sync_all_accounting_data(driving_school):
-    """
-    Synchroniser automatiquement toutes les données comptables
-    """
-    try:
-        from .models import AccountingEntry, VehicleExpense
-
-        # 1. Synchroniser les paiements étudiants
-        import_existing_payments_to_accounting(driving_school)
-
-        # 2. Synchroniser l'abonnement
-        import_existing_subscription_to_accounting(driving_school)
-
-        # 3. Synchroniser les dépenses véhicules
-        sync_vehicle_expenses_to_accounting(driving_school)
-
-    except Exception as e:
-        print(f"Erreur lors de la synchronisation complète: {e}")
-
-
-def sync_vehicle_expenses_to_accounting(driving_school):
-    """
-    Synchroniser les dépenses véhicules vers la comptabilité
-    """
-    try:
-        from .models import AccountingEntry, VehicleExpense
-
-        # Récupérer toutes les dépenses véhicules qui n'ont pas d'écriture comptable
-        vehicle_expenses = VehicleExpense.objects.filter(
-            driving_school=driving_school,
-            accounting_entry__isnull=True  # Pas encore en comptabilité
-        )
-
-        print(f"Trouvé {vehicle_expenses.count()} dépenses véhicules à synchroniser")
-
-        for expense in vehicle_expenses:
-            # Créer l'écriture comptable pour cette dépense véhicule
-            accounting_entry = AccountingEntry.objects.create(
-                driving_school=driving_school,
-                entry_type='expense',
-                category='vehicle',
-                description=f"Véhicule {expense.vehicle.license_plate} - {expense.description}",
-                amount=expense.amount,
-                date=expense.date,
-                vehicle_expense=expense
-            )
-            print(f"Synchronisé dépense véhicule: {expense.description} - {expense.amount} DT")
-
-    except Exception as e:
-        print(f"Erreur lors de la synchronisation des dépenses véhicules: {e}")
-
-
-
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_driving_school_status_view(request):
@@ -4,6 +4,13 @@
 echo "Waiting for database..."
 sleep 5
 
+# Répartiteur des notifications temps réel (outbox -> WebSockets) : processus
+# distinct (`/entrypoint.sh worker`), redémarré par l'orchestrateur s'il s'arrête
+if [ "$1" = "worker" ]; then
+    echo "Starting notification dispatcher..."
+    exec python manage.py dispatch_notifications
+fi
+
 # Exécuter les migrations
 echo "Running migrations..."
 python manage.py migrate
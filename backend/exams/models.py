@@ -162,9 +162,13 @@ class Exam(models.Model):
         if self.pk is None:  # Nouvel examen
             if self.exam_type == 'theory':
                 self.student.theory_exam_attempts += 1
+                attempts_field = 'theory_exam_attempts'
             else:
                 self.student.practical_exam_attempts += 1
-            self.student.save()
+                attempts_field = 'practical_exam_attempts'
+            # Seul le compteur de tentatives : les heures du candidat chargé
+            # peuvent être périmées
+            self.student.save(update_fields=[attempts_field, 'updated_at'])
 
         super().save(*args, **kwargs)
 
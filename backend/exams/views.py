@@ -8,6 +8,7 @@ from django.utils.translation import gettext_lazy as _
 from django.http import Http404
 
 from .models import Exam, ExamSession
+from driving_schools.cache import cached_school_stats
 from .serializers import (
     ExamSerializer, ExamCreateSerializer, ExamUpdateSerializer, ExamListSerializer,
     ExamSessionSerializer, ExamSessionCreateSerializer, ExamSessionUpdateSerializer,
@@ -158,18 +159,8 @@ def register_for_exam_view(request, session_id):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def exam_stats_view(request):
-    """Vue pour les statistiques d'examens"""
-    user = request.user
-
-    if not hasattr(user, 'driving_school'):
-        return Response({'error': _('Auto-école non trouvée')},
-                       status=status.HTTP_404_NOT_FOUND)
-
-    driving_school = user.driving_school
-
+def _compute_exam_stats(driving_school):
+    """Calcule les statistiques d'examens d'une auto-école"""
     # Statistiques générales
     total_exams = driving_school.exams.count()
     passed_exams = driving_school.exams.filter(result='passed').count()
@@ -200,7 +191,7 @@ def exam_stats_view(request):
         result='pending'
     ).count()
 
-    stats = {
+    return {
         'total_exams': total_exams,
         'passed_exams': passed_exams,
         'failed_exams': failed_exams,
@@ -211,5 +202,22 @@ def exam_stats_view(request):
         'upcoming_exams': upcoming_exams,
     }
 
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def exam_stats_view(request):
+    """Vue pour les statistiques d'examens"""
+    user = request.user
+
+    if not hasattr(user, 'driving_school'):
+        return Response({'error': _('Auto-école non trouvée')},
+                       status=status.HTTP_404_NOT_FOUND)
+
+    driving_school = user.driving_school
+    stats = cached_school_stats(
+        driving_school.id, 'exams',
+        lambda: _compute_exam_stats(driving_school)
+    )
+
     serializer = ExamStatsSerializer(stats)
     return Response(serializer.data)
@@ -14,6 +14,7 @@ from .serializers import (
 )
 from accounts.models import User
 from driving_schools.models import DrivingSchool
+from driving_schools.timeline import build_timeline, full_name, schedule_items, vehicle_label
 from notifications.utils import notify_instructor_update
 
 
@@ -157,26 +158,23 @@ def instructor_schedule_view(request, pk):
     start_date = timezone.now().date()
     end_date = start_date + timedelta(days=7)
 
-    schedules = instructor.schedules.filter(
+    timeline = build_timeline(schedule_items(instructor.schedules.filter(
         date__gte=start_date,
         date__lte=end_date
-    ).order_by('date', 'start_time')
+    )))
 
     # Organiser par date
     schedule_by_date = {}
-    for schedule in schedules:
-        date_str = schedule.date.isoformat()
-        if date_str not in schedule_by_date:
-            schedule_by_date[date_str] = []
-
-        schedule_by_date[date_str].append({
-            'id': schedule.id,
-            'start_time': schedule.start_time,
-            'end_time': schedule.end_time,
-            'session_type': schedule.session_type,
-            'student_name': schedule.student.full_name if schedule.student else None,
-            'vehicle': str(schedule.vehicle) if schedule.vehicle else None,
-            'status': schedule.status,
+    for item in timeline:
+        row = item['data']
+        schedule_by_date.setdefault(row['date'].isoformat(), []).append({
+            'id': row['id'],
+            'start_time': row['start_time'],
+            'end_time': row['end_time'],
+            'session_type': row['session_type'],
+            'student_name': full_name(row, 'student'),
+            'vehicle': vehicle_label(row),
+            'status': row['status'],
         })
 
     # Créer la réponse
@@ -1,33 +1,44 @@
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from driving_schools.tenancy import get_tenant, same_school
+from permini_project.instrumentation import InstrumentedConsumerMixin
+
+from .directory import sender_data
 from .models import DirectMessage
+from .summaries import mark_direct_messages_read
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-def get_user_photo_url(user, profile=None):
-    """Helper function to get user photo URL"""
-    # First check if user has a photo
-    if user.photo:
-        return user.photo.url
+# Messages en attente de diffusion par connexion (au-delà, l'envoi est refusé)
+SEND_QUEUE_SIZE = 100
+# Messages diffusés par passage du worker
+FANOUT_BATCH_SIZE = 20
+# Contacts dont les informations d'affichage restent en mémoire par connexion
+DISPLAY_CACHE_SIZE = 256
 
-    # Then check profile-specific photos
-    if profile and hasattr(profile, 'photo') and profile.photo:
-        return profile.photo.url
 
-    return None
-
-class MessagingConsumer(AsyncWebsocketConsumer):
+class MessagingConsumer(InstrumentedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # Accepter TOUTES les connexions sans condition
         await self.accept()
-        print("✅ WebSocket connecté - en attente d'authentification")
+        logger.debug("WebSocket connecté - en attente d'authentification")
 
         # Initialiser les variables
         self.user = None
         self.user_group_name = None
         self.authenticated = False
+        # Informations d'affichage de l'utilisateur et des contacts déjà vérifiés
+        self.display = None
+        self.contacts = {}
+        self.send_queue = None
+        self.fanout_task = None
 
         # Envoyer un message de bienvenue
         await self.send(text_data=json.dumps({
@@ -36,13 +47,15 @@ class MessagingConsumer(AsyncWebsocketConsumer):
         }))
 
     async def disconnect(self, close_code):
+        await self.stop_fanout()
+
         # Quitter le groupe de l'utilisateur seulement s'il était authentifié
         if hasattr(self, 'user_group_name') and self.user_group_name:
-            print(f"🔍 Tentative de déconnexion du groupe: '{self.user_group_name}' (type: {type(self.user_group_name)})")
+            logger.debug("Tentative de déconnexion du groupe: '%s' (type: %s)", self.user_group_name, type(self.user_group_name))
 
             # S'assurer que c'est une string
             if not isinstance(self.user_group_name, str):
-                print(f"❌ Le nom du groupe n'est pas une string: {type(self.user_group_name)}")
+                logger.warning("Le nom du groupe n'est pas une string: %s", type(self.user_group_name))
                 return
 
             # Vérifier que le nom du groupe est valide
@@ -52,20 +65,20 @@ class MessagingConsumer(AsyncWebsocketConsumer):
                         self.user_group_name,
                         self.channel_name
                     )
-                    print(f"✅ Déconnecté du groupe: {self.user_group_name}")
+                    logger.debug("Déconnecté du groupe: %s", self.user_group_name)
                 except Exception as e:
-                    print(f"⚠️ Erreur lors de la déconnexion du groupe: {e}")
+                    logger.warning("Erreur lors de la déconnexion du groupe: %s", e)
             else:
-                print(f"❌ Nom de groupe invalide: '{self.user_group_name}' (longueur: {len(self.user_group_name)})")
+                logger.warning("Nom de groupe invalide: '%s' (longueur: %s)", self.user_group_name, len(self.user_group_name))
         else:
-            print("🔍 Pas de groupe à quitter (utilisateur non authentifié)")
+            logger.debug("Pas de groupe à quitter (utilisateur non authentifié)")
 
         username = getattr(self, 'user', None)
         if username:
             username = getattr(username, 'username', 'Anonyme')
         else:
             username = 'Anonyme'
-        print(f"❌ WebSocket déconnecté pour l'utilisateur {username}")
+        logger.debug("WebSocket déconnecté pour l'utilisateur %s", username)
 
     def is_valid_group_name(self, name):
         """Vérifier si le nom du groupe est valide selon les règles de Channels"""
@@ -94,7 +107,7 @@ class MessagingConsumer(AsyncWebsocketConsumer):
                 await self.handle_mark_read(data)
 
         except Exception as e:
-            print(f"❌ Erreur dans receive: {e}")
+            logger.exception("Erreur dans receive: %s", e)
             await self.send_error('Erreur serveur')
 
     async def handle_authenticate(self, data):
@@ -104,20 +117,21 @@ class MessagingConsumer(AsyncWebsocketConsumer):
                 await self.send_error('Token requis')
                 return
 
-            user = await self.authenticate_user(token)
-            if not user:
+            identity = await self.authenticate_user(token)
+            if not identity:
                 await self.send_error('Token invalide')
                 return
 
-            self.user = user
+            self.user, self.display = identity
+            self.start_fanout()
             self.authenticated = True
             self.user_group_name = f"user_{self.user.id}"
 
-            print(f"🔍 Création du groupe: '{self.user_group_name}' pour l'utilisateur {self.user.username}")
+            logger.debug("Création du groupe: '%s' pour l'utilisateur %s", self.user_group_name, self.user.username)
 
             # Vérifier que le nom du groupe est valide
             if not self.is_valid_group_name(self.user_group_name):
-                print(f"❌ Nom de groupe invalide: '{self.user_group_name}'")
+                logger.warning("Nom de groupe invalide: '%s'", self.user_group_name)
                 await self.send_error('Erreur de configuration du groupe')
                 return
 
@@ -137,10 +151,10 @@ class MessagingConsumer(AsyncWebsocketConsumer):
                 }
             }))
 
-            print(f"✅ WebSocket authentifié pour {self.user.username}")
+            logger.debug("WebSocket authentifié pour %s", self.user.username)
 
         except Exception as e:
-            print(f"❌ Erreur authentification: {e}")
+            logger.exception("Erreur authentification: %s", e)
             await self.send_error('Erreur d\'authentification')
 
     async def send_error(self, message):
@@ -151,82 +165,105 @@ class MessagingConsumer(AsyncWebsocketConsumer):
         }))
 
     async def handle_send_message(self, data):
-        """Gérer l'envoi d'un message"""
+        """
+        Gérer l'envoi d'un message : un seul appel à la base crée le message
+        et fournit les informations d'affichage, la diffusion est confiée à
+        la file d'envoi de la connexion.
+        """
         try:
             recipient_id = data.get('recipient_id')
             content = data.get('content', '').strip()
-            
+
             if not recipient_id or not content:
                 await self.send(text_data=json.dumps({
                     'type': 'error',
                     'message': 'Destinataire et contenu requis'
                 }))
                 return
-            
+
+            if self.send_queue.full():
+                await self.send_error('Trop de messages en attente, réessayez')
+                return
+
             # Créer le message dans la base de données
-            message = await self.create_message(self.user.id, recipient_id, content)
-            
-            if message:
-                # Get sender and recipient profiles for photos
-                sender_profile = await self.get_user_profile(message.sender)
-                recipient_profile = await self.get_user_profile(message.recipient)
-
-                # Envoyer le message au destinataire
-                await self.channel_layer.group_send(
-                    f"user_{recipient_id}",
-                    {
-                        'type': 'new_message',
-                        'message': {
-                            'id': message.id,
-                            'content': message.content,
-                            'sender': {
-                                'id': message.sender.id,
-                                'first_name': message.sender.first_name,
-                                'last_name': message.sender.last_name,
-                                'photo': get_user_photo_url(message.sender, sender_profile)
-                            },
-                            'recipient': {
-                                'id': message.recipient.id,
-                                'first_name': message.recipient.first_name,
-                                'last_name': message.recipient.last_name,
-                                'photo': get_user_photo_url(message.recipient, recipient_profile)
-                            },
-                            'created_at': message.created_at.isoformat(),
-                            'is_read': message.is_read
-                        }
-                    }
-                )
+            message = await self.create_message(recipient_id, content)
+            if message is None:
+                await self.send_error('Destinataire non autorisé')
+                return
+
+            await self.send_queue.put(message)
 
-                # Confirmer l'envoi à l'expéditeur
-                await self.send(text_data=json.dumps({
-                    'type': 'message_sent',
-                    'message': {
-                        'id': message.id,
-                        'content': message.content,
-                        'sender': {
-                            'id': message.sender.id,
-                            'first_name': message.sender.first_name,
-                            'last_name': message.sender.last_name,
-                            'photo': get_user_photo_url(message.sender, sender_profile)
-                        },
-                        'recipient': {
-                            'id': message.recipient.id,
-                            'first_name': message.recipient.first_name,
-                            'last_name': message.recipient.last_name,
-                            'photo': get_user_photo_url(message.recipient, recipient_profile)
-                        },
-                        'created_at': message.created_at.isoformat(),
-                        'is_read': message.is_read
-                    }
-                }))
-                
         except Exception as e:
-            print(f"Erreur lors de l'envoi du message: {e}")
+            logger.exception("Erreur lors de l'envoi du message: %s", e)
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Erreur lors de l\'envoi du message'
             }))
 
+    def start_fanout(self):
+        """Démarre la file d'envoi bornée et son worker"""
+        if self.fanout_task is None:
+            self.send_queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+            self.fanout_task = asyncio.create_task(self.fanout_worker())
+
+    async def stop_fanout(self):
+        """Arrête le worker puis remet les messages restants aux destinataires"""
+        if self.fanout_task is None:
+            return
+        self.fanout_task.cancel()
+        try:
+            await self.fanout_task
+        except asyncio.CancelledError:
+            pass
+        self.fanout_task = None
+
+        pending = []
+        while not self.send_queue.empty():
+            pending.append(self.send_queue.get_nowait())
+        if pending:
+            await self.deliver(pending)
+
+    async def fanout_worker(self):
+        """Diffuse les messages de la file par lots"""
+        while True:
+            batch = [await self.send_queue.get()]
+            while len(batch) < FANOUT_BATCH_SIZE and not self.send_queue.empty():
+                batch.append(self.send_queue.get_nowait())
+            try:
+                await self.deliver(batch)
+
+                # Confirmer l'envoi à l'expéditeur, dans l'ordre
+                for message in batch:
+                    await self.send(text_data=json.dumps({
+                        'type': 'message_sent',
+                        'message': message
+                    }))
+            except Exception as e:
+                logger.exception("Erreur lors de la diffusion des messages: %s", e)
+            finally:
+                for _message in batch:
+                    self.send_queue.task_done()
+
+    async def deliver(self, messages):
+        """
+        Envoie les messages aux groupes des destinataires : en parallèle
+        entre destinataires, dans l'ordre pour un même destinataire.
+        """
+        by_group = {}
+        for message in messages:
+            by_group.setdefault(f"user_{message['recipient']['id']}", []).append(message)
+
+        async def send_to_group(group, group_messages):
+            for message in group_messages:
+                await self.channel_layer.group_send(group, {
+                    'type': 'new_message',
+                    'message': message
+                })
+
+        await asyncio.gather(*(
+            send_to_group(group, group_messages) for group, group_messages in by_group.items()
+        ))
+
     async def handle_mark_read(self, data):
         """Marquer les messages comme lus"""
         try:
@@ -249,10 +286,10 @@ class MessagingConsumer(AsyncWebsocketConsumer):
                     'sender_id': sender_id
                 }))
 
-                print(f"✅ Messages marqués comme lus: {sender_id} -> {self.user.id}")
+                logger.debug("Messages marqués comme lus: %s -> %s", sender_id, self.user.id)
 
         except Exception as e:
-            print(f"Erreur lors du marquage comme lu: {e}")
+            logger.exception("Erreur lors du marquage comme lu: %s", e)
 
     async def new_message(self, event):
         """Recevoir un nouveau message et l'envoyer au client"""
@@ -269,62 +306,73 @@ class MessagingConsumer(AsyncWebsocketConsumer):
         }))
 
     @database_sync_to_async
-    def get_user_profile(self, user):
-        """Get user profile for photo"""
-        try:
-            if user.user_type == 'student' and hasattr(user, 'student'):
-                return user.student
-            elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-                return user.instructor_profile
-            return None
-        except Exception as e:
-            print(f"Erreur lors de la récupération du profil: {e}")
-            return None
-
-    @database_sync_to_async
-    def create_message(self, sender_id, recipient_id, content):
-        """Créer un message dans la base de données"""
+    def create_message(self, recipient_id, content):
+        """
+        Créer un message dans la base de données et retourner sa
+        représentation complète (expéditeur et destinataire compris).
+
+        Le destinataire n'est chargé et vérifié (même auto-école) qu'au
+        premier message de la connexion, ses informations d'affichage sont
+        ensuite conservées.
+        """
         try:
-            sender = User.objects.get(id=sender_id)
-            recipient = User.objects.get(id=recipient_id)
-
-            # Vérifier que les utilisateurs appartiennent à la même auto-école
-            # (même logique que dans les vues REST)
-
-            message = DirectMessage.objects.create(
-                sender=sender,
-                recipient=recipient,
-                content=content
-            )
-            return message
+            recipient = self.contacts.get(recipient_id)
+            if recipient is None:
+                contact = User.objects.select_related('student', 'instructor_profile').filter(
+                    id=recipient_id
+                ).first()
+                if contact is None or not same_school(self.user, contact):
+                    return None
+                if len(self.contacts) >= DISPLAY_CACHE_SIZE:
+                    self.contacts.pop(next(iter(self.contacts)))
+                recipient = self.contacts[recipient_id] = sender_data(contact)
+
+            # Message et résumés de conversation dans la même transaction
+            with transaction.atomic():
+                message = DirectMessage.objects.create(
+                    sender=self.user,
+                    recipient_id=recipient['id'],
+                    content=content
+                )
+            return {
+                'id': message.id,
+                'content': message.content,
+                'sender': self.display,
+                'recipient': recipient,
+                'created_at': message.created_at.isoformat(),
+                'is_read': message.is_read
+            }
         except Exception as e:
-            print(f"Erreur lors de la création du message: {e}")
+            logger.exception("Erreur lors de la création du message: %s", e)
             return None
 
     @database_sync_to_async
     def authenticate_user(self, token):
-        """Authentifier un utilisateur par token"""
+        """
+        Authentifier un utilisateur par token et charger, dans le même
+        appel, ses informations d'affichage et son auto-école.
+        """
         try:
             from rest_framework.authtoken.models import Token
-            token_obj = Token.objects.get(key=token)
-            return token_obj.user
+            token_obj = Token.objects.select_related(
+                'user', 'user__student', 'user__instructor_profile'
+            ).get(key=token)
+            user = token_obj.user
+            get_tenant(user)
+            return user, sender_data(user)
         except Token.DoesNotExist:
             return None
         except Exception as e:
-            print(f"Erreur lors de l'authentification: {e}")
+            logger.exception("Erreur lors de l'authentification: %s", e)
             return None
 
     @database_sync_to_async
     def mark_messages_read(self, sender_id, recipient_id):
         """Marquer les messages comme lus"""
         try:
-            DirectMessage.objects.filter(
-                sender_id=sender_id,
-                recipient_id=recipient_id,
-                is_read=False
-            ).update(is_read=True)
+            mark_direct_messages_read(recipient_id, sender_id)
         except Exception as e:
-            print(f"Erreur lors du marquage comme lu: {e}")
+            logger.exception("Erreur lors du marquage comme lu: %s", e)
 
     async def notification_created(self, event):
         """Envoyer une nouvelle notification"""
@@ -0,0 +1,107 @@
+from driving_schools.cache import get_participants_version, get_stats_cache
+from driving_schools.models import DrivingSchool
+
+
+def get_user_photo_url(user, profile=None):
+    """Helper function to get user photo URL"""
+    # First check if user has a photo
+    if user.photo:
+        return user.photo.url
+
+    # Then check profile-specific photos
+    if profile and hasattr(profile, 'photo') and profile.photo:
+        return profile.photo.url
+
+    return None
+
+
+def get_sender_profile(user):
+    """Profil candidat ou moniteur d'un utilisateur (pour sa photo)"""
+    if user.user_type == 'student' and hasattr(user, 'student'):
+        return user.student
+    if user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
+        return user.instructor_profile
+    return None
+
+
+def sender_data(user):
+    """Informations d'affichage de l'expéditeur d'un message"""
+    return {
+        'id': user.id,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'photo': get_user_photo_url(user, get_sender_profile(user))
+    }
+
+
+def _member_entry(profile, user_type):
+    return {
+        'id': profile.user.id,
+        'username': profile.user.username,
+        'first_name': profile.user.first_name,
+        'last_name': profile.user.last_name,
+        'user_type': user_type,
+        'photo': get_user_photo_url(profile.user, profile)
+    }
+
+
+def build_directory(driving_school):
+    """
+    Annuaire complet d'une auto-école : propriétaire, candidats et moniteurs
+    (deux requêtes avec jointure sur les comptes utilisateurs).
+    """
+    owner = driving_school.owner
+    students = driving_school.students.select_related('user').order_by('user__last_name', 'user__first_name', 'id')
+    instructors = driving_school.instructors.select_related('user').order_by('user__last_name', 'user__first_name', 'id')
+    return {
+        'owner': {
+            'id': owner.id,
+            'username': owner.username,
+            'first_name': driving_school.name,
+            'last_name': '(Auto-école)',
+            'user_type': 'driving_school_owner',
+            'photo': get_user_photo_url(owner)
+        },
+        'students': [_member_entry(student, 'student') for student in students],
+        'instructors': [_member_entry(instructor, 'instructor') for instructor in instructors],
+    }
+
+
+def get_directory(driving_school_id, version=None):
+    """
+    Annuaire de l'auto-école depuis le cache, reconstruit lorsque sa
+    version change (modification d'un candidat, moniteur ou compte).
+    """
+    if version is None:
+        version = get_participants_version(driving_school_id)
+    cache = get_stats_cache()
+    key = f'school_participants:{driving_school_id}:v{version}'
+    directory = cache.get(key)
+    if directory is None:
+        driving_school = DrivingSchool.objects.select_related('owner').get(pk=driving_school_id)
+        directory = build_directory(driving_school)
+        cache.set(key, directory)
+    return directory
+
+
+def visible_participants(directory, role):
+    """Participants qu'un utilisateur peut contacter selon son rôle"""
+    if role == 'driving_school':
+        # Auto-école peut voir tous ses membres
+        return directory['students'] + directory['instructors']
+    if role == 'student':
+        # Étudiant peut voir son auto-école et les moniteurs
+        return [directory['owner']] + directory['instructors']
+    # Moniteur peut voir son auto-école et les étudiants
+    return [directory['owner']] + directory['students']
+
+
+def search_participants(participants, term):
+    """Filtre par nom, prénom ou identifiant (insensible à la casse)"""
+    term = term.strip().casefold()
+    if not term:
+        return participants
+    return [
+        participant for participant in participants
+        if term in f"{participant['first_name']} {participant['last_name']} {participant['username']}".casefold()
+    ]
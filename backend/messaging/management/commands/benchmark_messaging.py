@@ -0,0 +1,132 @@
+import statistics
+import time as timer
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from driving_schools.models import DrivingSchool
+from instructors.models import Instructor
+from messaging import views
+from messaging.models import DirectMessage
+from students.models import Student
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _QueryCounter:
+    """Compte les requêtes SQL (sans la limite du journal de DEBUG)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Mesure les vues de messagerie (requêtes SQL et latence) sur une '
+            'auto-école synthétique (données créées dans une transaction annulée)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200,
+                            help='Nombre de candidats')
+        parser.add_argument('--messages', type=int, default=2000,
+                            help='Messages échangés entre le moniteur et un candidat')
+        parser.add_argument('--runs', type=int, default=50,
+                            help='Nombre de mesures par vue')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                instructor, student = self._build_school(options)
+                self._run(instructor, student, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _build_school(self, options):
+        today = date.today()
+        owner = User.objects.create_user(username='benchmark_messaging_owner', user_type='driving_school')
+        driving_school = DrivingSchool.objects.create(
+            owner=owner, name='Auto-école benchmark', manager_name='Benchmark',
+            address='Tunis', phone='20000000', email='benchmark@example.com',
+            cin_document='cin.jpg', legal_documents='legal.pdf',
+        )
+
+        count = options['students']
+        users = User.objects.bulk_create([
+            User(username=f'benchmark_messaging_{index}', password='!', user_type='student',
+                 first_name='Candidat', last_name=str(index))
+            for index in range(count)
+        ] + [User(username='benchmark_messaging_instructor', password='!', user_type='instructor')])
+        Student.objects.bulk_create([
+            Student(
+                user=users[index], driving_school=driving_school, first_name='Candidat',
+                last_name=str(index), cin=f'8{index:07d}', phone='20000000',
+                email=f'candidat{index}@example.com', date_of_birth=date(2000, 1, 1),
+                address='Tunis', license_type='B',
+            )
+            for index in range(count)
+        ])
+        instructor = Instructor.objects.create(
+            user=users[-1], driving_school=driving_school, first_name='Moniteur',
+            last_name='Benchmark', cin='90000000', phone='20000000',
+            email='moniteur@example.com', license_types='B', hire_date=today,
+        )
+
+        # Les messages passent par create() pour maintenir les résumés de conversation
+        student_user = users[0]
+        for index in range(options['messages']):
+            sender, recipient = (student_user, instructor.user) if index % 2 else (instructor.user, student_user)
+            DirectMessage.objects.create(sender=sender, recipient=recipient, content=f'Message {index}')
+
+        self.stdout.write(f'{count} candidats, {options["messages"]} messages directs')
+        return instructor.user, student_user
+
+    def _run(self, instructor, student, options):
+        # Premier hôte autorisé explicite (pagination : liens absolus)
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')),
+                    'localhost')
+        factory = APIRequestFactory(SERVER_NAME=host)
+        scenarios = {
+            'historique (GET direct/<id>/)': (
+                views.direct_messages_view, f'/api/messaging/direct/{student.id}/', {'contact_id': student.id}
+            ),
+            'non lus d\'un contact': (
+                views.unread_messages_count_view, f'/api/messaging/direct/{student.id}/unread-count/',
+                {'contact_id': student.id}
+            ),
+            'tous les non lus': (views.all_unread_counts_view, '/api/messaging/unread-counts/', {}),
+            'boîte de réception': (views.inbox_view, '/api/messaging/inbox/', {}),
+            'participants': (views.available_participants_view, '/api/messaging/participants/', {}),
+        }
+
+        for label, (view, path, kwargs) in scenarios.items():
+            durations = []
+            for _run in range(options['runs']):
+                # Utilisateur rechargé à chaque requête, comme par l'authentification par jeton
+                user = User.objects.get(pk=instructor.pk)
+                request = factory.get(path)
+                force_authenticate(request, user=user)
+                queries = _QueryCounter()
+                with connection.execute_wrapper(queries):
+                    started = timer.perf_counter()
+                    response = view(request, **kwargs)
+                    durations.append((timer.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    self.stderr.write(f'{label}: statut {response.status_code}')
+                    break
+
+            durations.sort()
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            self.stdout.write(
+                f'{label}: {queries.count} requêtes, '
+                f'médiane {statistics.median(durations):.2f} ms, p95 {p95:.2f} ms'
+            )
@@ -0,0 +1,134 @@
+import asyncio
+import time as timer
+import uuid
+from datetime import date
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from driving_schools.models import DrivingSchool
+from messaging.routing import websocket_urlpatterns
+from students.models import Student
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+# Attente maximale d'un message WebSocket (secondes)
+RECEIVE_TIMEOUT = 30
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Test de charge du MessagingConsumer avec WebsocketCommunicator et la '
+            'couche de canaux en mémoire (données synthétiques supprimées à la fin)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=20,
+                            help='Paires expéditeur / destinataire connectées simultanément')
+        parser.add_argument('--messages', type=int, default=50,
+                            help='Messages envoyés par expéditeur')
+
+    def handle(self, *args, **options):
+        # database_sync_to_async ferme la connexion entre deux appels : les
+        # données sont validées puis supprimées, sans transaction englobante
+        # Identifiant propre à l'exécution : noms d'utilisateur et CIN (uniques)
+        # ne peuvent pas entrer en collision avec des données existantes
+        self.run_id = uuid.uuid4().hex[:8]
+        self.prefix = f'loadtest_{self.run_id}_'
+        self.created_user_ids = []
+        with override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS):
+            try:
+                tokens = self._build_school(options['pairs'])
+                latencies, elapsed = async_to_sync(self._run)(tokens, options['messages'])
+            finally:
+                # Seuls les comptes créés par cette exécution ; auto-école,
+                # candidats, jetons et messages suivent en cascade
+                User.objects.filter(pk__in=self.created_user_ids).delete()
+
+        total = len(latencies)
+        self.stdout.write(
+            f'{total} messages en {elapsed:.2f} s : {total / elapsed:.0f} messages/s, '
+            f'latence médiane {percentile(latencies, 0.5):.1f} ms, '
+            f'p99 {percentile(latencies, 0.99):.1f} ms'
+        )
+
+    def _build_school(self, pairs):
+        owner = User.objects.create_user(username=f'{self.prefix}owner', user_type='driving_school')
+        self.created_user_ids.append(owner.pk)
+        driving_school = DrivingSchool.objects.create(
+            owner=owner, name='Auto-école charge', manager_name='Charge',
+            address='Tunis', phone='20000000', email='loadtest@example.com',
+            cin_document='cin.jpg', legal_documents='legal.pdf',
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{self.prefix}{index}', password='!', user_type='student')
+            for index in range(pairs * 2)
+        ])
+        self.created_user_ids.extend(user.pk for user in users)
+        Student.objects.bulk_create([
+            Student(
+                user=user, driving_school=driving_school, first_name='Candidat',
+                last_name=str(index), cin=f'LT{self.run_id}{index:06d}', phone='20000000',
+                email=f'charge{index}@example.com', date_of_birth=date(2000, 1, 1),
+                address='Tunis', license_type='B',
+            )
+            for index, user in enumerate(users)
+        ])
+        tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+        return [(tokens[index], tokens[index + pairs]) for index in range(pairs)]
+
+    async def _connect(self, application, token):
+        communicator = WebsocketCommunicator(application, '/ws/messaging/')
+        connected, _subprotocol = await communicator.connect()
+        assert connected
+        await communicator.receive_json_from(RECEIVE_TIMEOUT)  # connection_established
+        await communicator.send_json_to({'type': 'authenticate', 'token': token.key})
+        response = await communicator.receive_json_from(RECEIVE_TIMEOUT)
+        assert response['type'] == 'authenticated', response
+        return communicator
+
+    async def _run(self, tokens, count):
+        application = URLRouter(websocket_urlpatterns)
+        pairs = [
+            (await self._connect(application, sender), await self._connect(application, recipient), recipient)
+            for sender, recipient in tokens
+        ]
+        latencies = []
+
+        async def send(communicator, recipient, sent_at):
+            for index in range(count):
+                sent_at[str(index)] = timer.perf_counter()
+                await communicator.send_json_to({
+                    'type': 'send_message', 'recipient_id': recipient.user_id, 'content': str(index)
+                })
+            # Confirmations de l'expéditeur
+            for _index in range(count):
+                response = await communicator.receive_json_from(RECEIVE_TIMEOUT)
+                assert response['type'] == 'message_sent', response
+
+        async def receive(communicator, sent_at):
+            for _index in range(count):
+                response = await communicator.receive_json_from(RECEIVE_TIMEOUT)
+                assert response['type'] == 'new_message', response
+                latencies.append((timer.perf_counter() - sent_at[response['message']['content']]) * 1000)
+
+        started = timer.perf_counter()
+        tasks = []
+        for sender, recipient, recipient_token in pairs:
+            sent_at = {}
+            tasks.append(send(sender, recipient_token, sent_at))
+            tasks.append(receive(recipient, sent_at))
+        await asyncio.gather(*tasks)
+        elapsed = timer.perf_counter() - started
+
+        for sender, recipient, _token in pairs:
+            await sender.disconnect()
+            await recipient.disconnect()
+        return latencies, elapsed
@@ -4,17 +4,11 @@ from urllib.parse import parse_qs
 
 @database_sync_to_async
 def get_user_from_token(token_key):
-    try:
-        from django.contrib.auth import get_user_model
-        from django.contrib.auth.models import AnonymousUser
-        from rest_framework.authtoken.models import Token
+    from django.contrib.auth.models import AnonymousUser
+    from accounts.authentication import get_token_user
 
-        User = get_user_model()
-        token = Token.objects.get(key=token_key)
-        return token.user
-    except:
-        from django.contrib.auth.models import AnonymousUser
-        return AnonymousUser()
+    # Jeton résolu via le cache d'authentification
+    return get_token_user(token_key) or AnonymousUser()
 
 class TokenAuthMiddleware(BaseMiddleware):
     def __init__(self, inner):
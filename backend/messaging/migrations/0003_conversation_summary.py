@@ -0,0 +1,93 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+PREVIEW_LENGTH = 100
+
+
+def _preview(content):
+    content = content or ''
+    return content[:PREVIEW_LENGTH - 3] + '...' if len(content) > PREVIEW_LENGTH else content
+
+
+def build_summaries(apps, schema_editor):
+    """Construit les résumés à partir de l'historique existant"""
+    DirectMessage = apps.get_model('messaging', 'DirectMessage')
+    Message = apps.get_model('messaging', 'Message')
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationSummary = apps.get_model('messaging', 'ConversationSummary')
+
+    summaries = {}
+
+    def summary(owner_id, **counterpart):
+        key = (owner_id, *counterpart.items())
+        if key not in summaries:
+            summaries[key] = ConversationSummary(owner_id=owner_id, **counterpart)
+        return summaries[key]
+
+    def set_last(item, message):
+        item.last_message_id = message['id']
+        item.last_message_preview = _preview(message['content'])
+        item.last_message_at = message['created_at']
+        item.last_sender_id = message['sender_id']
+
+    # Messages directs : parcours chronologique, le dernier message l'emporte
+    fields = ('id', 'sender_id', 'recipient_id', 'content', 'created_at', 'is_read')
+    for message in DirectMessage.objects.order_by('created_at', 'id').values(*fields).iterator():
+        set_last(summary(message['sender_id'], contact_id=message['recipient_id']), message)
+        received = summary(message['recipient_id'], contact_id=message['sender_id'])
+        set_last(received, message)
+        if not message['is_read']:
+            received.unread_count += 1
+
+    # Conversations : tous les participants sauf l'auteur
+    participants = {}
+    for conversation_id, user_id in Conversation.participants.through.objects.values_list(
+        'conversation_id', 'user_id'
+    ):
+        participants.setdefault(conversation_id, []).append(user_id)
+
+    fields = ('id', 'conversation_id', 'sender_id', 'content', 'created_at', 'is_read')
+    for message in Message.objects.order_by('created_at', 'id').values(*fields).iterator():
+        for user_id in participants.get(message['conversation_id'], []):
+            item = summary(user_id, conversation_id=message['conversation_id'])
+            set_last(item, message)
+            if user_id != message['sender_id'] and not message['is_read']:
+                item.unread_count += 1
+
+    ConversationSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_directmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_id', models.BigIntegerField(blank=True, null=True, verbose_name='Dernier message')),
+                ('last_message_preview', models.CharField(blank=True, default='', max_length=100, verbose_name='Aperçu')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Date du dernier message')),
+                ('unread_count', models.PositiveIntegerField(default=0, verbose_name='Messages non lus')),
+                ('contact', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Contact')),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='messaging.conversation', verbose_name='Conversation')),
+                ('last_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Auteur du dernier message')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_summaries', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Résumé de conversation',
+                'verbose_name_plural': 'Résumés de conversation',
+                'indexes': [models.Index(fields=['owner', '-last_message_at'], name='summary_inbox_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('contact__isnull', False)), fields=('owner', 'contact'), name='summary_unique_contact'), models.UniqueConstraint(condition=models.Q(('conversation__isnull', False)), fields=('owner', 'conversation'), name='summary_unique_conversation')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -253,6 +253,14 @@ class Notification(models.Model):
         verbose_name = _('Notification')
         verbose_name_plural = _('Notifications')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at'], name='push_notification_recent_idx'),
+            # Compteur de non lus : ne couvre que les notifications non lues
+            models.Index(
+                fields=['recipient'], name='push_notification_unread_idx',
+                condition=models.Q(is_read=False)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.recipient.username}: {self.title}"
@@ -302,3 +310,71 @@ class DirectMessage(models.Model):
 
     def __str__(self):
         return f"Message direct de {self.sender.username} à {self.recipient.username}"
+
+
+class ConversationSummary(models.Model):
+    """
+    Résumé dénormalisé d'une conversation pour un utilisateur : dernier
+    message et nombre de messages non lus, par contact (messages directs)
+    ou par conversation. Maintenu par messaging.summaries.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_summaries',
+        verbose_name=_('Utilisateur')
+    )
+    contact = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name=_('Contact')
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='summaries',
+        verbose_name=_('Conversation')
+    )
+
+    # Dernier message (identifiant dans DirectMessage ou Message selon le cas)
+    last_message_id = models.BigIntegerField(blank=True, null=True, verbose_name=_('Dernier message'))
+    last_message_preview = models.CharField(max_length=100, blank=True, default='', verbose_name=_('Aperçu'))
+    last_message_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Date du dernier message'))
+    last_sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name=_('Auteur du dernier message')
+    )
+
+    unread_count = models.PositiveIntegerField(default=0, verbose_name=_('Messages non lus'))
+
+    class Meta:
+        verbose_name = _('Résumé de conversation')
+        verbose_name_plural = _('Résumés de conversation')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'contact'],
+                condition=models.Q(contact__isnull=False),
+                name='summary_unique_contact'
+            ),
+            models.UniqueConstraint(
+                fields=['owner', 'conversation'],
+                condition=models.Q(conversation__isnull=False),
+                name='summary_unique_conversation'
+            ),
+        ]
+        indexes = [
+            # Boîte de réception : conversations d'un utilisateur, plus récentes d'abord
+            models.Index(fields=['owner', '-last_message_at'], name='summary_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"Résumé {self.owner_id} / {self.contact_id or self.conversation_id}"
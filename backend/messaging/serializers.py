@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
-from .models import Conversation, Message
+from .models import Conversation, ConversationSummary, Message
 from accounts.serializers import UserSerializer
 
 
@@ -29,6 +29,18 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+def get_user_summary(conversation, user):
+    """
+    Résumé de la conversation pour l'utilisateur : préchargé par la vue
+    (user_summaries) ou lu en une requête.
+    """
+    if hasattr(conversation, 'user_summaries'):
+        return conversation.user_summaries[0] if conversation.user_summaries else None
+    return ConversationSummary.objects.filter(
+        owner=user, conversation=conversation
+    ).select_related('last_sender').first()
+
+
 class ConversationSerializer(serializers.ModelSerializer):
     """Serializer pour les conversations"""
     driving_school_name = serializers.CharField(source='driving_school.name', read_only=True)
@@ -45,20 +57,22 @@ class ConversationSerializer(serializers.ModelSerializer):
         return [participant.get_full_name() for participant in obj.participants.all()]
     
     def get_last_message(self, obj):
-        last_message = obj.messages.order_by('-created_at').first()
-        if last_message:
+        summary = get_user_summary(obj, self.context['request'].user)
+        if summary and summary.last_message_id:
+            # Contenu complet (l'aperçu du résumé est tronqué) : une lecture par clé primaire
+            content = Message.objects.filter(
+                pk=summary.last_message_id
+            ).values_list('content', flat=True).first()
             return {
-                'content': last_message.content,
-                'sender_name': last_message.sender.get_full_name(),
-                'created_at': last_message.created_at,
+                'content': summary.last_message_preview if content is None else content,
+                'sender_name': summary.last_sender.get_full_name() if summary.last_sender else '',
+                'created_at': summary.last_message_at,
             }
         return None
     
     def get_unread_count(self, obj):
-        user = self.context['request'].user
-        return obj.messages.filter(
-            read_by__isnull=True
-        ).exclude(sender=user).count()
+        summary = get_user_summary(obj, self.context['request'].user)
+        return summary.unread_count if summary else 0
 
 
 class ConversationCreateSerializer(serializers.ModelSerializer):
@@ -137,17 +151,15 @@ class ConversationListSerializer(serializers.ModelSerializer):
         return [participant.get_full_name() for participant in other_participants]
     
     def get_last_message_preview(self, obj):
-        last_message = obj.messages.order_by('-created_at').first()
-        if last_message:
-            content = last_message.content
+        summary = get_user_summary(obj, self.context['request'].user)
+        if summary and summary.last_message_id:
+            content = summary.last_message_preview
             return content[:50] + '...' if len(content) > 50 else content
         return None
     
     def get_unread_count(self, obj):
-        user = self.context['request'].user
-        return obj.messages.filter(
-            is_read=False
-        ).exclude(sender=user).count()
+        summary = get_user_summary(obj, self.context['request'].user)
+        return summary.unread_count if summary else 0
 
 
 class MessageListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from driving_schools.cache import invalidate_school_participants_on_commit
+from driving_schools.models import DrivingSchool
+from instructors.models import Instructor
+from students.models import Student
+
+from .models import DirectMessage, Message
+from .summaries import (
+    forget_conversation_message, forget_direct_message,
+    record_conversation_message, record_direct_message,
+)
+
+
+@receiver(post_save, sender=DirectMessage)
+def update_summaries_on_direct_message(sender, instance, created, **kwargs):
+    """Résumés de conversation mis à jour dans la transaction de création"""
+    if created:
+        record_direct_message(instance)
+
+
+@receiver(post_save, sender=Message)
+def update_summaries_on_message(sender, instance, created, **kwargs):
+    if created:
+        record_conversation_message(instance)
+
+
+@receiver(post_delete, sender=DirectMessage)
+def update_summaries_on_direct_message_delete(sender, instance, **kwargs):
+    forget_direct_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def update_summaries_on_message_delete(sender, instance, **kwargs):
+    forget_conversation_message(instance)
+
+
+# Champs du compte affichés dans l'annuaire des participants
+DIRECTORY_USER_FIELDS = {'username', 'first_name', 'last_name', 'photo'}
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Instructor)
+def invalidate_directory_on_member_change(sender, instance, **kwargs):
+    invalidate_school_participants_on_commit(instance.driving_school_id)
+
+
+@receiver(post_save, sender=DrivingSchool)
+def invalidate_directory_on_school_change(sender, instance, **kwargs):
+    # Le nom de l'auto-école sert de libellé au propriétaire
+    invalidate_school_participants_on_commit(instance.id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_directory_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    """Un compte modifié invalide l'annuaire de son auto-école"""
+    if created or (update_fields and not DIRECTORY_USER_FIELDS.intersection(update_fields)):
+        # Connexion (last_login) ou compte pas encore rattaché à une auto-école
+        return
+    school_ids = DrivingSchool.objects.filter(
+        Q(owner=instance) | Q(students__user=instance) | Q(instructors__user=instance)
+    ).values_list('id', flat=True).distinct()
+    for school_id in school_ids:
+        invalidate_school_participants_on_commit(school_id)
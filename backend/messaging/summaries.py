@@ -0,0 +1,174 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ConversationSummary, DirectMessage, Message
+
+PREVIEW_LENGTH = 100
+
+
+def preview(content):
+    """Aperçu tronqué du contenu d'un message"""
+    content = content or ''
+    return content[:PREVIEW_LENGTH - 3] + '...' if len(content) > PREVIEW_LENGTH else content
+
+
+def _last_message_fields(message):
+    return {
+        'last_message_id': message.id,
+        'last_message_preview': preview(message.content),
+        'last_message_at': message.created_at,
+        'last_sender_id': message.sender_id,
+    }
+
+
+def _touch(owner_ids, counterpart, message, unread_delta=0):
+    """
+    Reporte `message` sur les résumés de `owner_ids` pour `counterpart`
+    ({'contact_id': ...} ou {'conversation_id': ...}) en une requête UPDATE,
+    les résumés manquants étant créés au premier message.
+
+    Le dernier message n'est remplacé que par un message plus récent (id
+    supérieur) : deux transactions validées dans le désordre ne font pas
+    reculer l'aperçu, alors que le compteur de non lus est toujours ajusté.
+    """
+    owner_ids = list(owner_ids)
+    if not owner_ids:
+        return
+
+    newer = Q(last_message_id__isnull=True) | Q(last_message_id__lt=message.id)
+    updates = {
+        field: Case(
+            When(newer, then=Value(value)), default=F(field),
+            output_field=ConversationSummary._meta.get_field(field)
+        )
+        for field, value in _last_message_fields(message).items()
+    }
+    if unread_delta:
+        updates['unread_count'] = F('unread_count') + unread_delta
+
+    summaries = ConversationSummary.objects.filter(owner_id__in=owner_ids, **counterpart)
+    if summaries.update(**updates) == len(owner_ids):
+        return
+
+    existing = set(summaries.values_list('owner_id', flat=True))
+    missing = [owner_id for owner_id in owner_ids if owner_id not in existing]
+    ConversationSummary.objects.bulk_create(
+        [ConversationSummary(owner_id=owner_id, **counterpart) for owner_id in missing],
+        ignore_conflicts=True
+    )
+    summaries.filter(owner_id__in=missing).update(**updates)
+
+
+def record_direct_message(message):
+    """Met à jour les résumés de l'expéditeur et du destinataire d'un message direct"""
+    with transaction.atomic():
+        _touch([message.sender_id], {'contact_id': message.recipient_id}, message)
+        _touch([message.recipient_id], {'contact_id': message.sender_id}, message,
+               unread_delta=0 if message.is_read else 1)
+
+
+def record_conversation_message(message):
+    """Met à jour les résumés des participants d'une conversation"""
+    participant_ids = set(
+        message.conversation.participants.values_list('id', flat=True)
+    )
+    participant_ids.discard(message.sender_id)
+    counterpart = {'conversation_id': message.conversation_id}
+    with transaction.atomic():
+        _touch([message.sender_id], counterpart, message)
+        _touch(participant_ids, counterpart, message, unread_delta=0 if message.is_read else 1)
+
+
+def mark_direct_messages_read(reader_id, sender_id):
+    """
+    Marque comme lus les messages de `sender_id` à `reader_id` et décrémente
+    le compteur du lecteur du nombre de messages effectivement marqués
+    (un message arrivé entre-temps reste compté).
+    """
+    with transaction.atomic():
+        marked = DirectMessage.objects.filter(
+            sender_id=sender_id,
+            recipient_id=reader_id,
+            is_read=False
+        ).update(is_read=True)
+        if marked:
+            ConversationSummary.objects.filter(owner_id=reader_id, contact_id=sender_id).update(
+                unread_count=Greatest(F('unread_count') - marked, 0)
+            )
+    return marked
+
+
+def mark_conversation_read(conversation, reader_id):
+    """Marque comme lus les messages reçus dans une conversation"""
+    with transaction.atomic():
+        marked = conversation.messages.filter(is_read=False).exclude(
+            sender_id=reader_id
+        ).update(is_read=True, read_at=timezone.now())
+        ConversationSummary.objects.filter(
+            owner_id=reader_id, conversation_id=conversation.id
+        ).update(unread_count=0)
+    return marked
+
+
+def _refresh_last_message(summaries, messages):
+    """Recalcule le dernier message de résumés dont le message affiché a été supprimé"""
+    if not summaries.exists():
+        return
+    last_message = messages.order_by('-created_at', '-id').first()
+    if last_message is None:
+        summaries.update(last_message_id=None, last_message_preview='',
+                         last_message_at=None, last_sender=None)
+    else:
+        summaries.update(**_last_message_fields(last_message))
+
+
+def forget_direct_message(message):
+    """Retire un message direct supprimé des résumés"""
+    if not message.is_read:
+        ConversationSummary.objects.filter(
+            owner_id=message.recipient_id, contact_id=message.sender_id
+        ).update(unread_count=Greatest(F('unread_count') - 1, 0))
+    _refresh_last_message(
+        ConversationSummary.objects.filter(
+            Q(owner_id=message.sender_id, contact_id=message.recipient_id) |
+            Q(owner_id=message.recipient_id, contact_id=message.sender_id),
+            last_message_id=message.id
+        ),
+        DirectMessage.objects.filter(
+            Q(sender_id=message.sender_id, recipient_id=message.recipient_id) |
+            Q(sender_id=message.recipient_id, recipient_id=message.sender_id)
+        )
+    )
+
+
+def forget_conversation_message(message):
+    """Retire un message de conversation supprimé des résumés"""
+    summaries = ConversationSummary.objects.filter(conversation_id=message.conversation_id)
+    if not message.is_read:
+        summaries.exclude(owner_id=message.sender_id).update(
+            unread_count=Greatest(F('unread_count') - 1, 0)
+        )
+    _refresh_last_message(
+        summaries.filter(last_message_id=message.id),
+        Message.objects.filter(conversation_id=message.conversation_id)
+    )
+
+
+def unread_counts(user):
+    """{contact_id: non lus} des messages directs d'un utilisateur, en une requête"""
+    return dict(
+        ConversationSummary.objects.filter(
+            owner=user, contact__isnull=False, unread_count__gt=0
+        ).values_list('contact_id', 'unread_count')
+    )
+
+
+def inbox(user):
+    """Résumés de conversation d'un utilisateur, du plus récent au plus ancien"""
+    return ConversationSummary.objects.filter(
+        owner=user, last_message_at__isnull=False
+    ).select_related(
+        'contact', 'contact__student', 'contact__instructor_profile', 'conversation'
+    ).order_by('-last_message_at', '-id')
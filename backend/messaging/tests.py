@@ -1,3 +1,375 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from driving_schools.cache import get_stats_cache
+from driving_schools.tenancy import clear_tenants
+from driving_schools.tests import create_instructor, create_school, create_student
+from permini_project.instrumentation import registry
+
+from .models import Conversation, ConversationSummary, DirectMessage, Message
+from .routing import websocket_urlpatterns
+from .summaries import record_direct_message
+from .views import DIRECT_MESSAGES_MAX_PAGE_SIZE, encode_message_cursor
+
+
+class DirectMessagesPaginationTests(TestCase):
+    """Historique des messages directs paginé par clé (created_at, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.student = create_student(cls.school, 1)
+        cls.owner_id = cls.school.owner_id
+        cls.student_user_id = cls.student.user_id
+
+        base = timezone.now() - timedelta(days=1)
+        cls.messages = []
+        for index in range(7):
+            sender, recipient = (cls.school.owner, cls.student.user) if index % 2 else \
+                (cls.student.user, cls.school.owner)
+            cls.messages.append(DirectMessage.objects.create(
+                sender=sender, recipient=recipient, content=f'Message {index}'
+            ))
+        # Les trois premiers messages partagent le même horodatage : départage par id
+        for index, message in enumerate(cls.messages):
+            created_at = base + timedelta(minutes=max(index, 2))
+            DirectMessage.objects.filter(pk=message.pk).update(created_at=created_at)
+
+        other = create_student(cls.school, 2)
+        DirectMessage.objects.create(sender=other.user, recipient=cls.school.owner, content='Autre')
+
+    def setUp(self):
+        clear_tenants()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.owner_id))
+        self.url = reverse('messaging:direct_messages', args=[self.student_user_id])
+
+    def contents(self, response):
+        return [message['content'] for message in response.data['results']]
+
+    def test_latest_page_then_older_pages(self):
+        response = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contents(response), ['Message 4', 'Message 5', 'Message 6'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'limit': 3, 'before': response.data['before']})
+        self.assertEqual(self.contents(response), ['Message 1', 'Message 2', 'Message 3'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'limit': 3, 'before': response.data['before']})
+        self.assertEqual(self.contents(response), ['Message 0'])
+        self.assertFalse(response.data['has_more'])
+        self.assertIsNone(response.data['before'])
+
+    def test_after_cursor_returns_newer_messages(self):
+        message = DirectMessage.objects.values('id', 'created_at').get(pk=self.messages[1].pk)
+        response = self.client.get(self.url, {'limit': 3, 'after': encode_message_cursor(message)})
+        self.assertEqual(self.contents(response), ['Message 2', 'Message 3', 'Message 4'])
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'after': response.data['after']})
+        self.assertEqual(self.contents(response), ['Message 5', 'Message 6'])
+        self.assertFalse(response.data['has_more'])
+
+        # Aucun nouveau message : le curseur est conservé pour l'interrogation suivante
+        cursor = response.data['after']
+        response = self.client.get(self.url, {'after': cursor})
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['after'], cursor)
+
+    def test_page_query_count_is_constant(self):
+        # Auto-école de chaque participant (une requête chacun), contact, page
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 7)
+
+        # Auto-écoles ensuite servies par le cache LRU
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertEqual(response.data['results'][0]['sender']['id'], self.student_user_id)
+
+    def test_limit_is_capped_and_cursor_validated(self):
+        for index in range(DIRECT_MESSAGES_MAX_PAGE_SIZE):
+            DirectMessage.objects.create(
+                sender_id=self.owner_id, recipient_id=self.student_user_id, content='Rappel'
+            )
+        response = self.client.get(self.url, {'limit': 1000})
+        self.assertEqual(len(response.data['results']), DIRECT_MESSAGES_MAX_PAGE_SIZE)
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(self.url, {'before': 'invalide'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConversationSummaryTests(TestCase):
+    """Résumés de conversation dénormalisés (dernier message, non lus)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.owner = cls.school.owner
+        cls.students = [create_student(cls.school, index) for index in range(3)]
+
+    def setUp(self):
+        clear_tenants()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.owner.pk))
+
+    def summary(self, owner, **counterpart):
+        return ConversationSummary.objects.get(owner=owner, **counterpart)
+
+    def send(self, sender, recipient, content):
+        return DirectMessage.objects.create(sender=sender, recipient=recipient, content=content)
+
+    def test_direct_messages_update_both_summaries(self):
+        student = self.students[0].user
+        self.send(student, self.owner, 'Bonjour')
+        last = self.send(student, self.owner, 'x' * 150)
+
+        received = self.summary(self.owner, contact=student)
+        self.assertEqual(received.unread_count, 2)
+        self.assertEqual(received.last_message_id, last.id)
+        self.assertEqual(len(received.last_message_preview), 100)
+        sent = self.summary(student, contact=self.owner)
+        self.assertEqual(sent.unread_count, 0)
+        self.assertEqual(sent.last_message_id, last.id)
+
+        # Un message validé dans le désordre ne fait pas reculer l'aperçu
+        record_direct_message(DirectMessage.objects.order_by('id').first())
+        received.refresh_from_db()
+        self.assertEqual(received.last_message_id, last.id)
+
+    def test_unread_counters_and_mark_read(self):
+        first, second = self.students[0].user, self.students[1].user
+        for index in range(3):
+            self.send(first, self.owner, f'Question {index}')
+        self.send(second, self.owner, 'Absence')
+
+        response = self.client.get(reverse('messaging:all_unread_counts'))
+        self.assertEqual(response.data, {first.id: 3, second.id: 1})
+        response = self.client.get(reverse('messaging:unread_messages_count', args=[first.id]))
+        self.assertEqual(response.data['unread_count'], 3)
+
+        self.client.post(reverse('messaging:mark_direct_messages_read', args=[first.id]))
+        self.assertEqual(self.summary(self.owner, contact=first).unread_count, 0)
+        response = self.client.get(reverse('messaging:all_unread_counts'))
+        self.assertEqual(response.data, {second.id: 1})
+
+    def test_deleting_last_message_restores_previous(self):
+        student = self.students[0].user
+        first = self.send(student, self.owner, 'Premier')
+        self.send(student, self.owner, 'Second').delete()
+
+        received = self.summary(self.owner, contact=student)
+        self.assertEqual(received.last_message_id, first.id)
+        self.assertEqual(received.unread_count, 1)
+
+    def test_inbox_is_one_query_whatever_the_history(self):
+        for student in self.students:
+            for index in range(5):
+                self.send(student.user, self.owner, f'Message {index}')
+        self.send(self.owner, self.students[1].user, 'Réponse')
+
+        # Auto-école (permission), puis une seule requête pour la boîte de réception
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('messaging:inbox'))
+        self.assertEqual(len(response.data), 3)
+        latest = response.data[0]
+        self.assertEqual(latest['contact']['id'], self.students[1].user_id)
+        self.assertEqual(latest['last_message']['preview'], 'Réponse')
+        self.assertEqual(latest['unread_count'], 5)
+
+    def test_conversation_messages_and_list(self):
+        conversation = Conversation.objects.create(driving_school=self.school, title='Groupe')
+        conversation.participants.add(self.owner, *(student.user for student in self.students))
+        for student in self.students:
+            Message.objects.create(conversation=conversation, sender=student.user, content='Présent')
+
+        self.assertEqual(self.summary(self.owner, conversation=conversation).unread_count, 3)
+        self.assertEqual(self.summary(self.students[0].user, conversation=conversation).unread_count, 2)
+
+        response = self.client.get(reverse('messaging:conversation_list'))
+        self.assertEqual(response.data['results'][0]['unread_count'], 3)
+        self.assertEqual(response.data['results'][0]['last_message_preview'], 'Présent')
+        response = self.client.get(reverse('messaging:unread_count'))
+        self.assertEqual(response.data['unread_count'], 3)
+
+        self.client.post(reverse('messaging:mark_read', args=[conversation.id]))
+        self.assertEqual(self.summary(self.owner, conversation=conversation).unread_count, 0)
+
+    def test_conversation_detail_returns_full_last_message(self):
+        conversation = Conversation.objects.create(driving_school=self.school, title='Groupe')
+        conversation.participants.add(self.owner, self.students[0].user)
+        content = 'Rendez-vous ' * 20
+        Message.objects.create(conversation=conversation, sender=self.students[0].user, content=content)
+
+        response = self.client.get(reverse('messaging:conversation_detail', args=[conversation.id]))
+
+        self.assertEqual(response.data['last_message']['content'], content)
+        self.assertLessEqual(len(self.summary(self.owner, conversation=conversation).last_message_preview), 100)
+
+
+class ParticipantDirectoryTests(TestCase):
+    """Annuaire des participants mis en cache, paginé et versionné"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.students = [create_student(cls.school, index) for index in range(5)]
+        cls.instructor = create_instructor(cls.school, 1)
+        for index, student in enumerate(cls.students):
+            User.objects.filter(pk=student.user_id).update(first_name='Candidat', last_name=f'Nom{index}')
+        other = create_school('other')
+        create_student(other, 9)
+
+    def setUp(self):
+        get_stats_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        self.url = reverse('messaging:available_participants')
+
+    def test_school_sees_its_members_from_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 6)
+        self.assertIn('version', response.data)
+
+        # Annuaire en cache (auto-école déjà chargée sur l'utilisateur)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'search': 'nom3'})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.students[3].user_id])
+
+    def test_pagination_and_roles(self):
+        response = self.client.get(self.url, {'page_size': 2, 'page': 3})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+        self.client.force_authenticate(User.objects.get(pk=self.students[0].user_id))
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [item['user_type'] for item in response.data['results']],
+            ['driving_school_owner', 'instructor']
+        )
+
+    def test_etag_until_member_changes(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Liste de validateurs : chaque ETag est comparé en entier
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"ancien", {etag}')
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.students[0].user_id)
+            user.last_name = 'Renommé'
+            user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renommé', [item['last_name'] for item in response.data['results']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_student(self.school, 7)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.data['count'], 7)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class MessagingConsumerTests(TransactionTestCase):
+    """Envoi de messages directs par WebSocket (la connexion est fermée entre les appels)"""
+
+    def setUp(self):
+        clear_tenants()
+        self.school = create_school('owner')
+        self.student = create_student(self.school, 1)
+        self.tokens = {
+            'owner': Token.objects.create(user=self.school.owner),
+            'student': Token.objects.create(user=self.student.user),
+        }
+
+    async def connect(self, token):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/messaging/')
+        connected, _subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'authenticate', 'token': token.key})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'authenticated')
+        return communicator
+
+    def test_send_message_reaches_recipient_in_order(self):
+        async def scenario():
+            owner = await self.connect(self.tokens['owner'])
+            student = await self.connect(self.tokens['student'])
+            for content in ('Bonjour', 'Rendez-vous demain'):
+                await owner.send_json_to({
+                    'type': 'send_message', 'recipient_id': self.student.user_id, 'content': content
+                })
+            received = [await student.receive_json_from() for _index in range(2)]
+            confirmed = [await owner.receive_json_from() for _index in range(2)]
+            await owner.disconnect()
+            await student.disconnect()
+            return received, confirmed
+
+        with CaptureQueriesContext(connection) as queries:
+            received, confirmed = async_to_sync(scenario)()
+
+        self.assertEqual([event['type'] for event in received], ['new_message'] * 2)
+        self.assertEqual([event['message']['content'] for event in received], ['Bonjour', 'Rendez-vous demain'])
+        self.assertEqual([event['type'] for event in confirmed], ['message_sent'] * 2)
+        self.assertEqual(received[0]['message']['sender']['first_name'], self.school.owner.first_name)
+        self.assertEqual(received[0]['message']['recipient']['id'], self.student.user_id)
+        self.assertEqual(DirectMessage.objects.filter(recipient_id=self.student.user_id).count(), 2)
+        # Le destinataire n'est chargé qu'une fois pour la connexion
+        self.assertEqual(
+            sum('FROM "accounts_user"' in query['sql'] and 'authtoken' not in query['sql']
+                for query in queries.captured_queries),
+            1 + 2  # destinataire, puis auto-école de chaque utilisateur
+        )
+
+    def test_recipient_from_another_school_is_rejected(self):
+        other = create_student(create_school('other'), 2)
+
+        async def scenario():
+            owner = await self.connect(self.tokens['owner'])
+            await owner.send_json_to({
+                'type': 'send_message', 'recipient_id': other.user_id, 'content': 'Bonjour'
+            })
+            response = await owner.receive_json_from()
+            await owner.disconnect()
+            return response
+
+        response = async_to_sync(scenario)()
+        self.assertEqual(response, {'type': 'error', 'message': 'Destinataire non autorisé'})
+        self.assertFalse(DirectMessage.objects.exists())
+
+    def test_consumer_messages_are_instrumented(self):
+        registry.reset()
+
+        async def scenario():
+            owner = await self.connect(self.tokens['owner'])
+            await owner.send_json_to({
+                'type': 'send_message', 'recipient_id': self.student.user_id, 'content': 'Bonjour'
+            })
+            await owner.receive_json_from()
+            await owner.disconnect()
+
+        async_to_sync(scenario)()
+        body = registry.render()
+        labels = 'protocol="websocket",route="MessagingConsumer",method="websocket.receive"'
+        # Authentification puis envoi
+        self.assertIn(f'permini_requests_total{{{labels},status="ok"}} 2', body)
+        queries = re.search(rf'permini_sql_queries_total{{{labels}}} (\d+)', body)
+        self.assertGreater(int(queries.group(1)), 0)
@@ -26,4 +26,7 @@ urlpatterns = [
 
     # Compteurs globaux
     path('unread-counts/', views.all_unread_counts_view, name='all_unread_counts'),
+
+    # Boîte de réception (résumés de conversation)
+    path('inbox/', views.inbox_view, name='inbox'),
 ]
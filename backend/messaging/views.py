@@ -1,14 +1,26 @@
+import base64
+import hashlib
+import logging
+from datetime import datetime
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from django.db import models
-from django.db.models import Q, Count
+from django.db import models, transaction
+from django.db.models import Prefetch, Q, Count, Sum
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.http import Http404
+from django.utils.http import parse_etags, quote_etag
 from django.contrib.auth import get_user_model
 
-from .models import Conversation, Message, DirectMessage
+from driving_schools.cache import get_participants_version
+from driving_schools.tenancy import get_request_tenant, same_school
+
+from .directory import get_directory, search_participants, sender_data, visible_participants
+from .models import Conversation, ConversationSummary, Message, DirectMessage
+from .summaries import inbox, mark_conversation_read, mark_direct_messages_read, unread_counts
 
 User = get_user_model()
 from .serializers import (
@@ -16,37 +28,43 @@ from .serializers import (
     MessageSerializer, MessageCreateSerializer, MessageListSerializer
 )
 
+logger = logging.getLogger(__name__)
+
+# Pagination de l'historique des messages directs
+DIRECT_MESSAGES_PAGE_SIZE = 50
+DIRECT_MESSAGES_MAX_PAGE_SIZE = 100
+
 
 class PremiumFeaturePermission(permissions.BasePermission):
     """Permission pour les fonctionnalités premium"""
 
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
-            print(f"🔍 Messagerie: Utilisateur non authentifié")
+            logger.debug("Messagerie: utilisateur non authentifié")
             return False
 
-        print(f"🔍 Messagerie: Utilisateur {request.user.username}, type: {request.user.user_type}")
+        logger.debug("Messagerie: utilisateur %s, type: %s", request.user.username, request.user.user_type)
 
-        if hasattr(request.user, 'driving_school'):
-            driving_school = request.user.driving_school
-            print(f"🔍 Messagerie: Auto-école {driving_school.name}, plan: {driving_school.current_plan}")
+        # Auto-école du propriétaire, du candidat ou du moniteur (une requête par requête HTTP)
+        tenant = get_request_tenant(request)
+        if tenant.driving_school_id:
+            logger.debug("Messagerie: %s, auto-école %s", tenant.role, tenant.driving_school_id)
             # Temporairement, autoriser tous les plans pour tester
             return True  # driving_school.current_plan == 'premium'
 
-        # Pour les candidats et moniteurs, vérifier le plan de leur auto-école
-        if request.user.user_type == 'student' and hasattr(request.user, 'student'):
-            plan = request.user.student.driving_school.current_plan
-            print(f"🔍 Messagerie: Étudiant, plan auto-école: {plan}")
-            return True  # plan == 'premium'
-        elif request.user.user_type == 'instructor' and hasattr(request.user, 'instructor_profile'):
-            plan = request.user.instructor_profile.driving_school.current_plan
-            print(f"🔍 Messagerie: Moniteur, plan auto-école: {plan}")
-            return True  # plan == 'premium'
-
-        print(f"🔍 Messagerie: Accès refusé pour {request.user.user_type}")
+        logger.debug("Messagerie: accès refusé pour %s", request.user.user_type)
         return False
 
 
+def with_user_summary(queryset, user):
+    """Précharge le résumé de l'utilisateur pour chaque conversation (user_summaries)"""
+    return queryset.prefetch_related(Prefetch(
+        'summaries',
+        queryset=ConversationSummary.objects.filter(owner=user).select_related('last_sender'),
+        to_attr='user_summaries'
+    ))
+
+
 class ConversationListCreateView(generics.ListCreateAPIView):
     """Vue pour lister et créer les conversations"""
     permission_classes = [permissions.IsAuthenticated, PremiumFeaturePermission]
@@ -58,9 +76,9 @@ class ConversationListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversation.objects.filter(
+        return with_user_summary(Conversation.objects.filter(
             participants=user
-        ).distinct().order_by('-updated_at')
+        ).distinct().order_by('-updated_at'), user)
 
 
 class ConversationDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -70,7 +88,7 @@ class ConversationDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Conversation.objects.filter(participants=user)
+        return with_user_summary(Conversation.objects.filter(participants=user), user)
 
 
 class MessageListCreateView(generics.ListCreateAPIView):
@@ -105,11 +123,13 @@ class MessageListCreateView(generics.ListCreateAPIView):
                 id=conversation_id,
                 participants=user
             )
-            serializer.save(conversation=conversation, sender=user)
+            # Message et résumés des participants dans la même transaction
+            with transaction.atomic():
+                serializer.save(conversation=conversation, sender=user)
 
-            # Mettre à jour la date de dernière activité de la conversation
-            conversation.updated_at = timezone.now()
-            conversation.save()
+                # Mettre à jour la date de dernière activité de la conversation
+                conversation.updated_at = timezone.now()
+                conversation.save()
 
         except Conversation.DoesNotExist:
             raise Http404(_("Conversation non trouvée"))
@@ -150,12 +170,7 @@ def mark_messages_read_view(request, conversation_id):
                        status=status.HTTP_404_NOT_FOUND)
 
     # Marquer tous les messages non lus comme lus
-    unread_messages = conversation.messages.filter(
-        read_by__isnull=True
-    ).exclude(sender=user)
-
-    for message in unread_messages:
-        message.read_by.add(user)
+    mark_conversation_read(conversation, user.id)
 
     return Response({'message': _('Messages marqués comme lus')})
 
@@ -166,10 +181,10 @@ def unread_count_view(request):
     """Vue pour récupérer le nombre total de messages non lus"""
     user = request.user
 
-    unread_count = Message.objects.filter(
-        conversation__participants=user,
-        read_by__isnull=True
-    ).exclude(sender=user).count()
+    unread_count = ConversationSummary.objects.filter(
+        owner=user,
+        conversation__isnull=False
+    ).aggregate(total=Sum('unread_count'))['total'] or 0
 
     return Response({'unread_count': unread_count})
 
@@ -182,111 +197,96 @@ def is_admin_user(user):
     except:
         return False
 
-def get_user_photo_url(user, profile=None):
-    """Helper function to get user photo URL"""
-    # First check if user has a photo
-    if user.photo:
-        return user.photo.url
 
-    # Then check profile-specific photos
-    if profile and hasattr(profile, 'photo') and profile.photo:
-        return profile.photo.url
+def encode_message_cursor(message):
+    """Curseur opaque désignant la position (created_at, id) d'un message"""
+    raw = f"{message['created_at'].isoformat()}|{message['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_message_cursor(cursor):
+    """Position (created_at, id) d'un curseur ; ValueError s'il est invalide"""
+    if not cursor:
+        return None
+    created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(message_id)
+
+
+def direct_messages_page(user, contact, before=None, after=None, limit=DIRECT_MESSAGES_PAGE_SIZE):
+    """
+    Page de messages directs entre deux utilisateurs, par pagination par
+    clé sur (created_at, id) : chaque branche de la conversation parcourt
+    l'index (sender, recipient, -created_at) sans OFFSET.
+
+    Sans curseur, retourne les messages les plus récents. Les messages sont
+    rendus dans l'ordre chronologique, avec un indicateur de page suivante
+    dans le sens demandé.
+    """
+    messages = DirectMessage.objects.filter(
+        Q(sender=user, recipient=contact) | Q(sender=contact, recipient=user)
+    )
+    if after is not None:
+        created_at, message_id = after
+        messages = messages.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        ).order_by('created_at', 'id')
+    else:
+        if before is not None:
+            created_at, message_id = before
+            messages = messages.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            )
+        messages = messages.order_by('-created_at', '-id')
+
+    rows = list(messages.values('id', 'content', 'sender_id', 'created_at', 'is_read')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return rows, has_more
+
+
+class ParticipantPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
 
-    return None
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, PremiumFeaturePermission])
 def available_participants_view(request):
-    """Vue pour récupérer les participants disponibles (membres de l'auto-école)"""
-    user = request.user
-    participants = []
-
-    try:
-        if hasattr(user, 'driving_school'):
-            # Auto-école peut voir tous ses membres
-            driving_school = user.driving_school
-
-            # Étudiants de l'auto-école
-            students = driving_school.students.select_related('user').all()
-            for student in students:
-                participants.append({
-                    'id': student.user.id,
-                    'username': student.user.username,
-                    'first_name': student.user.first_name,
-                    'last_name': student.user.last_name,
-                    'user_type': 'student',
-                    'photo': get_user_photo_url(student.user, student)
-                })
-
-            # Moniteurs de l'auto-école
-            instructors = driving_school.instructors.select_related('user').all()
-            for instructor in instructors:
-                participants.append({
-                    'id': instructor.user.id,
-                    'username': instructor.user.username,
-                    'first_name': instructor.user.first_name,
-                    'last_name': instructor.user.last_name,
-                    'user_type': 'instructor',
-                    'photo': get_user_photo_url(instructor.user, instructor)
-                })
-
-        elif user.user_type == 'student' and hasattr(user, 'student'):
-            # Étudiant peut voir son auto-école et les moniteurs
-            driving_school = user.student.driving_school
-
-            # Propriétaire de l'auto-école
-            participants.append({
-                'id': driving_school.owner.id,
-                'username': driving_school.owner.username,
-                'first_name': driving_school.name,
-                'last_name': '(Auto-école)',
-                'user_type': 'driving_school_owner',
-                'photo': get_user_photo_url(driving_school.owner)
-            })
+    """
+    Vue pour récupérer les participants disponibles (membres de l'auto-école).
 
-            # Moniteurs
-            instructors = driving_school.instructors.select_related('user').all()
-            for instructor in instructors:
-                participants.append({
-                    'id': instructor.user.id,
-                    'username': instructor.user.username,
-                    'first_name': instructor.user.first_name,
-                    'last_name': instructor.user.last_name,
-                    'user_type': 'instructor',
-                    'photo': get_user_photo_url(instructor.user, instructor)
-                })
-
-        elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-            # Moniteur peut voir son auto-école et les étudiants
-            driving_school = user.instructor_profile.driving_school
-
-            # Propriétaire de l'auto-école
-            participants.append({
-                'id': driving_school.owner.id,
-                'username': driving_school.owner.username,
-                'first_name': driving_school.name,
-                'last_name': '(Auto-école)',
-                'user_type': 'driving_school_owner',
-                'photo': get_user_photo_url(driving_school.owner)
-            })
-
-            # Étudiants
-            students = driving_school.students.select_related('user').all()
-            for student in students:
-                participants.append({
-                    'id': student.user.id,
-                    'username': student.user.username,
-                    'first_name': student.user.first_name,
-                    'last_name': student.user.last_name,
-                    'user_type': 'student',
-                    'photo': get_user_photo_url(student.user, student)
-                })
+    L'annuaire de l'auto-école est mis en cache et versionné : `?search=`
+    filtre par nom, la réponse est paginée (`page`, `page_size`) et l'ETag
+    permet au client de ne pas retélécharger un annuaire inchangé.
+    """
+    user = request.user
 
-        return Response(participants)
+    tenant = get_request_tenant(request)
+    if tenant.driving_school_id is None:
+        return Response([])
+
+    version = get_participants_version(tenant.driving_school_id)
+    etag = quote_etag(hashlib.md5(
+        f'{tenant.driving_school_id}:{version}:{user.id}:{request.get_full_path()}'.encode()
+    ).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        participants = search_participants(
+            visible_participants(get_directory(tenant.driving_school_id, version), tenant.role),
+            request.query_params.get('search', '')
+        )
+        paginator = ParticipantPagination()
+        page = paginator.paginate_queryset(participants, request)
+        response = paginator.get_paginated_response(page)
+        response.data['version'] = version
 
-    except Exception as e:
-        print(f"Erreur lors de la récupération des participants: {e}")
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @api_view(['GET', 'POST'])
@@ -297,61 +297,40 @@ def direct_messages_view(request, contact_id):
 
     try:
         # Vérifier que le contact existe et appartient à la même auto-école
-        contact = User.objects.get(id=contact_id)
-
-        # Déterminer l'auto-école de l'utilisateur actuel
-        user_driving_school = None
-        if hasattr(user, 'driving_school'):
-            user_driving_school = user.driving_school
-        elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-            user_driving_school = user.instructor_profile.driving_school
-        elif user.user_type == 'student' and hasattr(user, 'student'):
-            user_driving_school = user.student.driving_school
-
-        # Déterminer l'auto-école du contact
-        contact_driving_school = None
-        if hasattr(contact, 'driving_school'):
-            contact_driving_school = contact.driving_school
-        elif contact.user_type == 'instructor' and hasattr(contact, 'instructor_profile'):
-            contact_driving_school = contact.instructor_profile.driving_school
-        elif contact.user_type == 'student' and hasattr(contact, 'student'):
-            contact_driving_school = contact.student.driving_school
-
-        # Vérifier qu'ils appartiennent à la même auto-école
-        if not user_driving_school or not contact_driving_school or user_driving_school != contact_driving_school:
+        contact = User.objects.select_related('student', 'instructor_profile').get(id=contact_id)
+        if not same_school(user, contact):
             return Response({'error': 'Contact non autorisé'}, status=status.HTTP_403_FORBIDDEN)
 
         if request.method == 'GET':
-            # Récupérer les messages directs entre les deux utilisateurs
-            messages = DirectMessage.objects.filter(
-                models.Q(sender=user, recipient=contact) |
-                models.Q(sender=contact, recipient=user)
-            ).order_by('created_at')
-
-            # Sérialiser les messages
-            messages_data = []
-            for message in messages:
-                # Get sender profile for photo
-                sender_profile = None
-                if message.sender.user_type == 'student' and hasattr(message.sender, 'student'):
-                    sender_profile = message.sender.student
-                elif message.sender.user_type == 'instructor' and hasattr(message.sender, 'instructor_profile'):
-                    sender_profile = message.sender.instructor_profile
-
-                messages_data.append({
-                    'id': message.id,
-                    'content': message.content,
-                    'sender': {
-                        'id': message.sender.id,
-                        'first_name': message.sender.first_name,
-                        'last_name': message.sender.last_name,
-                        'photo': get_user_photo_url(message.sender, sender_profile)
-                    },
-                    'created_at': message.created_at.isoformat(),
-                    'is_read': message.is_read
-                })
-
-            return Response(messages_data)
+            try:
+                before = decode_message_cursor(request.query_params.get('before'))
+                after = decode_message_cursor(request.query_params.get('after'))
+                limit = int(request.query_params.get('limit', DIRECT_MESSAGES_PAGE_SIZE))
+            except ValueError:
+                return Response({'error': 'Paramètres de pagination invalides'}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, DIRECT_MESSAGES_MAX_PAGE_SIZE))
+
+            messages, has_more = direct_messages_page(user, contact, before=before, after=after, limit=limit)
+
+            # Deux expéditeurs possibles : profils résolus une fois par page
+            senders = {participant.id: sender_data(participant) for participant in (user, contact)}
+            results = [{
+                'id': message['id'],
+                'content': message['content'],
+                'sender': senders[message['sender_id']],
+                'created_at': message['created_at'].isoformat(),
+                'is_read': message['is_read']
+            } for message in messages]
+
+            # `before` : page plus ancienne ; `after` : messages plus récents (à interroger)
+            older_exists = has_more if after is None else bool(messages)
+            return Response({
+                'results': results,
+                'has_more': has_more,
+                'before': encode_message_cursor(messages[0]) if messages and older_exists else None,
+                'after': (encode_message_cursor(messages[-1]) if messages
+                          else request.query_params.get('after')),
+            })
 
         elif request.method == 'POST':
             # Envoyer un message direct
@@ -359,30 +338,19 @@ def direct_messages_view(request, contact_id):
             if not content:
                 return Response({'error': 'Le contenu du message est requis'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Créer le message direct
-            message = DirectMessage.objects.create(
-                sender=user,
-                recipient=contact,
-                content=content
-            )
-
-            # Get sender profile for photo
-            sender_profile = None
-            if user.user_type == 'student' and hasattr(user, 'student'):
-                sender_profile = user.student
-            elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-                sender_profile = user.instructor_profile
+            # Créer le message direct (et mettre à jour les résumés) atomiquement
+            with transaction.atomic():
+                message = DirectMessage.objects.create(
+                    sender=user,
+                    recipient=contact,
+                    content=content
+                )
 
             # Retourner le message créé
             message_data = {
                 'id': message.id,
                 'content': message.content,
-                'sender': {
-                    'id': message.sender.id,
-                    'first_name': message.sender.first_name,
-                    'last_name': message.sender.last_name,
-                    'photo': get_user_photo_url(message.sender, sender_profile)
-                },
+                'sender': sender_data(user),
                 'created_at': message.created_at.isoformat(),
                 'is_read': message.is_read
             }
@@ -391,8 +359,8 @@ def direct_messages_view(request, contact_id):
 
     except User.DoesNotExist:
         return Response({'error': 'Contact non trouvé'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        print(f"Erreur lors de la gestion des messages directs: {e}")
+    except Exception:
+        logger.exception("Erreur lors de la gestion des messages directs")
         return Response({'error': 'Erreur interne'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -407,38 +375,21 @@ def unread_messages_count_view(request, contact_id):
         contact = User.objects.get(id=contact_id)
 
         # Vérifier les permissions (même logique que direct_messages_view)
-        user_driving_school = None
-        if hasattr(user, 'driving_school'):
-            user_driving_school = user.driving_school
-        elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-            user_driving_school = user.instructor_profile.driving_school
-        elif user.user_type == 'student' and hasattr(user, 'student'):
-            user_driving_school = user.student.driving_school
-
-        contact_driving_school = None
-        if hasattr(contact, 'driving_school'):
-            contact_driving_school = contact.driving_school
-        elif contact.user_type == 'instructor' and hasattr(contact, 'instructor_profile'):
-            contact_driving_school = contact.instructor_profile.driving_school
-        elif contact.user_type == 'student' and hasattr(contact, 'student'):
-            contact_driving_school = contact.student.driving_school
-
-        if not user_driving_school or not contact_driving_school or user_driving_school != contact_driving_school:
+        if not same_school(user, contact):
             return Response({'error': 'Contact non autorisé'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Compter les messages non lus de ce contact
-        unread_count = DirectMessage.objects.filter(
-            sender=contact,
-            recipient=user,
-            is_read=False
-        ).count()
+        # Compteur dénormalisé des messages non lus de ce contact
+        unread_count = ConversationSummary.objects.filter(
+            owner=user,
+            contact=contact
+        ).values_list('unread_count', flat=True).first() or 0
 
         return Response({'unread_count': unread_count})
 
     except User.DoesNotExist:
         return Response({'error': 'Contact non trouvé'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        print(f"Erreur lors de la récupération du compteur: {e}")
+    except Exception:
+        logger.exception("Erreur lors de la récupération du compteur")
         return Response({'error': 'Erreur interne'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -451,20 +402,18 @@ def mark_direct_messages_read_view(request, contact_id):
     try:
         # Vérifier que le contact existe et appartient à la même auto-école (même logique)
         contact = User.objects.get(id=contact_id)
+        if not same_school(user, contact):
+            return Response({'error': 'Contact non autorisé'}, status=status.HTTP_403_FORBIDDEN)
 
         # Marquer tous les messages de ce contact comme lus
-        DirectMessage.objects.filter(
-            sender=contact,
-            recipient=user,
-            is_read=False
-        ).update(is_read=True)
+        mark_direct_messages_read(user.id, contact.id)
 
         return Response({'success': True})
 
     except User.DoesNotExist:
         return Response({'error': 'Contact non trouvé'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        print(f"Erreur lors du marquage comme lu: {e}")
+    except Exception:
+        logger.exception("Erreur lors du marquage comme lu")
         return Response({'error': 'Erreur interne'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -475,19 +424,37 @@ def all_unread_counts_view(request):
     user = request.user
 
     try:
-        # Récupérer tous les messages non lus pour cet utilisateur
-        unread_messages = DirectMessage.objects.filter(
-            recipient=user,
-            is_read=False
-        ).values('sender').annotate(count=models.Count('id'))
+        # Dictionnaire {sender_id: count} lu depuis les résumés de conversation
+        return Response(unread_counts(user))
 
-        # Créer un dictionnaire {sender_id: count}
-        unread_counts = {}
-        for item in unread_messages:
-            unread_counts[item['sender']] = item['count']
+    except Exception:
+        logger.exception("Erreur lors de la récupération des compteurs")
+        return Response({}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response(unread_counts)
 
-    except Exception as e:
-        print(f"Erreur lors de la récupération des compteurs: {e}")
-        return Response({}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, PremiumFeaturePermission])
+def inbox_view(request):
+    """
+    Boîte de réception : contacts et conversations de l'utilisateur avec
+    dernier message et non lus, en une requête sur les résumés.
+    """
+    items = []
+    for summary in inbox(request.user):
+        items.append({
+            'type': 'direct' if summary.contact_id else 'conversation',
+            'contact': sender_data(summary.contact) if summary.contact_id else None,
+            'conversation': {
+                'id': summary.conversation.id,
+                'title': summary.conversation.title
+            } if summary.conversation_id else None,
+            'last_message': {
+                'id': summary.last_message_id,
+                'preview': summary.last_message_preview,
+                'sender_id': summary.last_sender_id,
+                'created_at': summary.last_message_at.isoformat()
+            },
+            'unread_count': summary.unread_count
+        })
+
+    return Response(items)
@@ -0,0 +1,31 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import DISPATCH_BATCH_SIZE, DISPATCH_MAX_ATTEMPTS, run_dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Diffuse les notifications temps réel enregistrées dans la file (outbox) vers les WebSockets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Attente (secondes) lorsque la file est vide')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE,
+                            help='Événements diffusés par lot')
+        parser.add_argument('--max-attempts', type=int, default=DISPATCH_MAX_ATTEMPTS,
+                            help='Tentatives avant abandon d\'un événement')
+        parser.add_argument('--once', action='store_true',
+                            help='Vide la file puis s\'arrête')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Répartiteur de notifications démarré')
+        try:
+            asyncio.run(run_dispatcher(
+                poll_interval=options['interval'],
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                once=options['once'],
+            ))
+        except KeyboardInterrupt:
+            self.stdout.write('Répartiteur arrêté')
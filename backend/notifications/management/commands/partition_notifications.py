@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from notifications.partitioning import PARTITIONED_MODELS, convert_table, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = ('Partitionnement mensuel des tables de notifications (PostgreSQL) : '
+            'conversion initiale puis création des partitions à venir (à planifier chaque mois)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Convertit les tables non partitionnées (verrou exclusif pendant la copie)')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Nombre de partitions mensuelles créées à l\'avance')
+        parser.add_argument('--source', choices=sorted(PARTITIONED_MODELS),
+                            help='Limite le traitement à une table')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Le partitionnement nécessite PostgreSQL')
+
+        sources = [options['source']] if options['source'] else sorted(PARTITIONED_MODELS)
+        for source in sources:
+            table = PARTITIONED_MODELS[source]._meta.db_table
+            with connection.cursor() as cursor:
+                partitioned = is_partitioned(cursor, table)
+
+            if not partitioned:
+                if not options['convert']:
+                    self.stdout.write(self.style.WARNING(
+                        f'{table}: table non partitionnée (relancer avec --convert)'
+                    ))
+                    continue
+                convert_table(table, options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(f'{table}: table convertie en partitions mensuelles'))
+                continue
+
+            try:
+                months = ensure_partitions(table, options['months_ahead'])
+            except DatabaseError as e:
+                # Lignes du mois déjà présentes dans la partition par défaut
+                raise CommandError(f'{table}: création des partitions impossible ({e})')
+            self.stdout.write(self.style.SUCCESS(
+                f'{table}: partitions jusqu\'à {months[-1]:%m/%Y} disponibles'
+            ))
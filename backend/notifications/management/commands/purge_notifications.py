@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.retention import RETENTION_BATCH_SIZE, RETENTION_TARGETS, expired, purge, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = ('Supprime ou archive par lots les notifications lues ou masquées '
+            'plus anciennes que la durée de conservation (notifications et messagerie)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS,
+                            help='Âge minimal (en jours) des notifications traitées')
+        parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE,
+                            help='Notifications traitées par transaction')
+        parser.add_argument('--archive', action='store_true',
+                            default=settings.NOTIFICATION_RETENTION_ARCHIVE,
+                            help='Copie les notifications dans NotificationArchive avant suppression')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Attente (secondes) entre deux lots')
+        parser.add_argument('--source', choices=sorted(RETENTION_TARGETS),
+                            help='Limite le traitement à une table')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Affiche le nombre de notifications concernées sans rien modifier')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        sources = [options['source']] if options['source'] else sorted(RETENTION_TARGETS)
+        action = 'archivées' if options['archive'] else 'supprimées'
+
+        for source in sources:
+            if options['dry_run']:
+                count = expired(source, cutoff).count()
+                self.stdout.write(f'{source}: {count} notification(s) à traiter (avant le {cutoff:%d/%m/%Y})')
+                continue
+
+            count = purge(
+                source, cutoff,
+                batch_size=options['batch_size'],
+                archive=options['archive'],
+                pause=options['pause'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'{source}: {count} notification(s) {action}'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('new_student', 'Nouveau étudiant inscrit'), ('instructor_update', 'Mise à jour moniteur'), ('vehicle_issue', 'Problème véhicule'), ('vehicle_expense', 'Dépense véhicule'), ('payment_received', 'Paiement reçu'), ('payment_overdue', 'Paiement en retard'), ('subscription_expiry', 'Expiration abonnement'), ('vehicle_expiry', 'Expiration véhicule'), ('support_response', 'Réponse support'), ('session_assigned', 'Nouvelle séance assignée'), ('schedule_change', "Changement d'horaire"), ('student_progress', 'Progrès étudiant'), ('session_cancelled', 'Séance annulée'), ('lesson_confirmed', 'Leçon confirmée'), ('lesson_reminder', 'Rappel de leçon'), ('schedule_updated', 'Horaire mis à jour'), ('exam_result', "Résultat d'examen"), ('exam_reminder', "Rappel d'examen"), ('payment_reminder', 'Rappel de paiement'), ('payment_confirmed', 'Paiement confirmé'), ('exam_added', 'Nouvel examen')], max_length=50),
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['available_at', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
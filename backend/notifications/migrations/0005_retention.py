@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:02
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_type_system'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('notifications', 'Notifications'), ('messaging', 'Messagerie')], max_length=20)),
+                ('original_id', models.BigIntegerField()),
+                ('recipient_id', models.BigIntegerField()),
+                ('notification_type', models.CharField(max_length=50)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_dismissed', False), ('is_read', False)), fields=['recipient'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['recipient_id', 'created_at'], name='notif_archive_recipient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationarchive',
+            constraint=models.UniqueConstraint(fields=('source', 'original_id'), name='notif_archive_unique_source'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 User = get_user_model()
 
@@ -33,6 +34,9 @@ class Notification(models.Model):
         ('payment_reminder', 'Rappel de paiement'),
         ('payment_confirmed', 'Paiement confirmé'),
         ('exam_added', 'Nouvel examen'),
+
+        # Platform notifications
+        ('system', 'Annonce système'),
     ]
     
     PRIORITY_LEVELS = [
@@ -69,6 +73,11 @@ class Notification(models.Model):
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['recipient', 'created_at']),
             models.Index(fields=['notification_type']),
+            # Compteur de non lus : ne couvre que les notifications actives
+            models.Index(
+                fields=['recipient'], name='notification_unread_idx',
+                condition=models.Q(is_read=False, is_dismissed=False)
+            ),
         ]
     
     def __str__(self):
@@ -103,6 +112,7 @@ class Notification(models.Model):
             'payment_reminder': '💳',
             'payment_confirmed': '✅',
             'exam_added': '📝',
+            'system': '📢',
         }
         return icon_map.get(self.notification_type, '📢')
     
@@ -115,3 +125,68 @@ class Notification(models.Model):
             'urgent': 'text-red-500',
         }
         return color_map.get(self.priority, 'text-blue-500')
+
+
+class OutboxEvent(models.Model):
+    """
+    Événement temps réel à diffuser sur la couche de canaux, enregistré dans
+    la même transaction que la modification qui le produit. Le répartiteur
+    (commande dispatch_notifications) les envoie par lots avec reprises.
+    """
+    group = models.CharField(max_length=100)
+    payload = models.JSONField()
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    # Prochaine tentative (réservation du lot en cours ou délai de reprise)
+    available_at = models.DateTimeField(default=timezone.now)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'], name='outbox_pending_idx',
+                condition=models.Q(dispatched_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.payload.get('type')} -> {self.group}"
+
+
+class NotificationArchive(models.Model):
+    """
+    Notification lue ou masquée retirée de sa table d'origine par la
+    commande purge_notifications --archive (notifications et messagerie).
+    """
+    SOURCES = [
+        ('notifications', 'Notifications'),
+        ('messaging', 'Messagerie'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCES)
+    original_id = models.BigIntegerField()
+    recipient_id = models.BigIntegerField()
+    notification_type = models.CharField(max_length=50)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    # Autres champs de la notification d'origine
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient_id', 'created_at'], name='notif_archive_recipient_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'original_id'], name='notif_archive_unique_source'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.source})"
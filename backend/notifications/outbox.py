@@ -0,0 +1,144 @@
+import asyncio
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+# Événements diffusés par lot
+DISPATCH_BATCH_SIZE = 100
+# Tentatives avant abandon d'un événement (conservé avec sa dernière erreur)
+DISPATCH_MAX_ATTEMPTS = 5
+# Réservation d'un lot : un autre répartiteur le reprend passé ce délai
+DISPATCH_LEASE = timedelta(seconds=60)
+# Délai avant reprise après un échec, doublé à chaque tentative
+RETRY_BASE_DELAY = timedelta(seconds=2)
+# Conservation des événements diffusés
+DISPATCHED_RETENTION = timedelta(days=1)
+# Conservation des événements abandonnés (avec leur dernière erreur, pour diagnostic)
+ABANDONED_RETENTION = timedelta(days=7)
+
+
+def enqueue(group, payload):
+    """
+    Enregistre un message à envoyer au groupe `group` de la couche de
+    canaux. Appelé dans la transaction de la modification : l'événement
+    n'existe que si elle est validée, et la requête n'attend pas Redis.
+    """
+    return OutboxEvent.objects.create(group=group, payload=payload)
+
+
+def notification_payload(notification):
+    """Message 'notification_created' d'une notification utilisateur"""
+    return {
+        'type': 'notification_created',
+        'notification': {
+            'id': notification.id,
+            'type': notification.notification_type,
+            'title': notification.title,
+            'message': notification.message,
+            'priority': notification.priority,
+            'icon': notification.get_icon(),
+            'created_at': notification.created_at.isoformat(),
+        }
+    }
+
+
+def enqueue_notification(notification):
+    return enqueue(f"user_{notification.recipient_id}", notification_payload(notification))
+
+
+def claim_batch(batch_size=DISPATCH_BATCH_SIZE, max_attempts=DISPATCH_MAX_ATTEMPTS):
+    """
+    Réserve les prochains événements à diffuser (verrous SKIP LOCKED sur
+    PostgreSQL : plusieurs répartiteurs se partagent la file).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                dispatched_at__isnull=True,
+                available_at__lte=now,
+                attempts__lt=max_attempts
+            ).order_by('available_at', 'id')[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                available_at=now + DISPATCH_LEASE
+            )
+    return events
+
+
+def record_results(events, results):
+    """Marque les événements diffusés et reprogramme ceux en échec"""
+    now = timezone.now()
+    delivered = [event.pk for event, error in zip(events, results) if error is None]
+    with transaction.atomic():
+        if delivered:
+            OutboxEvent.objects.filter(pk__in=delivered).update(dispatched_at=now)
+        for event, error in zip(events, results):
+            if error is not None:
+                OutboxEvent.objects.filter(pk=event.pk).update(
+                    attempts=F('attempts') + 1,
+                    last_error=repr(error)[:1000],
+                    available_at=now + RETRY_BASE_DELAY * 2 ** event.attempts
+                )
+    return len(delivered)
+
+
+def purge_dispatched(retention=DISPATCHED_RETENTION, abandoned_retention=ABANDONED_RETENTION,
+                     max_attempts=DISPATCH_MAX_ATTEMPTS):
+    """
+    Supprime les événements diffusés passé `retention`, et ceux abandonnés
+    (nombre maximal de tentatives atteint, jamais diffusés) passé
+    `abandoned_retention` : ils ne restent pas indéfiniment dans l'index
+    des événements en attente.
+    """
+    now = timezone.now()
+    deleted, _details = OutboxEvent.objects.filter(
+        Q(dispatched_at__lt=now - retention)
+        | Q(dispatched_at__isnull=True, attempts__gte=max_attempts,
+            created_at__lt=now - abandoned_retention)
+    ).delete()
+    return deleted
+
+
+async def _send(channel_layer, event):
+    try:
+        await channel_layer.group_send(event.group, event.payload)
+    except Exception as error:
+        return error
+    return None
+
+
+async def dispatch_batch(channel_layer=None, batch_size=DISPATCH_BATCH_SIZE,
+                         max_attempts=DISPATCH_MAX_ATTEMPTS):
+    """
+    Diffuse un lot d'événements en parallèle et retourne le nombre
+    d'événements traités (diffusés ou reprogrammés).
+    """
+    channel_layer = channel_layer or get_channel_layer()
+    events = await database_sync_to_async(claim_batch)(batch_size, max_attempts)
+    if not events:
+        return 0
+    results = await asyncio.gather(*(_send(channel_layer, event) for event in events))
+    await database_sync_to_async(record_results)(events, results)
+    return len(events)
+
+
+async def run_dispatcher(poll_interval=1.0, batch_size=DISPATCH_BATCH_SIZE,
+                         max_attempts=DISPATCH_MAX_ATTEMPTS, once=False):
+    """Vide la file en continu ; attend `poll_interval` secondes lorsqu'elle est vide"""
+    channel_layer = get_channel_layer()
+    while True:
+        processed = await dispatch_batch(channel_layer, batch_size, max_attempts)
+        if processed:
+            continue
+        if once:
+            return
+        await database_sync_to_async(purge_dispatched)(max_attempts=max_attempts)
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,109 @@
+"""
+Partitionnement mensuel (PostgreSQL) des tables de notifications, par plage
+sur created_at : la liste des 30 derniers jours ne lit que les partitions
+récentes, et les index de chaque partition restent petits.
+
+La clé primaire devient (id, created_at), comme l'exige PostgreSQL ; les
+identifiants restent uniques grâce à la séquence de la table.
+"""
+from datetime import date, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from messaging.models import Notification as PushNotification
+
+from .models import Notification
+
+PARTITIONED_MODELS = {
+    'notifications': Notification,
+    'messaging': PushNotification,
+}
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])
+    return cursor.fetchone()[0] == 'p'
+
+
+def create_month_partition(cursor, table, month):
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {qn(partition_name(table, month))} PARTITION OF {qn(table)} "
+        f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    )
+
+
+def ensure_partitions(table, months_ahead):
+    """Crée les partitions du mois courant et des `months_ahead` mois suivants (bornes en UTC)"""
+    current = timezone.now().date().replace(day=1)
+    months = [add_months(current, offset) for offset in range(months_ahead + 1)]
+    with connection.cursor() as cursor:
+        for month in months:
+            create_month_partition(cursor, table, month)
+    return months
+
+
+def convert_table(table, months_ahead):
+    """
+    Remplace `table` par une table partitionnée par mois (une transaction) :
+    partitions depuis la plus ancienne notification, partition par défaut,
+    copie des lignes, puis index et clés étrangères recréés.
+    """
+    qn = connection.ops.quote_name
+    legacy = f'{table}_legacy'
+    # Nom distinct de la séquence d'identité de l'ancienne table, supprimée avec elle
+    sequence = f'{table}_part_id_seq'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Définitions à recréer sur la nouvelle table (hors clé primaire)
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = %s::regclass AND NOT indisprimary", [table]
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN(created_at) FROM {qn(table)}")
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {qn(sequence)} OWNED BY {qn(table)}.id")
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, created_at)")
+
+        month = oldest.astimezone(dt_timezone.utc).date().replace(day=1)
+        last = add_months(timezone.now().date().replace(day=1), months_ahead)
+        while month <= last:
+            create_month_partition(cursor, table, month)
+            month = add_months(month, 1)
+        cursor.execute(f"CREATE TABLE {qn(table + '_pdefault')} PARTITION OF {qn(table)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM {qn(table)}")
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
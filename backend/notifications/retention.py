@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from messaging.models import Notification as PushNotification
+
+from .models import Notification, NotificationArchive
+
+# Notifications supprimées (ou archivées) par transaction
+RETENTION_BATCH_SIZE = 1000
+
+# Tables concernées : source de l'archive, modèle et notifications expirables
+RETENTION_TARGETS = {
+    'notifications': (Notification, Q(is_read=True) | Q(is_dismissed=True)),
+    'messaging': (PushNotification, Q(is_read=True)),
+}
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = settings.NOTIFICATION_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def expired(source, cutoff):
+    """Notifications lues ou masquées créées avant `cutoff`"""
+    model, stale = RETENTION_TARGETS[source]
+    return model.objects.filter(stale, created_at__lt=cutoff)
+
+
+def _archive_rows(source, notifications):
+    archived = []
+    for row in notifications:
+        archived.append(NotificationArchive(
+            source=source,
+            original_id=row.pop('id'),
+            recipient_id=row.pop('recipient_id'),
+            notification_type=row.pop('notification_type'),
+            title=row.pop('title'),
+            message=row.pop('message'),
+            created_at=row.pop('created_at'),
+            data=row,
+        ))
+    NotificationArchive.objects.bulk_create(archived, ignore_conflicts=True)
+
+
+def purge_batch(source, cutoff, batch_size=RETENTION_BATCH_SIZE, archive=False):
+    """
+    Supprime (après archivage éventuel) un lot de notifications expirées,
+    dans l'ordre des clés primaires, et retourne sa taille. Chaque lot est
+    une transaction courte : les verrous ne bloquent pas les écritures.
+    """
+    model, _stale = RETENTION_TARGETS[source]
+    ids = list(
+        expired(source, cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    with transaction.atomic():
+        batch = model.objects.filter(pk__in=ids)
+        if archive:
+            _archive_rows(source, batch.values())
+        batch.delete()
+    return len(ids)
+
+
+def purge(source, cutoff, batch_size=RETENTION_BATCH_SIZE, archive=False, pause=0):
+    """Traite toutes les notifications expirées d'une table par lots"""
+    total = 0
+    while True:
+        count = purge_batch(source, cutoff, batch_size, archive)
+        total += count
+        if count < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from driving_schools.tests import create_school, create_student
+from messaging.models import Notification as PushNotification
+
+from .models import Notification, NotificationArchive
+from .retention import purge, retention_cutoff
+
+
+class NotificationRetentionTests(TestCase):
+    """Suppression et archivage par lots des notifications lues ou masquées"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.user = create_student(cls.school, 0).user
+        old = timezone.now() - timedelta(days=120)
+
+        def notify(title, created_at, **kwargs):
+            notification = Notification.objects.create(
+                recipient=cls.user, notification_type='system', title=title,
+                message='Message', **kwargs
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=created_at)
+
+        for index in range(5):
+            notify(f'Ancienne lue {index}', old, is_read=True)
+        notify('Ancienne masquée', old, is_dismissed=True)
+        notify('Ancienne non lue', old)
+        notify('Récente lue', timezone.now(), is_read=True)
+
+        for is_read in (True, False):
+            push = PushNotification.objects.create(
+                driving_school=cls.school, recipient=cls.user, notification_type='system',
+                title='Push', message='Message', is_read=is_read
+            )
+            PushNotification.objects.filter(pk=push.pk).update(created_at=old)
+
+    def test_expired_notifications_deleted_in_batches(self):
+        # Lots de 2 : 3 lots pleins puis un lot vide, chacun avec sa propre transaction
+        self.assertEqual(purge('notifications', retention_cutoff(90), batch_size=2), 6)
+        self.assertEqual(
+            set(Notification.objects.values_list('title', flat=True)),
+            {'Ancienne non lue', 'Récente lue'}
+        )
+        self.assertFalse(NotificationArchive.objects.exists())
+
+    def test_command_archives_both_tables(self):
+        out = StringIO()
+        call_command('purge_notifications', '--archive', '--days', '90', stdout=out)
+
+        self.assertIn('notifications: 6 notification(s) archivées', out.getvalue())
+        self.assertIn('messaging: 1 notification(s) archivées', out.getvalue())
+        self.assertEqual(PushNotification.objects.filter(is_read=False).count(), 1)
+        self.assertEqual(PushNotification.objects.count(), 1)
+
+        archived = NotificationArchive.objects.get(source='notifications', title='Ancienne masquée')
+        self.assertEqual(archived.recipient_id, self.user.id)
+        self.assertTrue(archived.data['is_dismissed'])
+        self.assertEqual(NotificationArchive.objects.filter(source='messaging').count(), 1)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('purge_notifications', '--dry-run', stdout=out)
+        self.assertIn('notifications: 6 notification(s) à traiter', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 8)
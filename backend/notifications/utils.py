@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.utils import timezone
 
 User = get_user_model()
 
+# Notifications insérées par requête dans notify_many
+NOTIFY_MANY_CHUNK_SIZE = 500
+
+
 def create_notification(recipient, notification_type, title, message, priority='medium', **kwargs):
     """
     Create a new notification
@@ -16,40 +21,77 @@ def create_notification(recipient, notification_type, title, message, priority='
         **kwargs: Additional fields (related_student_id, etc.)
     """
     from .models import Notification
-
-    notification = Notification.objects.create(
-        recipient=recipient,
-        notification_type=notification_type,
-        title=title,
-        message=message,
-        priority=priority,
-        **kwargs
-    )
-
-    # Send real-time notification via WebSocket
-    from channels.layers import get_channel_layer
-    from asgiref.sync import async_to_sync
-
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        async_to_sync(channel_layer.group_send)(
-            f"user_{recipient.id}",
-            {
-                'type': 'notification_created',
-                'notification': {
-                    'id': notification.id,
-                    'type': notification.notification_type,
-                    'title': notification.title,
-                    'message': notification.message,
-                    'priority': notification.priority,
-                    'icon': notification.get_icon(),
-                    'created_at': notification.created_at.isoformat(),
-                }
-            }
+    from .outbox import enqueue_notification
+
+    # Notification et événement temps réel validés ensemble ; la diffusion
+    # WebSocket est assurée par le répartiteur (dispatch_notifications)
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            recipient=recipient,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            priority=priority,
+            **kwargs
         )
+        enqueue_notification(notification)
 
     return notification
 
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def notify_many(recipients, notification_type, title, message, priority='medium',
+                chunk_size=NOTIFY_MANY_CHUNK_SIZE, **kwargs):
+    """
+    Create the same notification for many recipients
+
+    Args:
+        recipients: Users or user ids, consumed lazily (a streaming queryset can be passed)
+        notification_type, title, message, priority, **kwargs: as for create_notification
+        chunk_size: Notifications inserted per bulk_create
+
+    Each chunk inserts its notifications and their outbox events in one
+    transaction; the dispatcher fans the events out in batches.
+    Returns the number of notifications created.
+    """
+    from .models import Notification, OutboxEvent
+    from .outbox import notification_payload
+
+    created = 0
+    for chunk in _chunks(recipients, chunk_size):
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=getattr(recipient, 'pk', recipient),
+                    notification_type=notification_type,
+                    title=title,
+                    message=message,
+                    priority=priority,
+                    **kwargs
+                )
+                for recipient in chunk
+            ])
+            OutboxEvent.objects.bulk_create([
+                OutboxEvent(
+                    group=f"user_{notification.recipient_id}",
+                    payload=notification_payload(notification)
+                )
+                for notification in notifications
+            ])
+        created += len(notifications)
+    return created
+
+
 def notify_new_student_registration(driving_school_user, student_user):
     """Notify driving school when a new student registers"""
     create_notification(
@@ -1,7 +1,11 @@
+import logging
+
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
 from .models import Payment, SubscriptionPayment
 
+logger = logging.getLogger(__name__)
+
 
 class PaymentSerializer(serializers.ModelSerializer):
     """Serializer pour les paiements"""
@@ -31,7 +35,7 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
 
         # Créer le paiement
         payment = super().create(validated_data)
-        print(f"🔔 Paiement créé dans le serializer: {payment.id}")
+        logger.debug("Paiement créé dans le serializer: %s", payment.id)
 
         # Envoyer une notification à l'étudiant
         self._send_payment_notification(payment)
@@ -40,18 +44,15 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
 
     def _send_payment_notification(self, payment):
         """Envoyer une notification à l'étudiant quand un paiement est ajouté"""
-        print(f"🔔 _send_payment_notification appelée pour le paiement {payment.id}")
         try:
             # Import local pour éviter les imports circulaires
-            from notifications.models import Notification
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from notifications.utils import create_notification
 
             if payment.student and hasattr(payment.student, 'user'):
                 student_user = payment.student.user
                 due_date = payment.due_date.strftime('%d/%m/%Y')
 
-                notification = Notification.objects.create(
+                create_notification(
                     recipient=student_user,
                     notification_type='payment_reminder',
                     title='Nouveau paiement à effectuer',
@@ -60,33 +61,12 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
                     related_payment_id=payment.id
                 )
 
-                # Envoyer via WebSocket
-                channel_layer = get_channel_layer()
-                if channel_layer:
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{student_user.id}",
-                        {
-                            'type': 'notification_created',
-                            'notification': {
-                                'id': notification.id,
-                                'type': notification.notification_type,
-                                'title': notification.title,
-                                'message': notification.message,
-                                'priority': notification.priority,
-                                'icon': notification.get_icon(),
-                                'created_at': notification.created_at.isoformat(),
-                            }
-                        }
-                    )
-
-                print(f"📨 Notification de paiement envoyée à l'étudiant {student_user.username}")
+                logger.debug("Notification de paiement envoyée à l'étudiant %s", student_user.username)
             else:
-                print(f"❌ Étudiant non trouvé ou sans utilisateur associé")
+                logger.debug("Étudiant non trouvé ou sans utilisateur associé")
 
-        except Exception as e:
-            print(f"❌ Erreur lors de l'envoi de la notification de paiement: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Erreur lors de l'envoi de la notification de paiement")
 
 
 class PaymentUpdateSerializer(serializers.ModelSerializer):
@@ -8,6 +8,7 @@ from django.utils.translation import gettext_lazy as _
 from django.http import Http404
 
 from .models import Payment, SubscriptionPayment
+from driving_schools.cache import cached_school_stats
 from .serializers import (
     PaymentSerializer, PaymentCreateSerializer, PaymentUpdateSerializer, PaymentListSerializer,
     SubscriptionPaymentSerializer, SubscriptionPaymentCreateSerializer,
@@ -144,18 +145,8 @@ def mark_payment_paid_view(request, pk):
     return Response(serializer.data)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def payment_stats_view(request):
-    """Vue pour les statistiques de paiements"""
-    user = request.user
-
-    if not hasattr(user, 'driving_school'):
-        return Response({'error': _('Auto-école non trouvée')},
-                       status=status.HTTP_404_NOT_FOUND)
-
-    driving_school = user.driving_school
-
+def _compute_payment_stats(driving_school):
+    """Calcule les statistiques de paiements d'une auto-école"""
     # Revenus totaux
     total_revenue = driving_school.payments.filter(status='paid').aggregate(
         total=Sum('amount'))['total'] or 0
@@ -192,7 +183,7 @@ def payment_stats_view(request):
     # Taux de recouvrement
     collection_rate = (paid_payments / total_payments * 100) if total_payments > 0 else 0
 
-    stats = {
+    return {
         'total_revenue': total_revenue,
         'monthly_revenue': monthly_revenue,
         'pending_payments': pending_payments,
@@ -204,6 +195,23 @@ def payment_stats_view(request):
         'collection_rate': collection_rate,
     }
 
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def payment_stats_view(request):
+    """Vue pour les statistiques de paiements"""
+    user = request.user
+
+    if not hasattr(user, 'driving_school'):
+        return Response({'error': _('Auto-école non trouvée')},
+                       status=status.HTTP_404_NOT_FOUND)
+
+    driving_school = user.driving_school
+    stats = cached_school_stats(
+        driving_school.id, 'payments',
+        lambda: _compute_payment_stats(driving_school)
+    )
+
     serializer = PaymentStatsSerializer(stats)
     return Response(serializer.data)
 
@@ -0,0 +1,232 @@
+"""
+Instrumentation des requêtes HTTP et des messages WebSocket : nombre de
+requêtes, histogramme de latence, nombre et durée des requêtes SQL par route,
+exposés au format texte Prometheus (vue /metrics), et journal des requêtes
+lentes avec leurs requêtes SQL les plus coûteuses.
+
+Les compteurs sont propres à chaque processus : Prometheus interroge chaque
+worker séparément.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from channels.exceptions import StopConsumer
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Bornes de l'histogramme de latence (secondes), celles de Prometheus par défaut
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Requêtes SQL les plus lentes conservées pour le journal des requêtes lentes
+WORST_QUERIES = 5
+# Longueur maximale d'une requête SQL dans le journal
+SQL_LOG_LENGTH = 500
+
+# Mesure de la requête ou du message en cours (copiée dans les threads de
+# sync_to_async / database_sync_to_async avec le reste du contexte)
+_current_recorder = ContextVar('query_recorder', default=None)
+
+
+class QueryRecorder:
+    """Nombre, durée totale et requêtes SQL les plus lentes d'une requête"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._worst = []
+        self._sequence = itertools.count()
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        item = (duration, next(self._sequence), sql)
+        if len(self._worst) < WORST_QUERIES:
+            heapq.heappush(self._worst, item)
+        elif duration > self._worst[0][0]:
+            heapq.heapreplace(self._worst, item)
+
+    def worst(self):
+        return [(sql, duration) for duration, _sequence, sql in sorted(self._worst, reverse=True)]
+
+
+def record_query(execute, sql, params, many, context):
+    """Wrapper d'exécution SQL : mesure la requête si une mesure est en cours"""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    # Équivalent permanent de connection.execute_wrapper(record_query) : les
+    # consommateurs exécutent leurs requêtes dans d'autres threads, avec leurs
+    # propres connexions
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_on_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes par (protocole, route, méthode)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, protocol, route, method, status, duration, recorder):
+        key = (protocol, route, method)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'statuses': {},
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                    'count': 0,
+                    'duration': 0.0,
+                    'queries': 0,
+                    'query_duration': 0.0,
+                }
+            series['statuses'][status] = series['statuses'].get(status, 0) + 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['duration'] += duration
+            series['queries'] += recorder.count
+            series['query_duration'] += recorder.duration
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Exposition au format texte Prometheus (version 0.0.4)"""
+        with self._lock:
+            series = {key: {**value, 'statuses': dict(value['statuses']), 'buckets': list(value['buckets'])}
+                      for key, value in self._series.items()}
+
+        lines = [
+            '# HELP permini_requests_total Requêtes traitées par route.',
+            '# TYPE permini_requests_total counter',
+        ]
+        for (protocol, route, method), value in sorted(series.items()):
+            for status, count in sorted(value['statuses'].items()):
+                labels = _labels(protocol=protocol, route=route, method=method, status=status)
+                lines.append(f'permini_requests_total{{{labels}}} {count}')
+
+        lines += [
+            '# HELP permini_request_duration_seconds Latence des requêtes par route.',
+            '# TYPE permini_request_duration_seconds histogram',
+        ]
+        for (protocol, route, method), value in sorted(series.items()):
+            labels = _labels(protocol=protocol, route=route, method=method)
+            for bound, count in zip(LATENCY_BUCKETS, value['buckets']):
+                lines.append(f'permini_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'permini_request_duration_seconds_bucket{{{labels},le="+Inf"}} {value["count"]}')
+            lines.append(f'permini_request_duration_seconds_sum{{{labels}}} {value["duration"]:.6f}')
+            lines.append(f'permini_request_duration_seconds_count{{{labels}}} {value["count"]}')
+
+        lines += [
+            '# HELP permini_sql_queries_total Requêtes SQL exécutées par route.',
+            '# TYPE permini_sql_queries_total counter',
+        ]
+        for (protocol, route, method), value in sorted(series.items()):
+            labels = _labels(protocol=protocol, route=route, method=method)
+            lines.append(f'permini_sql_queries_total{{{labels}}} {value["queries"]}')
+
+        lines += [
+            '# HELP permini_sql_duration_seconds_total Temps passé en SQL par route.',
+            '# TYPE permini_sql_duration_seconds_total counter',
+        ]
+        for (protocol, route, method), value in sorted(series.items()):
+            labels = _labels(protocol=protocol, route=route, method=method)
+            lines.append(f'permini_sql_duration_seconds_total{{{labels}}} {value["query_duration"]:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+def _finish(protocol, route, method, status, started, recorder):
+    duration = time.perf_counter() - started
+    registry.observe(protocol, route, method, status, duration, recorder)
+
+    if duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+        logger.warning(
+            'Requête lente %s %s %s : %.0f ms, %d requêtes SQL (%.0f ms)%s',
+            protocol, method, route, duration * 1000, recorder.count, recorder.duration * 1000,
+            ''.join(
+                f'\n  {query_duration * 1000:.1f} ms  {sql[:SQL_LOG_LENGTH]}'
+                for sql, query_duration in recorder.worst()
+            )
+        )
+
+
+class InstrumentationMiddleware:
+    """Mesure chaque requête HTTP, regroupée par motif d'URL (route Django)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connexions déjà ouvertes avant le chargement du middleware
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            _current_recorder.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            route = '/' + match.route if match is not None else 'unmatched'
+            _finish('http', route, request.method, status, started, recorder)
+
+
+class InstrumentedConsumerMixin:
+    """
+    Mesure chaque message traité par un consommateur Channels (connexion,
+    message reçu, événement de groupe), regroupé par classe et type de message.
+    """
+
+    async def dispatch(self, message):
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            await super().dispatch(message)
+            status = 'ok'
+        except StopConsumer:
+            # Fin normale de la connexion
+            status = 'ok'
+            raise
+        finally:
+            _current_recorder.reset(token)
+            _finish('websocket', type(self).__name__, message['type'], status, started, recorder)
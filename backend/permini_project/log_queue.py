@@ -0,0 +1,68 @@
+"""
+Journalisation structurée hors du thread de requête : les vues ne font que
+déposer l'enregistrement dans une file (QueueHandler) ; un thread
+QueueListener le sérialise en JSON et l'écrit sur la sortie standard.
+
+Le message est assemblé (msg % args) au dépôt, pour ne pas lire plus tard
+des objets modifiés entre-temps ; les appels utilisent le formatage
+paresseux du module logging (logger.debug('... %s', valeur)), qui ne coûte
+rien lorsque le niveau est désactivé.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributs standard d'un LogRecord : les autres viennent de `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement, champs de `extra` compris"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    QueueHandler associé à son propre QueueListener, démarré à la
+    configuration du logging (LOGGING) et arrêté à la sortie du processus
+    après avoir vidé la file.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(StructuredFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Message et trace assemblés ici ; la sérialisation JSON et l'écriture
+        # restent au thread d'écoute
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
@@ -79,6 +79,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'permini_project.instrumentation.InstrumentationMiddleware',  # Métriques par route (/metrics)
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Pour servir les fichiers statiques
     'corsheaders.middleware.CorsMiddleware',
@@ -137,6 +138,21 @@ else:
     }
 
 
+# Contraintes d'exclusion PostgreSQL empêchant deux séances actives qui se
+# chevauchent pour un même moniteur ou véhicule (appliquées par la migration
+# schedules 0002, nécessite l'extension btree_gist)
+SCHEDULE_EXCLUSION_CONSTRAINTS = config('SCHEDULE_EXCLUSION_CONSTRAINTS', default=False, cast=bool)
+
+# Conservation des notifications lues ou masquées (commande purge_notifications),
+# archivées dans NotificationArchive plutôt que supprimées si demandé
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+NOTIFICATION_RETENTION_ARCHIVE = config('NOTIFICATION_RETENTION_ARCHIVE', default=False, cast=bool)
+
+# Âge maximal (secondes) du snapshot des statistiques du dashboard admin avant
+# recalcul à la lecture (rafraîchi par la commande refresh_platform_stats)
+PLATFORM_STATS_MAX_AGE = config('PLATFORM_STATS_MAX_AGE', default=900, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -215,7 +231,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -283,12 +299,16 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
 
+# ETag lisible par le client (revalidation de l'annuaire et du calendrier)
+CORS_EXPOSE_HEADERS = ['etag']
+
 # Allow specific methods
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -313,3 +333,69 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Cache Configuration
+# Le cache 'stats' contient les statistiques agrégées par auto-école.
+# Mémoire locale par défaut, Redis si REDIS_URL est explicitement configurée.
+STATS_CACHE_REDIS_URL = config('REDIS_URL', default='')
+STATS_CACHE_TIMEOUT = config('STATS_CACHE_TIMEOUT', default=300, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stats': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': STATS_CACHE_REDIS_URL,
+        'KEY_PREFIX': 'permini',
+        'TIMEOUT': STATS_CACHE_TIMEOUT,
+    } if STATS_CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'permini-stats',
+        'TIMEOUT': STATS_CACHE_TIMEOUT,
+    },
+}
+
+# Cache d'authentification (jetons DRF et sessions admin résolus en utilisateur).
+# LRU par processus ; avec Redis, un second niveau 'auth' partagé par les workers
+# et une durée locale plus courte, l'invalidation ne pouvant atteindre que Redis.
+AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=30, cast=int)
+AUTH_CACHE_LOCAL_TTL = config('AUTH_CACHE_LOCAL_TTL', default=5, cast=int)
+
+if STATS_CACHE_REDIS_URL:
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': STATS_CACHE_REDIS_URL,
+        'KEY_PREFIX': 'permini',
+        'TIMEOUT': AUTH_CACHE_TTL,
+    }
+
+# Instrumentation : requêtes HTTP et messages WebSocket au-delà de ce seuil
+# journalisés avec leurs requêtes SQL les plus lentes
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=500, cast=int)
+
+# Journalisation structurée (JSON sur la sortie standard), écrite par un
+# thread dédié (permini_project.log_queue). LOG_LEVEL=DEBUG active les
+# diagnostics détaillés, y compris les requêtes de comptage qu'ils exigent.
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queue': {
+            '()': 'permini_project.log_queue.BackgroundQueueHandler',
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
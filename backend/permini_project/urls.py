@@ -44,7 +44,7 @@ def media_debug(request):
         })
     except Exception as e:
         return JsonResponse({'error': str(e)})
-from admin_dashboard.views import validate_coupon_public
+from admin_dashboard.views import metrics_view, validate_coupon_public
 
 urlpatterns = [
     # Health check pour Railway
@@ -52,6 +52,9 @@ urlpatterns = [
     path('health/', health_check, name='health_check_alt'),
     path('debug/media/', media_debug, name='media_debug'),
 
+    # Métriques Prometheus (session admin requise)
+    path('metrics', metrics_view, name='metrics'),
+
     path('admin/', admin.site.urls),
 
     # API URLs
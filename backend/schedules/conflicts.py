@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from .models import Schedule
+
+# Statuts qui occupent un créneau
+ACTIVE_STATUSES = ('scheduled', 'in_progress')
+
+# Ressources vérifiées, dans l'ordre de restitution des conflits
+CONFLICT_MESSAGES = {
+    'instructor': _('Le moniteur n\'est pas disponible à cette heure'),
+    'vehicle': _('Le véhicule n\'est pas disponible à cette heure'),
+    'student': _('L\'étudiant n\'est pas disponible à cette heure'),
+}
+
+BATCH_OVERLAP_MESSAGE = _('Ce créneau chevauche un autre créneau de la série')
+
+
+def overlapping_sessions(date, start_time, end_time, queryset=None):
+    """Séances actives qui chevauchent le créneau donné"""
+    if queryset is None:
+        queryset = Schedule.objects.all()
+    return queryset.filter(
+        date=date,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+        status__in=ACTIVE_STATUSES,
+    )
+
+
+def find_conflicts(date, start_time, end_time, instructor_id=None, vehicle_id=None,
+                   student_id=None, exclude_pk=None, queryset=None):
+    """
+    Conflits du moniteur, du véhicule et du candidat sur un créneau, en une requête.
+
+    Chaque branche du OR est servie par l'index composite (ressource, date,
+    start_time). Retourne la liste de tous les conflits, sous la forme
+    {'type', 'message', 'sessions'}, dans l'ordre moniteur, véhicule, candidat.
+    """
+    resources = {
+        'instructor': instructor_id,
+        'vehicle': vehicle_id,
+        'student': student_id,
+    }
+    resources = {name: pk for name, pk in resources.items() if pk}
+    if not resources:
+        return []
+
+    resource_filter = Q()
+    for name, pk in resources.items():
+        resource_filter |= Q(**{f'{name}_id': pk})
+
+    sessions = overlapping_sessions(
+        date, start_time, end_time, queryset
+    ).filter(resource_filter).select_related('student', 'instructor').order_by('start_time')
+    if exclude_pk:
+        sessions = sessions.exclude(pk=exclude_pk)
+
+    by_resource = {name: [] for name in resources}
+    for session in sessions:
+        for name, pk in resources.items():
+            if getattr(session, f'{name}_id') == pk:
+                by_resource[name].append(session)
+
+    return [
+        {'type': name, 'message': CONFLICT_MESSAGES[name], 'sessions': conflicting}
+        for name, conflicting in by_resource.items()
+        if conflicting
+    ]
+
+
+def conflict_messages(conflicts):
+    return [conflict['message'] for conflict in conflicts]
+
+
+def find_batch_conflicts(slots, instructor_id=None, vehicle_id=None, student_id=None,
+                         queryset=None):
+    """
+    Conflits d'une série de créneaux (date, start_time, end_time) partageant
+    les mêmes ressources.
+
+    Les séances existantes de toute la période sont chargées en une requête,
+    puis chaque créneau est comparé en mémoire, y compris aux autres créneaux
+    de la série. Retourne un conflit par créneau en échec :
+    {'index', 'date', 'start_time', 'end_time', 'types', 'messages'}.
+    """
+    if not slots:
+        return []
+
+    resources = {
+        'instructor': instructor_id,
+        'vehicle': vehicle_id,
+        'student': student_id,
+    }
+    resources = {name: pk for name, pk in resources.items() if pk}
+
+    existing_by_date = defaultdict(list)
+    if resources:
+        resource_filter = Q()
+        for name, pk in resources.items():
+            resource_filter |= Q(**{f'{name}_id': pk})
+        if queryset is None:
+            queryset = Schedule.objects.all()
+        existing = queryset.filter(
+            resource_filter,
+            date__range=(min(slot[0] for slot in slots), max(slot[0] for slot in slots)),
+            status__in=ACTIVE_STATUSES,
+        ).values('date', 'start_time', 'end_time', *(f'{name}_id' for name in resources))
+        for session in existing:
+            existing_by_date[session['date']].append(session)
+
+    conflicts = []
+    booked_by_date = defaultdict(list)
+    for index, (date, start_time, end_time) in enumerate(slots):
+        types = []
+        for session in existing_by_date[date]:
+            if session['start_time'] < end_time and session['end_time'] > start_time:
+                for name, pk in resources.items():
+                    if session[f'{name}_id'] == pk and name not in types:
+                        types.append(name)
+        messages = [CONFLICT_MESSAGES[name] for name in CONFLICT_MESSAGES if name in types]
+
+        if any(other_start < end_time and other_end > start_time
+               for other_start, other_end in booked_by_date[date]):
+            types.append('batch')
+            messages.append(BATCH_OVERLAP_MESSAGE)
+        booked_by_date[date].append((start_time, end_time))
+
+        if types:
+            conflicts.append({
+                'index': index,
+                'date': date,
+                'start_time': start_time,
+                'end_time': end_time,
+                'types': types,
+                'messages': messages,
+            })
+    return conflicts
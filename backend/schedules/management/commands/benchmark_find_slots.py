@@ -0,0 +1,135 @@
+import random
+import statistics
+import time as timer
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from driving_schools.models import DrivingSchool
+from instructors.models import Instructor
+from schedules.models import Schedule
+from schedules.slots import find_slots
+from students.models import Student
+from vehicles.models import Vehicle
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Mesure find_slots sur une auto-école synthétique '
+            '(les données sont créées dans une transaction annulée)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--instructors', type=int, default=50,
+                            help='Nombre de moniteurs (un véhicule attribué chacun)')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Nombre de jours de réservations')
+        parser.add_argument('--sessions-per-day', type=int, default=6,
+                            help='Séances par moniteur et par jour ouvré')
+        parser.add_argument('--runs', type=int, default=20,
+                            help='Nombre de mesures par scénario')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                driving_school, student = self._build_school(options)
+                self._run(driving_school, student, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _build_school(self, options):
+        rng = random.Random(42)
+        start = timezone.localdate() + timedelta(days=1)
+
+        owner = User.objects.create_user(username='benchmark_slots_owner', user_type='driving_school')
+        driving_school = DrivingSchool.objects.create(
+            owner=owner, name='Auto-école benchmark', manager_name='Benchmark',
+            address='Tunis', phone='20000000', email='benchmark@example.com',
+            cin_document='cin.jpg', legal_documents='legal.pdf',
+        )
+
+        count = options['instructors']
+        users = User.objects.bulk_create([
+            User(username=f'benchmark_slots_{index}', password='!', user_type='instructor')
+            for index in range(count * 2)
+        ])
+        instructors = Instructor.objects.bulk_create([
+            Instructor(
+                user=users[index], driving_school=driving_school, first_name='Moniteur',
+                last_name=str(index), cin=f'9{index:07d}', phone='20000000',
+                email=f'benchmark{index}@example.com', license_types='B', hire_date=start,
+            )
+            for index in range(count)
+        ])
+        vehicles = Vehicle.objects.bulk_create([
+            Vehicle(
+                driving_school=driving_school, assigned_instructor=instructor,
+                license_plate=f'{index} TU 9999', brand='Renault', model='Clio',
+                year=2020, color='Blanc', vehicle_type='B',
+                technical_inspection_date=start, insurance_expiry_date=start,
+            )
+            for index, instructor in enumerate(instructors)
+        ])
+        students = Student.objects.bulk_create([
+            Student(
+                user=users[count + index], driving_school=driving_school,
+                first_name='Candidat', last_name=str(index), cin=f'8{index:07d}',
+                phone='20000000', email=f'candidat{index}@example.com',
+                date_of_birth=date(2000, 1, 1), address='Tunis', license_type='B',
+            )
+            for index in range(count)
+        ])
+
+        sessions = []
+        hours = list(range(8, 18))
+        for offset in range(options['days']):
+            day = start + timedelta(days=offset)
+            if day.weekday() == 6:
+                continue
+            for instructor, vehicle in zip(instructors, vehicles):
+                for hour in rng.sample(hours, options['sessions_per_day']):
+                    sessions.append(Schedule(
+                        driving_school=driving_school, student=rng.choice(students),
+                        instructor=instructor, vehicle=vehicle, session_type='practical',
+                        date=day, start_time=time(hour, 0), end_time=time(hour + 1, 0),
+                    ))
+        Schedule.objects.bulk_create(sessions, batch_size=1000)
+
+        self.stdout.write(
+            f'{len(instructors)} moniteurs, {len(vehicles)} véhicules, '
+            f'{len(sessions)} séances sur {options["days"]} jours'
+        )
+        return driving_school, students[0]
+
+    def _run(self, driving_school, student, options):
+        date_from = timezone.localdate() + timedelta(days=1)
+        date_to = date_from + timedelta(days=options['days'] - 1)
+        scenarios = {
+            'premiers créneaux (60 min)': {'duration': 60},
+            'avec candidat (90 min, 100 résultats)': {
+                'duration': 90, 'student_id': student.pk, 'limit': 100,
+            },
+            'mois complet (240 min)': {'duration': 240, 'limit': 100},
+        }
+
+        for label, params in scenarios.items():
+            durations = []
+            for _run in range(options['runs']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = timer.perf_counter()
+                    slots = find_slots(driving_school, date_from, date_to, **params)
+                    durations.append((timer.perf_counter() - started) * 1000)
+
+            durations.sort()
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            self.stdout.write(
+                f'{label}: {len(slots)} créneaux, {len(queries)} requêtes, '
+                f'médiane {statistics.median(durations):.1f} ms, p95 {p95:.1f} ms'
+            )
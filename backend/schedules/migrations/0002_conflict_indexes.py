@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+EXCLUSION_CONSTRAINTS = {
+    'schedule_instructor_no_overlap': 'instructor_id',
+    'schedule_vehicle_no_overlap': 'vehicle_id',
+}
+
+
+def add_exclusion_constraints(apps, schema_editor):
+    """Contraintes d'exclusion sur la plage horaire (PostgreSQL, optionnelles)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    if not getattr(settings, 'SCHEDULE_EXCLUSION_CONSTRAINTS', False):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    for name, column in EXCLUSION_CONSTRAINTS.items():
+        schema_editor.execute(
+            f"ALTER TABLE schedules_schedule ADD CONSTRAINT {name} "
+            f"EXCLUDE USING gist ({column} WITH =, "
+            f"tsrange(date + start_time, date + end_time) WITH &&) "
+            f"WHERE ({column} IS NOT NULL AND status IN ('scheduled', 'in_progress'))"
+        )
+
+
+def remove_exclusion_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in EXCLUSION_CONSTRAINTS:
+        schema_editor.execute(
+            f"ALTER TABLE schedules_schedule DROP CONSTRAINT IF EXISTS {name}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedules', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['instructor', 'date', 'start_time'], name='schedule_instructor_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['vehicle', 'date', 'start_time'], name='schedule_vehicle_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['student', 'date', 'start_time'], name='schedule_student_slot_idx'),
+        ),
+        migrations.RunPython(add_exclusion_constraints, remove_exclusion_constraints),
+    ]
@@ -116,10 +116,30 @@ class Schedule(models.Model):
         verbose_name=_('Date de modification')
     )
 
+    # Champs dont dépendent les heures effectuées du candidat
+    HOURS_FIELDS = ('student_id', 'session_type', 'status', 'start_time', 'end_time')
+
     class Meta:
         verbose_name = _('Séance')
         verbose_name_plural = _('Séances')
         ordering = ['date', 'start_time']
+        indexes = [
+            # Détection des conflits par ressource (voir schedules.conflicts)
+            models.Index(fields=['instructor', 'date', 'start_time'], name='schedule_instructor_slot_idx'),
+            models.Index(fields=['vehicle', 'date', 'start_time'], name='schedule_vehicle_slot_idx'),
+            models.Index(fields=['student', 'date', 'start_time'], name='schedule_student_slot_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémoriser l'état chargé pour mettre à jour les heures par différence
+        if not instance.get_deferred_fields().intersection(cls.HOURS_FIELDS):
+            instance._loaded_hours_state = instance.hours_state()
+        return instance
+
+    def hours_state(self):
+        return tuple(getattr(self, name) for name in self.HOURS_FIELDS)
 
     def __str__(self):
         return f"{self.student} - {self.get_session_type_display()} - {self.date} {self.start_time}"
@@ -137,18 +157,19 @@ class Schedule(models.Model):
         if self.session_type == 'practical' and not self.vehicle:
             raise ValidationError(_('Un véhicule est requis pour les cours de conduite'))
 
-        # Vérifier que le moniteur est disponible à cette heure
-        if self.instructor:
-            conflicting_schedules = Schedule.objects.filter(
-                instructor=self.instructor,
-                date=self.date,
-                start_time__lt=self.end_time,
-                end_time__gt=self.start_time,
-                status='scheduled'
-            ).exclude(pk=self.pk)
-
-            if conflicting_schedules.exists():
-                raise ValidationError(_('Le moniteur n\'est pas disponible à cette heure'))
+        # Vérifier la disponibilité du moniteur, du véhicule et du candidat
+        if self.date and self.start_time and self.end_time:
+            from .conflicts import conflict_messages, find_conflicts
+
+            conflicts = find_conflicts(
+                self.date, self.start_time, self.end_time,
+                instructor_id=self.instructor_id,
+                vehicle_id=self.vehicle_id,
+                student_id=self.student_id,
+                exclude_pk=self.pk,
+            )
+            if conflicts:
+                raise ValidationError(conflict_messages(conflicts))
 
     @property
     def duration_minutes(self):
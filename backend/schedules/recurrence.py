@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+
+def expand_recurrence(start_date, weekdays, start_time, end_time, count=None, until=None,
+                      limit=None):
+    """
+    Créneaux hebdomadaires (date, start_time, end_time) à partir de `start_date`,
+    les jours `weekdays` (0 = lundi), jusqu'à `count` occurrences ou jusqu'à `until`.
+    La génération s'arrête au-delà de `limit` occurrences.
+    """
+    weekdays = set(weekdays)
+    slots = []
+    day = start_date
+    while weekdays:
+        if until and day > until:
+            break
+        if day.weekday() in weekdays:
+            slots.append((day, start_time, end_time))
+            if count and len(slots) >= count:
+                break
+            if limit and len(slots) > limit:
+                break
+        day += timedelta(days=1)
+    return slots
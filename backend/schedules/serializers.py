@@ -1,12 +1,21 @@
+import logging
+
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 from .models import Schedule
+from .conflicts import conflict_messages, find_batch_conflicts, find_conflicts
+from .recurrence import expand_recurrence
+from .slots import DAY_END, DAY_START, MAX_RANGE_DAYS, MAX_RESULTS as MAX_SLOT_RESULTS
 from students.serializers import StudentListSerializer
 from instructors.serializers import InstructorListSerializer
 from vehicles.serializers import VehicleListSerializer
+from driving_schools.cache import invalidate_school_schedules_on_commit, invalidate_school_stats_on_commit
 # from notifications.utils import notify_session_assigned, notify_lesson_confirmed  # Import circulaire
 
+logger = logging.getLogger(__name__)
+
 
 class ScheduleSerializer(serializers.ModelSerializer):
     """Serializer pour les emplois du temps"""
@@ -40,44 +49,15 @@ class ScheduleCreateSerializer(serializers.ModelSerializer):
         if attrs['date'] < timezone.now().date():
             raise serializers.ValidationError(_("Impossible de programmer une séance dans le passé"))
         
-        # Validation de la disponibilité du moniteur
-        instructor = attrs.get('instructor')
-        if instructor:
-            conflicting_schedules = Schedule.objects.filter(
-                instructor=instructor,
-                date=attrs['date'],
-                start_time__lt=attrs['end_time'],
-                end_time__gt=attrs['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if conflicting_schedules.exists():
-                raise serializers.ValidationError(_("Le moniteur n'est pas disponible à cette heure"))
-        
-        # Validation de la disponibilité du véhicule
-        vehicle = attrs.get('vehicle')
-        if vehicle:
-            conflicting_schedules = Schedule.objects.filter(
-                vehicle=vehicle,
-                date=attrs['date'],
-                start_time__lt=attrs['end_time'],
-                end_time__gt=attrs['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if conflicting_schedules.exists():
-                raise serializers.ValidationError(_("Le véhicule n'est pas disponible à cette heure"))
-
-        # Validation de la disponibilité de l'étudiant
-        student = attrs.get('student')
-        if student:
-            conflicting_schedules = Schedule.objects.filter(
-                student=student,
-                date=attrs['date'],
-                start_time__lt=attrs['end_time'],
-                end_time__gt=attrs['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if conflicting_schedules.exists():
-                raise serializers.ValidationError(_("L'étudiant n'est pas disponible à cette heure"))
+        # Disponibilité du moniteur, du véhicule et de l'étudiant en une requête
+        conflicts = find_conflicts(
+            attrs['date'], attrs['start_time'], attrs['end_time'],
+            instructor_id=attrs['instructor'].pk if attrs.get('instructor') else None,
+            vehicle_id=attrs['vehicle'].pk if attrs.get('vehicle') else None,
+            student_id=attrs['student'].pk if attrs.get('student') else None,
+        )
+        if conflicts:
+            raise serializers.ValidationError(conflict_messages(conflicts))
 
         return attrs
     
@@ -92,37 +72,39 @@ class ScheduleCreateSerializer(serializers.ModelSerializer):
         else:
             raise serializers.ValidationError(_("Auto-école non trouvée"))
 
-        # Créer la séance
-        schedule = super().create(validated_data)
-        print(f"🔔 Séance créée dans le serializer: {schedule.id}")
+        # Créer la séance (la contrainte d'exclusion PostgreSQL, si activée,
+        # rejette une réservation concurrente du même créneau)
+        try:
+            with transaction.atomic():
+                schedule = super().create(validated_data)
+                logger.debug("Séance créée dans le serializer: %s", schedule.id)
 
-        # Envoyer les notifications
-        self._send_notifications(schedule)
+                # Notifications validées avec la séance (diffusion par l'outbox)
+                self._send_notifications(schedule)
+        except IntegrityError:
+            raise serializers.ValidationError(_("Ce créneau vient d'être réservé, veuillez en choisir un autre"))
 
         return schedule
 
     def _send_notifications(self, schedule):
         """Envoyer les notifications appropriées après création d'une séance"""
-        print(f"🔔 _send_notifications appelée pour la séance {schedule.id}")
+        logger.debug("_send_notifications appelée pour la séance %s", schedule.id)
         try:
-            print(f"🔍 Séance: ID={schedule.id}, Moniteur={schedule.instructor}, Étudiant={schedule.student}")
+            logger.debug("Séance: ID=%s, Moniteur=%s, Étudiant=%s", schedule.id, schedule.instructor, schedule.student)
 
             # Import local pour éviter les imports circulaires
-            from notifications.models import Notification
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from notifications.utils import create_notification
 
             # Notification au moniteur (si assigné)
             if schedule.instructor:
-                print(f"🔍 Moniteur trouvé: {schedule.instructor}")
+                logger.debug("Moniteur trouvé: %s", schedule.instructor)
                 if hasattr(schedule.instructor, 'user'):
                     instructor_user = schedule.instructor.user
                     student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
 
-                    print(f"🔔 Envoi notification au moniteur {instructor_user.username}")
+                    logger.debug("Envoi notification au moniteur %s", instructor_user.username)
 
-                    # Créer la notification directement
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=instructor_user,
                         notification_type='session_assigned',
                         title='Nouvelle séance assignée',
@@ -131,43 +113,23 @@ class ScheduleCreateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{instructor_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée au moniteur {instructor_user.username}")
+                    logger.debug("Notification envoyée au moniteur %s", instructor_user.username)
                 else:
-                    print(f"❌ Le moniteur n'a pas d'attribut 'user'")
+                    logger.debug("Le moniteur n'a pas d'attribut 'user'")
             else:
-                print(f"❌ Aucun moniteur assigné à cette séance")
+                logger.debug("Aucun moniteur assigné à cette séance")
 
             # Notification à l'étudiant
             if schedule.student:
-                print(f"🔍 Étudiant trouvé: {schedule.student}")
+                logger.debug("Étudiant trouvé: %s", schedule.student)
                 if hasattr(schedule.student, 'user'):
                     student_user = schedule.student.user
                     session_type = "théorique" if schedule.session_type == 'theory' else "pratique"
                     lesson_details = f"{schedule.date.strftime('%d/%m/%Y')} à {schedule.start_time.strftime('%H:%M')} ({session_type})"
 
-                    print(f"🔔 Envoi notification à l'étudiant {student_user.username}")
+                    logger.debug("Envoi notification à l'étudiant %s", student_user.username)
 
-                    # Créer la notification directement
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=student_user,
                         notification_type='lesson_confirmed',
                         title='Leçon confirmée',
@@ -176,35 +138,14 @@ class ScheduleCreateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{student_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée à l'étudiant {student_user.username}")
+                    logger.debug("Notification envoyée à l'étudiant %s", student_user.username)
                 else:
-                    print(f"❌ L'étudiant n'a pas d'attribut 'user'")
+                    logger.debug("L'étudiant n'a pas d'attribut 'user'")
             else:
-                print(f"❌ Aucun étudiant assigné à cette séance")
+                logger.debug("Aucun étudiant assigné à cette séance")
 
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi des notifications: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur lors de l'envoi des notifications: %s", e)
 
 
 class ScheduleUpdateSerializer(serializers.ModelSerializer):
@@ -229,22 +170,21 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
         old_date = instance.date
         old_start_time = instance.start_time
 
-        # Mettre à jour l'instance
-        updated_instance = super().update(instance, validated_data)
+        with transaction.atomic():
+            # Mettre à jour l'instance
+            updated_instance = super().update(instance, validated_data)
 
-        # Envoyer des notifications selon les changements
-        self._send_update_notifications(updated_instance, old_status, old_date, old_start_time)
+            # Notifications validées avec la modification (diffusion par l'outbox)
+            self._send_update_notifications(updated_instance, old_status, old_date, old_start_time)
 
         return updated_instance
 
     def _send_update_notifications(self, schedule, old_status, old_date, old_start_time):
         """Envoyer les notifications appropriées après mise à jour d'une séance"""
-        print(f"🔔 _send_update_notifications appelée pour la séance {schedule.id}")
+        logger.debug("_send_update_notifications appelée pour la séance %s", schedule.id)
         try:
             # Import local pour éviter les imports circulaires
-            from notifications.models import Notification
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from notifications.utils import create_notification
 
             user = self.context['request'].user
 
@@ -269,7 +209,7 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                     instructor_user = schedule.instructor.user
                     student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=instructor_user,
                         notification_type='schedule_change',
                         title='Séance modifiée',
@@ -278,33 +218,14 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{instructor_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée au moniteur {instructor_user.username}")
+                    logger.debug("Notification envoyée au moniteur %s", instructor_user.username)
 
                 # Notification à l'étudiant
                 if schedule.student:
                     student_user = schedule.student.user
                     session_type = "théorique" if schedule.session_type == 'theory' else "pratique"
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=student_user,
                         notification_type='schedule_change',
                         title='Séance modifiée',
@@ -313,26 +234,7 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{student_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée à l'étudiant {student_user.username}")
+                    logger.debug("Notification envoyée à l'étudiant %s", student_user.username)
 
                 # Notification à l'auto-école (si c'est le moniteur qui a fait le changement)
                 if user.user_type == 'instructor' and schedule.driving_school:
@@ -340,7 +242,7 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                     instructor_name = f"{schedule.instructor.first_name} {schedule.instructor.last_name}"
                     student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=driving_school_user,
                         notification_type='schedule_change',
                         title='Séance modifiée par moniteur',
@@ -349,26 +251,7 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{driving_school_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée à l'auto-école {driving_school_user.username}")
+                    logger.debug("Notification envoyée à l'auto-école %s", driving_school_user.username)
 
             # Changement de date/heure
             elif schedule.date != old_date or schedule.start_time != old_start_time:
@@ -379,7 +262,7 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                     instructor_user = schedule.instructor.user
                     student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=instructor_user,
                         notification_type='schedule_change',
                         title='Horaire modifié',
@@ -388,32 +271,13 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{instructor_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée au moniteur {instructor_user.username}")
+                    logger.debug("Notification envoyée au moniteur %s", instructor_user.username)
 
                 # Notification à l'étudiant
                 if schedule.student:
                     student_user = schedule.student.user
 
-                    notification = Notification.objects.create(
+                    create_notification(
                         recipient=student_user,
                         notification_type='schedule_change',
                         title='Horaire modifié',
@@ -422,31 +286,10 @@ class ScheduleUpdateSerializer(serializers.ModelSerializer):
                         related_session_id=schedule.id
                     )
 
-                    # Envoyer via WebSocket
-                    channel_layer = get_channel_layer()
-                    if channel_layer:
-                        async_to_sync(channel_layer.group_send)(
-                            f"user_{student_user.id}",
-                            {
-                                'type': 'notification_created',
-                                'notification': {
-                                    'id': notification.id,
-                                    'type': notification.notification_type,
-                                    'title': notification.title,
-                                    'message': notification.message,
-                                    'priority': notification.priority,
-                                    'icon': notification.get_icon(),
-                                    'created_at': notification.created_at.isoformat(),
-                                }
-                            }
-                        )
-
-                    print(f"📨 Notification envoyée à l'étudiant {student_user.username}")
+                    logger.debug("Notification envoyée à l'étudiant %s", student_user.username)
 
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi des notifications de mise à jour: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur lors de l'envoi des notifications de mise à jour: %s", e)
 
 
 class ScheduleListSerializer(serializers.ModelSerializer):
@@ -485,3 +328,194 @@ class AvailabilitySerializer(serializers.Serializer):
         if attrs['start_time'] >= attrs['end_time']:
             raise serializers.ValidationError(_("L'heure de fin doit être après l'heure de début"))
         return attrs
+
+
+# Nombre maximal de séances créées par une même requête groupée
+MAX_BULK_SESSIONS = 60
+
+
+class ScheduleSlotSerializer(serializers.Serializer):
+    """Créneau d'une création groupée"""
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError(_("L'heure de fin doit être après l'heure de début"))
+        return attrs
+
+
+class RecurrenceSerializer(serializers.Serializer):
+    """Règle de récurrence hebdomadaire d'une création groupée"""
+    start_date = serializers.DateField()
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False
+    )
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    count = serializers.IntegerField(min_value=1, max_value=MAX_BULK_SESSIONS, required=False)
+    until = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError(_("L'heure de fin doit être après l'heure de début"))
+        if not attrs.get('count') and not attrs.get('until'):
+            raise serializers.ValidationError(_("Indiquez un nombre de séances ou une date de fin"))
+        return attrs
+
+
+class ScheduleBulkCreateSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour créer une série de séances (liste de créneaux ou récurrence).
+
+    Les conflits de toute la série sont vérifiés en mémoire contre une seule
+    fenêtre de séances existantes, puis les séances sont insérées avec
+    bulk_create et chaque destinataire reçoit une seule notification.
+    """
+    slots = ScheduleSlotSerializer(many=True, required=False)
+    recurrence = RecurrenceSerializer(required=False)
+
+    class Meta:
+        model = Schedule
+        fields = ('student', 'instructor', 'vehicle', 'session_type', 'notes',
+                  'slots', 'recurrence')
+
+    def _get_driving_school(self):
+        user = self.context['request'].user
+        if hasattr(user, 'driving_school'):
+            return user.driving_school
+        elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
+            return user.instructor_profile.driving_school
+        raise serializers.ValidationError(_("Auto-école non trouvée"))
+
+    def validate(self, attrs):
+        driving_school = self._get_driving_school()
+        for name in ('student', 'instructor', 'vehicle'):
+            resource = attrs.get(name)
+            if resource and resource.driving_school_id != driving_school.pk:
+                raise serializers.ValidationError({name: _("Ressource introuvable dans votre auto-école")})
+
+        slots_data = attrs.pop('slots', None)
+        recurrence = attrs.pop('recurrence', None)
+        if bool(slots_data) == bool(recurrence):
+            raise serializers.ValidationError(_("Indiquez soit une liste de créneaux, soit une récurrence"))
+
+        if recurrence:
+            slots = expand_recurrence(
+                recurrence['start_date'], recurrence['weekdays'],
+                recurrence['start_time'], recurrence['end_time'],
+                count=recurrence.get('count'), until=recurrence.get('until'),
+                limit=MAX_BULK_SESSIONS,
+            )
+        else:
+            slots = [(slot['date'], slot['start_time'], slot['end_time']) for slot in slots_data]
+
+        if not slots:
+            raise serializers.ValidationError(_("Aucune séance à créer"))
+        if len(slots) > MAX_BULK_SESSIONS:
+            raise serializers.ValidationError(
+                _("Impossible de créer plus de %(max)d séances à la fois") % {'max': MAX_BULK_SESSIONS}
+            )
+        if min(slot[0] for slot in slots) < timezone.now().date():
+            raise serializers.ValidationError(_("Impossible de programmer une séance dans le passé"))
+
+        conflicts = find_batch_conflicts(
+            slots,
+            instructor_id=attrs['instructor'].pk if attrs.get('instructor') else None,
+            vehicle_id=attrs['vehicle'].pk if attrs.get('vehicle') else None,
+            student_id=attrs['student'].pk,
+        )
+        if conflicts:
+            raise serializers.ValidationError({'conflicts': [
+                {
+                    'index': conflict['index'],
+                    'date': conflict['date'],
+                    'start_time': conflict['start_time'],
+                    'end_time': conflict['end_time'],
+                    'messages': conflict['messages'],
+                }
+                for conflict in conflicts
+            ]})
+
+        attrs['driving_school'] = driving_school
+        attrs['slots'] = slots
+        return attrs
+
+    def create(self, validated_data):
+        slots = validated_data.pop('slots')
+        schedules = [
+            Schedule(date=date, start_time=start_time, end_time=end_time, **validated_data)
+            for date, start_time, end_time in slots
+        ]
+        try:
+            with transaction.atomic():
+                schedules = Schedule.objects.bulk_create(schedules)
+                self._send_notifications(schedules)
+        except IntegrityError:
+            raise serializers.ValidationError(_("Ce créneau vient d'être réservé, veuillez en choisir un autre"))
+
+        # bulk_create n'émet pas post_save : invalider les caches de l'auto-école
+        invalidate_school_stats_on_commit(validated_data['driving_school'].pk)
+        invalidate_school_schedules_on_commit(validated_data['driving_school'].pk)
+        return schedules
+
+    def _send_notifications(self, schedules):
+        """Une seule notification par destinataire pour toute la série"""
+        try:
+            from notifications.utils import create_notification
+
+            first = schedules[0]
+            student = first.student
+            count = len(schedules)
+            period = f"du {first.date.strftime('%d/%m/%Y')} au {schedules[-1].date.strftime('%d/%m/%Y')}"
+
+            if first.instructor:
+                create_notification(
+                    recipient=first.instructor.user,
+                    notification_type='session_assigned',
+                    title='Nouvelles séances assignées',
+                    message=f'{count} séance(s) avec {student.user.first_name} {student.user.last_name} '
+                            f'vous ont été assignées ({period}).',
+                    priority='medium',
+                    related_session_id=first.id
+                )
+
+            session_type = "théoriques" if first.session_type == 'theory' else "pratiques"
+            create_notification(
+                recipient=student.user,
+                notification_type='lesson_confirmed',
+                title='Leçons confirmées',
+                message=f'Vos {count} leçon(s) {session_type} {period} sont confirmées.',
+                priority='medium',
+                related_session_id=first.id
+            )
+        except Exception as e:
+            logger.exception("Erreur lors de l'envoi des notifications: %s", e)
+
+
+class SlotSearchSerializer(serializers.Serializer):
+    """Serializer pour rechercher des créneaux libres"""
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    duration = serializers.IntegerField(min_value=15, max_value=480)
+    license_type = serializers.ChoiceField(choices=['A', 'B', 'C', 'D'], default='B')
+    session_type = serializers.ChoiceField(choices=['theory', 'practical'], default='practical')
+    instructor_id = serializers.IntegerField(required=False)
+    vehicle_id = serializers.IntegerField(required=False)
+    student_id = serializers.IntegerField(required=False)
+    day_start = serializers.TimeField(default=DAY_START)
+    day_end = serializers.TimeField(default=DAY_END)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_SLOT_RESULTS, default=20)
+
+    def validate(self, attrs):
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError(_("La date de fin doit être après la date de début"))
+        if (attrs['date_to'] - attrs['date_from']).days >= MAX_RANGE_DAYS:
+            raise serializers.ValidationError(
+                _("La période de recherche est limitée à %(days)d jours") % {'days': MAX_RANGE_DAYS}
+            )
+        if attrs['day_start'] >= attrs['day_end']:
+            raise serializers.ValidationError(_("L'heure de fin doit être après l'heure de début"))
+        attrs['date_from'] = max(attrs['date_from'], timezone.localdate())
+        return attrs
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from driving_schools.cache import invalidate_school_schedules_on_commit
+from instructors.models import Instructor
+from students.hours import apply_schedule_transition, recalculate_hours_chunk
+from students.models import Student
+from vehicles.models import Vehicle
+from .models import Schedule
+
+
+@receiver(post_save, sender=Schedule)
+def update_student_hours_on_save(sender, instance, created, raw=False, **kwargs):
+    """Met à jour les heures du candidat quand une séance entre ou sort de l'état terminé"""
+    if raw:
+        return
+
+    current_state = instance.hours_state()
+    if created:
+        apply_schedule_transition(None, current_state)
+    elif hasattr(instance, '_loaded_hours_state'):
+        apply_schedule_transition(instance._loaded_hours_state, current_state)
+    else:
+        # État précédent inconnu (instance non chargée depuis la base) : recalcul complet
+        recalculate_hours_chunk([instance.student_id])
+    instance._loaded_hours_state = current_state
+
+
+@receiver(post_delete, sender=Schedule)
+def update_student_hours_on_delete(sender, instance, **kwargs):
+    """Retire les heures d'une séance terminée supprimée"""
+    previous_state = getattr(instance, '_loaded_hours_state', instance.hours_state())
+    apply_schedule_transition(previous_state, None)
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Instructor)
+@receiver([post_save, post_delete], sender=Vehicle)
+def invalidate_calendar_on_change(sender, instance, **kwargs):
+    """Change la version du calendrier (séances, noms et véhicules affichés)"""
+    invalidate_school_schedules_on_commit(instance.driving_school_id)
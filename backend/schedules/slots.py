@@ -0,0 +1,211 @@
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .conflicts import ACTIVE_STATUSES
+from .models import Schedule
+
+# Plage horaire de recherche par défaut
+DAY_START = time(8, 0)
+DAY_END = time(18, 0)
+# Pas entre deux débuts de créneau proposés (minutes)
+SLOT_STEP = 30
+MAX_RANGE_DAYS = 31
+MAX_RESULTS = 100
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def merge_intervals(intervals):
+    """Fusionne les intervalles (début, fin) qui se chevauchent ou se touchent"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_windows(busy, day_start, day_end):
+    """Complément d'intervalles occupés fusionnés dans [day_start, day_end)"""
+    windows = []
+    cursor = day_start
+    for start, end in busy:
+        if start >= day_end:
+            break
+        if start > cursor:
+            windows.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < day_end:
+        windows.append((cursor, day_end))
+    return windows
+
+
+def intersect_windows(first, second):
+    """Intersection de deux listes triées de fenêtres libres"""
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _fits(windows, start, end):
+    return any(window_start <= start and end <= window_end for window_start, window_end in windows)
+
+
+def _load_busy(date_from, date_to, instructor_ids, vehicle_ids, student_id):
+    """
+    Intervalles occupés de toutes les ressources candidates, en une requête.
+    Retourne {(ressource, id, date): [(début, fin), ...]} fusionnés.
+    """
+    resource_filter = Q(instructor_id__in=instructor_ids)
+    if vehicle_ids:
+        resource_filter |= Q(vehicle_id__in=vehicle_ids)
+    if student_id:
+        resource_filter |= Q(student_id=student_id)
+
+    sessions = Schedule.objects.filter(
+        resource_filter,
+        date__range=(date_from, date_to),
+        status__in=ACTIVE_STATUSES,
+    ).values_list('date', 'start_time', 'end_time', 'instructor_id', 'vehicle_id', 'student_id')
+
+    instructor_ids, vehicle_ids = set(instructor_ids), set(vehicle_ids)
+    busy = defaultdict(list)
+    for day, start_time, end_time, instructor_id, vehicle_id, session_student_id in sessions:
+        interval = (to_minutes(start_time), to_minutes(end_time))
+        if instructor_id in instructor_ids:
+            busy['instructor', instructor_id, day].append(interval)
+        if vehicle_id in vehicle_ids:
+            busy['vehicle', vehicle_id, day].append(interval)
+        if student_id and session_student_id == student_id:
+            busy['student', student_id, day].append(interval)
+    return {key: merge_intervals(intervals) for key, intervals in busy.items()}
+
+
+def find_slots(driving_school, date_from, date_to, duration, license_type='B',
+               session_type='practical', instructor_id=None, vehicle_id=None,
+               student_id=None, day_start=DAY_START, day_end=DAY_END,
+               step=SLOT_STEP, limit=20):
+    """
+    Créneaux libres de `duration` minutes entre `date_from` et `date_to`.
+
+    Les séances occupant les moniteurs, véhicules (cours de conduite) et le
+    candidat sont chargées en une requête, fusionnées par ressource et par
+    jour, puis les fenêtres libres communes sont découpées en créneaux.
+    Les créneaux sont classés du plus proche au plus lointain ; à horaire
+    égal, le véhicule attribué au moniteur puis le moniteur le moins chargé
+    de la journée passent en premier.
+    """
+    instructors = driving_school.instructors.filter(
+        is_active=True, license_types__contains=license_type
+    )
+    if instructor_id:
+        instructors = instructors.filter(pk=instructor_id)
+    instructors = list(instructors.values('id', 'first_name', 'last_name').order_by('id'))
+
+    vehicles = []
+    if session_type == 'practical':
+        vehicles = driving_school.vehicles.filter(status='active', vehicle_type=license_type)
+        if vehicle_id:
+            vehicles = vehicles.filter(pk=vehicle_id)
+        vehicles = list(vehicles.values('id', 'license_plate', 'assigned_instructor_id').order_by('id'))
+        if not vehicles:
+            return []
+    if not instructors:
+        return []
+
+    busy = _load_busy(
+        date_from, date_to,
+        [instructor['id'] for instructor in instructors],
+        [vehicle['id'] for vehicle in vehicles],
+        student_id,
+    )
+
+    day_start, day_end = to_minutes(day_start), to_minutes(day_end)
+    now = timezone.localtime()
+
+    slots = []
+    day = date_from
+    while day <= date_to and len(slots) < limit:
+        first_start = day_start
+        if day == now.date():
+            # Pas de créneau dans le passé : arrondir au pas suivant
+            first_start = max(day_start, -(-to_minutes(now.time()) // step) * step)
+
+        student_free = free_windows(busy.get(('student', student_id, day), []), day_start, day_end)
+        vehicle_free = {
+            vehicle['id']: free_windows(busy.get(('vehicle', vehicle['id'], day), []), day_start, day_end)
+            for vehicle in vehicles
+        }
+
+        day_slots = []
+        for instructor in instructors:
+            instructor_busy = busy.get(('instructor', instructor['id'], day), [])
+            windows = intersect_windows(
+                free_windows(instructor_busy, day_start, day_end), student_free
+            )
+            if not windows:
+                continue
+            load = sum(end - start for start, end in instructor_busy)
+            # Véhicule attribué au moniteur en priorité
+            ranked_vehicles = sorted(
+                vehicles, key=lambda vehicle: vehicle['assigned_instructor_id'] != instructor['id']
+            )
+
+            for window_start, window_end in windows:
+                start = max(window_start, first_start)
+                start += -(start - day_start) % step
+                while start + duration <= window_end:
+                    end = start + duration
+                    vehicle = None
+                    if vehicles:
+                        vehicle = next(
+                            (candidate for candidate in ranked_vehicles
+                             if _fits(vehicle_free[candidate['id']], start, end)),
+                            None
+                        )
+                        if vehicle is None:
+                            start += step
+                            continue
+                    rank = (
+                        start,
+                        bool(vehicle) and vehicle['assigned_instructor_id'] != instructor['id'],
+                        load,
+                        instructor['id'],
+                    )
+                    day_slots.append((rank, start, end, instructor, vehicle))
+                    start += step
+
+        day_slots.sort(key=lambda slot: slot[0])
+        for _rank, start, end, instructor, vehicle in day_slots[:limit - len(slots)]:
+            slots.append({
+                'date': day,
+                'start_time': to_time(start),
+                'end_time': to_time(end),
+                'instructor_id': instructor['id'],
+                'instructor_name': f"{instructor['first_name']} {instructor['last_name']}",
+                'vehicle_id': vehicle['id'] if vehicle else None,
+                'vehicle': vehicle['license_plate'] if vehicle else None,
+            })
+        day += timedelta(days=1)
+
+    return slots
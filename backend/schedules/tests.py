@@ -1,3 +1,386 @@
-from django.test import TestCase
+from datetime import time, timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.exceptions import ValidationError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from driving_schools.cache import get_stats_cache
+from driving_schools.tests import create_instructor, create_school, create_student, create_vehicle
+from notifications.models import OutboxEvent
+from notifications.outbox import ABANDONED_RETENTION, claim_batch, dispatch_batch, purge_dispatched
+
+from .conflicts import find_conflicts
+from .models import Schedule
+from .slots import find_slots, free_windows, intersect_windows, merge_intervals
+
+
+class ConflictDetectionTests(TestCase):
+    """Détection des conflits moniteur / véhicule / candidat en une requête"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.day = timezone.localdate() + timedelta(days=7)
+        cls.students = [create_student(cls.school, index) for index in range(3)]
+        cls.instructors = [create_instructor(cls.school, index) for index in range(2)]
+        cls.vehicles = [create_vehicle(cls.school, index) for index in range(2)]
+
+        def book(student, instructor, vehicle, start, end, status='scheduled'):
+            return Schedule.objects.create(
+                driving_school=cls.school, student=student, instructor=instructor,
+                vehicle=vehicle, session_type='practical', date=cls.day,
+                start_time=start, end_time=end, status=status,
+            )
+
+        cls.instructor_session = book(cls.students[1], cls.instructors[0], cls.vehicles[1], time(9, 0), time(10, 0))
+        cls.vehicle_session = book(cls.students[2], cls.instructors[1], cls.vehicles[0], time(9, 30), time(10, 30))
+        cls.student_session = book(cls.students[0], None, None, time(8, 30), time(9, 15))
+        # Annulée ou simplement adjacente : pas de conflit
+        book(cls.students[0], cls.instructors[0], cls.vehicles[0], time(9, 0), time(10, 0), status='cancelled')
+        book(cls.students[0], cls.instructors[0], cls.vehicles[0], time(10, 30), time(11, 0))
+
+    def test_all_conflicts_in_one_query(self):
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts(
+                self.day, time(9, 0), time(10, 30),
+                instructor_id=self.instructors[0].pk,
+                vehicle_id=self.vehicles[0].pk,
+                student_id=self.students[0].pk,
+            )
+
+        self.assertEqual(
+            [(conflict['type'], [session.pk for session in conflict['sessions']]) for conflict in conflicts],
+            [
+                ('instructor', [self.instructor_session.pk]),
+                ('vehicle', [self.vehicle_session.pk]),
+                ('student', [self.student_session.pk]),
+            ]
+        )
+
+    def test_excluded_session_and_free_slot(self):
+        self.assertEqual(
+            find_conflicts(
+                self.day, time(9, 0), time(10, 0),
+                instructor_id=self.instructors[0].pk,
+                exclude_pk=self.instructor_session.pk,
+            ),
+            []
+        )
+        self.assertEqual(find_conflicts(self.day, time(9, 0), time(10, 0)), [])
+
+    def test_model_clean_reports_every_conflict(self):
+        session = Schedule(
+            driving_school=self.school, student=self.students[0],
+            instructor=self.instructors[0], vehicle=self.vehicles[0],
+            session_type='practical', date=self.day,
+            start_time=time(9, 0), end_time=time(10, 0),
+        )
+        with self.assertRaises(ValidationError) as error:
+            session.clean()
+        self.assertEqual(len(error.exception.messages), 3)
+
+    def test_create_and_availability_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        payload = {
+            'date': self.day.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+            'student': self.students[0].pk, 'instructor': self.instructors[0].pk,
+            'vehicle': self.vehicles[0].pk, 'session_type': 'practical',
+        }
+
+        response = client.post(reverse('schedules:schedule_list'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['non_field_errors']), 3)
+
+        response = client.post(reverse('schedules:check_availability'), {
+            'date': self.day.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+            'instructor_id': self.instructors[0].pk, 'vehicle_id': self.vehicles[0].pk,
+        }, format='json')
+        self.assertFalse(response.data['available'])
+        self.assertEqual(
+            [conflict['type'] for conflict in response.data['conflicts']],
+            ['instructor', 'vehicle']
+        )
+
+
+class BulkScheduleCreateTests(TestCase):
+    """Création groupée de séances avec vérification des conflits en mémoire"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.student = create_student(cls.school, 0)
+        cls.instructor = create_instructor(cls.school, 0)
+        cls.vehicle = create_vehicle(cls.school, 0)
+        # Prochain lundi
+        today = timezone.localdate()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        self.url = reverse('schedules:schedule_bulk_create')
+
+    def payload(self, **kwargs):
+        payload = {
+            'student': self.student.pk, 'instructor': self.instructor.pk,
+            'vehicle': self.vehicle.pk, 'session_type': 'practical',
+        }
+        payload.update(kwargs)
+        return payload
+
+    def test_recurring_package_in_a_handful_of_queries(self):
+        from notifications.models import Notification, OutboxEvent
+
+        recurrence = {
+            'start_date': self.monday.isoformat(), 'weekdays': [0, 2, 4],
+            'start_time': '09:00', 'end_time': '10:00', 'count': 20,
+        }
+        # Séances, notifications et événements de l'outbox dans la même transaction
+        with self.assertNumQueries(18):
+            response = self.client.post(self.url, self.payload(recurrence=recurrence), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 20)
+        self.assertEqual(Schedule.objects.filter(student=self.student).count(), 20)
+        self.assertEqual(
+            {schedule.date.weekday() for schedule in Schedule.objects.all()}, {0, 2, 4}
+        )
+        # Une notification par destinataire (moniteur et candidat)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(OutboxEvent.objects.filter(dispatched_at__isnull=True).count(), 2)
+
+    def test_every_conflicting_slot_is_reported(self):
+        Schedule.objects.create(
+            driving_school=self.school, student=create_student(self.school, 1),
+            instructor=self.instructor, session_type='practical', date=self.monday,
+            start_time=time(9, 30), end_time=time(10, 30),
+        )
+        slots = [
+            {'date': self.monday.isoformat(), 'start_time': '09:00', 'end_time': '10:00'},
+            {'date': self.monday.isoformat(), 'start_time': '11:00', 'end_time': '12:00'},
+            {'date': self.monday.isoformat(), 'start_time': '11:30', 'end_time': '12:30'},
+        ]
+        response = self.client.post(self.url, self.payload(slots=slots), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [int(conflict['index']) for conflict in response.data['conflicts']], [0, 2]
+        )
+        self.assertEqual(Schedule.objects.count(), 1)
+
+    def test_slots_or_recurrence_required(self):
+        response = self.client.post(self.url, self.payload(), format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FindSlotsTests(TestCase):
+    """Recherche de créneaux libres par fusion d'intervalles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.student = create_student(cls.school, 0)
+        cls.instructors = [create_instructor(cls.school, index) for index in range(2)]
+        cls.vehicles = [
+            create_vehicle(cls.school, index, assigned_instructor=instructor)
+            for index, instructor in enumerate(cls.instructors)
+        ]
+        cls.day = timezone.localdate() + timedelta(days=7)
+
+    def book(self, instructor, vehicle, start, end, student=None):
+        return Schedule.objects.create(
+            driving_school=self.school, student=student or self.student,
+            instructor=instructor, vehicle=vehicle, session_type='practical',
+            date=self.day, start_time=start, end_time=end,
+        )
+
+    def test_interval_helpers(self):
+        merged = merge_intervals([(600, 660), (480, 540), (530, 570), (570, 600)])
+        self.assertEqual(merged, [(480, 660)])
+        self.assertEqual(free_windows([(540, 600), (660, 720)], 480, 1080),
+                         [(480, 540), (600, 660), (720, 1080)])
+        self.assertEqual(intersect_windows([(480, 600), (660, 900)], [(540, 720)]),
+                         [(540, 600), (660, 720)])
+
+    def test_ranked_slots_respect_every_busy_resource(self):
+        other_student = create_student(self.school, 1)
+        # Moniteur 0 occupé de 8h à 10h, véhicule 1 occupé de 8h à 9h
+        self.book(self.instructors[0], None, time(8, 0), time(10, 0), student=other_student)
+        self.book(None, self.vehicles[1], time(8, 0), time(9, 0), student=other_student)
+
+        with self.assertNumQueries(3):
+            slots = find_slots(
+                self.school, self.day, self.day, duration=60,
+                day_start=time(8, 0), day_end=time(11, 0),
+            )
+
+        self.assertEqual(
+            [(slot['start_time'], slot['instructor_id'], slot['vehicle_id']) for slot in slots],
+            [
+                # 8h : seul le moniteur 1 est libre, avec le véhicule 0
+                (time(8, 0), self.instructors[1].pk, self.vehicles[0].pk),
+                # 8h30 : véhicule 1 encore occupé
+                (time(8, 30), self.instructors[1].pk, self.vehicles[0].pk),
+                # Ensuite le véhicule attribué au moniteur passe en premier
+                (time(9, 0), self.instructors[1].pk, self.vehicles[1].pk),
+                (time(9, 30), self.instructors[1].pk, self.vehicles[1].pk),
+                # À horaire égal, le moniteur le moins chargé d'abord
+                (time(10, 0), self.instructors[1].pk, self.vehicles[1].pk),
+                (time(10, 0), self.instructors[0].pk, self.vehicles[0].pk),
+            ]
+        )
+
+    def test_student_busy_time_is_excluded(self):
+        self.book(self.instructors[0], self.vehicles[0], time(8, 0), time(9, 0))
+
+        response = self.client_for_owner().get(reverse('schedules:find_slots'), {
+            'date_from': self.day.isoformat(), 'date_to': self.day.isoformat(),
+            'duration': 60, 'student_id': self.student.pk,
+            'day_start': '08:00', 'day_end': '10:00',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({slot['start_time'] for slot in response.data['slots']}, {time(9, 0)})
+
+    def test_search_range_is_bounded(self):
+        response = self.client_for_owner().get(reverse('schedules:find_slots'), {
+            'date_from': self.day.isoformat(),
+            'date_to': (self.day + timedelta(days=60)).isoformat(),
+            'duration': 60,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def client_for_owner(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        return client
+
+
+class CalendarFeedTests(TestCase):
+    """Flux du calendrier : une projection .values() et ETag versionné"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.day = timezone.localdate() + timedelta(days=3)
+        instructor = create_instructor(cls.school, 0)
+        vehicle = create_vehicle(cls.school, 0)
+        for index in range(10):
+            Schedule.objects.create(
+                driving_school=cls.school, student=create_student(cls.school, index),
+                instructor=instructor, vehicle=vehicle, session_type='practical',
+                date=cls.day, start_time=time(8 + index, 0), end_time=time(9 + index, 0),
+            )
+
+    def setUp(self):
+        get_stats_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        self.params = {'start': self.day.isoformat(), 'end': self.day.isoformat()}
+
+    def test_events_built_from_a_single_query(self):
+        # Auto-école de l'utilisateur, puis séances avec jointures
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('schedules:calendar_events'), self.params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 10)
+        event = response.data[0]
+        self.assertEqual(event['title'], 'Conduite - Candidat 0')
+        self.assertEqual(event['extendedProps']['instructor_name'], 'Moniteur 0')
+        self.assertEqual(event['extendedProps']['vehicle'], 'Renault Clio (0 TU 4567)')
+        self.assertEqual(event['start'], f'{self.day.isoformat()}T08:00:00')
+
+    def test_unchanged_calendar_returns_304(self):
+        url = reverse('schedules:calendar_events')
+        etag = self.client.get(url, self.params)['ETag']
+
+        # Aucune séance relue (l'auto-école est déjà chargée sur l'utilisateur)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session = Schedule.objects.first()
+            session.notes = 'Modifiée'
+            session.save()
+
+        response = self.client.get(url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class _FailingLayer:
+    async def group_send(self, group, message):
+        raise ConnectionError('Redis indisponible')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationOutboxTests(TransactionTestCase):
+    """Notifications de séance enregistrées dans l'outbox puis diffusées par le répartiteur"""
+
+    def setUp(self):
+        self.school = create_school('owner')
+        self.student = create_student(self.school, 0)
+        self.instructor = create_instructor(self.school, 0)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+
+    def create_schedule(self):
+        response = self.client.post(reverse('schedules:schedule_list'), {
+            'student': self.student.pk, 'instructor': self.instructor.pk,
+            'session_type': 'practical', 'date': (timezone.localdate() + timedelta(days=3)).isoformat(),
+            'start_time': '09:00', 'end_time': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_dispatcher_delivers_after_the_request(self):
+        channel_layer = get_channel_layer()
+
+        async def subscribe():
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(f'user_{self.student.user_id}', channel)
+            return channel
+
+        channel = async_to_sync(subscribe)()
+        self.create_schedule()
+        # Rien n'est envoyé pendant la requête
+        self.assertEqual(OutboxEvent.objects.filter(dispatched_at__isnull=True).count(), 2)
+
+        self.assertEqual(async_to_sync(dispatch_batch)(), 2)
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['type'], 'notification_created')
+        self.assertEqual(message['notification']['type'], 'lesson_confirmed')
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+        self.assertEqual(async_to_sync(dispatch_batch)(), 0)
+
+    def test_failed_sends_are_retried_then_abandoned(self):
+        self.create_schedule()
+
+        self.assertEqual(async_to_sync(dispatch_batch)(_FailingLayer(), max_attempts=2), 2)
+        event = OutboxEvent.objects.first()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('Redis indisponible', event.last_error)
+        self.assertIsNone(event.dispatched_at)
+        # Reprise différée
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertEqual(claim_batch(), [])
+
+        OutboxEvent.objects.update(available_at=timezone.now())
+        async_to_sync(dispatch_batch)(_FailingLayer(), max_attempts=2)
+        OutboxEvent.objects.update(available_at=timezone.now())
+        # Nombre maximal de tentatives atteint : l'événement reste en base sans être repris
+        self.assertEqual(claim_batch(max_attempts=2), [])
+        self.assertEqual(set(OutboxEvent.objects.values_list('attempts', flat=True)), {2})
+
+        # Événements abandonnés supprimés passé leur délai de conservation
+        self.assertEqual(purge_dispatched(max_attempts=2), 0)
+        OutboxEvent.objects.update(created_at=timezone.now() - ABANDONED_RETENTION - timedelta(minutes=1))
+        self.assertEqual(purge_dispatched(max_attempts=2), 2)
+        self.assertFalse(OutboxEvent.objects.exists())
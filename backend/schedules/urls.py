@@ -6,10 +6,12 @@ app_name = 'schedules'
 urlpatterns = [
     # Emplois du temps
     path('', views.ScheduleListCreateView.as_view(), name='schedule_list'),
+    path('bulk/', views.bulk_create_schedules_view, name='schedule_bulk_create'),
     path('<int:pk>/', views.ScheduleDetailView.as_view(), name='schedule_detail'),
     path('<int:pk>/status/', views.update_schedule_status_view, name='update_status'),
     
     # Calendrier et disponibilité
     path('calendar/', views.calendar_events_view, name='calendar_events'),
     path('check-availability/', views.check_availability_view, name='check_availability'),
+    path('find-slots/', views.find_slots_view, name='find_slots'),
 ]
@@ -4,50 +4,26 @@ from rest_framework.response import Response
 from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+import hashlib
+import logging
+from django.utils.http import parse_etags, quote_etag
 from django.utils.translation import gettext_lazy as _
 from django.http import Http404
 from django.core.exceptions import ValidationError
 
+from driving_schools.cache import get_schedule_version
+
 from .models import Schedule
+from .conflicts import find_conflicts
+from .slots import find_slots
 from .serializers import (
     ScheduleSerializer, ScheduleCreateSerializer, ScheduleUpdateSerializer,
-    ScheduleListSerializer, CalendarEventSerializer, AvailabilitySerializer
+    ScheduleListSerializer, AvailabilitySerializer,
+    ScheduleBulkCreateSerializer, SlotSearchSerializer
 )
 # from notifications.utils import notify_session_assigned, notify_lesson_confirmed  # Déplacé vers serializer
 
-
-def recalculate_student_hours(student):
-    """Recalcule les heures d'un candidat basé sur ses séances terminées"""
-    # Calculer les heures de code terminées
-    theory_schedules = Schedule.objects.filter(
-        student=student,
-        session_type='theory',
-        status='completed'
-    )
-
-    theory_hours = 0
-    for schedule in theory_schedules:
-        duration_hours = round(schedule.duration_minutes / 60 * 2) / 2
-        theory_hours += duration_hours
-
-    # Calculer les heures de conduite terminées
-    practical_schedules = Schedule.objects.filter(
-        student=student,
-        session_type='practical',
-        status='completed'
-    )
-
-    practical_hours = 0
-    for schedule in practical_schedules:
-        duration_hours = round(schedule.duration_minutes / 60 * 2) / 2
-        practical_hours += duration_hours
-
-    # Mettre à jour le candidat
-    student.theory_hours_completed = theory_hours
-    student.practical_hours_completed = practical_hours
-    student.save()
-
-    return theory_hours, practical_hours
+logger = logging.getLogger(__name__)
 
 
 class ScheduleListCreateView(generics.ListCreateAPIView):
@@ -93,7 +69,7 @@ class ScheduleListCreateView(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         """Personnaliser la création pour gérer l'auto-école comme moniteur"""
-        print(f"🔔 perform_create appelée par {self.request.user.username}")
+        logger.debug("perform_create appelée par %s", self.request.user.username)
         user = self.request.user
 
         # Déterminer l'auto-école selon le type d'utilisateur
@@ -108,23 +84,23 @@ class ScheduleListCreateView(generics.ListCreateAPIView):
 
         # Récupérer l'ID du moniteur depuis les données
         instructor_id = self.request.data.get('instructor')
-        print(f"🔍 instructor_id reçu: {instructor_id}")
+        logger.debug("instructor_id reçu: %s", instructor_id)
 
         # Si l'ID est négatif, c'est l'auto-école (convention frontend)
         if instructor_id and int(instructor_id) < 0:
             # Séance donnée par l'auto-école, pas de moniteur spécifique
-            print(f"🔍 Séance auto-école (pas de moniteur)")
+            logger.debug("Séance auto-école (pas de moniteur)")
             schedule = serializer.save(
                 driving_school=driving_school,
                 instructor=None
             )
         else:
             # Séance normale avec un moniteur
-            print(f"🔍 Séance avec moniteur")
+            logger.debug("Séance avec moniteur")
             schedule = serializer.save(driving_school=driving_school)
 
             # Les notifications sont maintenant gérées dans le serializer
-            print(f"✅ Séance créée avec succès: {schedule.id}")
+            logger.debug("Séance créée avec succès: %s", schedule.id)
 
     # La fonction _send_notifications a été déplacée vers le serializer pour éviter les doublons
 
@@ -149,24 +125,18 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Schedule.objects.none()
 
     def perform_destroy(self, instance):
-        """Recalculer les heures du candidat après suppression d'une séance"""
-        student = instance.student
-
+        """Supprimer une séance (les heures du candidat sont mises à jour par signal)"""
         # Envoyer les notifications avant suppression
         self._send_deletion_notifications(instance)
 
         super().perform_destroy(instance)
-        if student:
-            recalculate_student_hours(student)
 
     def _send_deletion_notifications(self, schedule):
         """Envoyer les notifications appropriées avant suppression d'une séance"""
-        print(f"🔔 _send_deletion_notifications appelée pour la séance {schedule.id}")
+        logger.debug("_send_deletion_notifications appelée pour la séance %s", schedule.id)
         try:
             # Import local pour éviter les imports circulaires
-            from notifications.models import Notification
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+            from notifications.utils import create_notification
 
             user = self.request.user
 
@@ -176,7 +146,7 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                 student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
                 session_date = schedule.date.strftime('%d/%m/%Y')
 
-                notification = Notification.objects.create(
+                create_notification(
                     recipient=instructor_user,
                     notification_type='schedule_change',
                     title='Séance supprimée',
@@ -184,26 +154,7 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                     priority='high'
                 )
 
-                # Envoyer via WebSocket
-                channel_layer = get_channel_layer()
-                if channel_layer:
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{instructor_user.id}",
-                        {
-                            'type': 'notification_created',
-                            'notification': {
-                                'id': notification.id,
-                                'type': notification.notification_type,
-                                'title': notification.title,
-                                'message': notification.message,
-                                'priority': notification.priority,
-                                'icon': notification.get_icon(),
-                                'created_at': notification.created_at.isoformat(),
-                            }
-                        }
-                    )
-
-                print(f"📨 Notification envoyée au moniteur {instructor_user.username}")
+                logger.debug("Notification envoyée au moniteur %s", instructor_user.username)
 
             # Notification à l'étudiant
             if schedule.student:
@@ -211,7 +162,7 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                 session_type = "théorique" if schedule.session_type == 'theory' else "pratique"
                 session_date = schedule.date.strftime('%d/%m/%Y')
 
-                notification = Notification.objects.create(
+                create_notification(
                     recipient=student_user,
                     notification_type='schedule_change',
                     title='Séance supprimée',
@@ -219,26 +170,7 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                     priority='high'
                 )
 
-                # Envoyer via WebSocket
-                channel_layer = get_channel_layer()
-                if channel_layer:
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{student_user.id}",
-                        {
-                            'type': 'notification_created',
-                            'notification': {
-                                'id': notification.id,
-                                'type': notification.notification_type,
-                                'title': notification.title,
-                                'message': notification.message,
-                                'priority': notification.priority,
-                                'icon': notification.get_icon(),
-                                'created_at': notification.created_at.isoformat(),
-                            }
-                        }
-                    )
-
-                print(f"📨 Notification envoyée à l'étudiant {student_user.username}")
+                logger.debug("Notification envoyée à l'étudiant %s", student_user.username)
 
             # Notification à l'auto-école (si c'est le moniteur qui a fait la suppression)
             if user.user_type == 'instructor' and schedule.driving_school:
@@ -247,7 +179,7 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                 student_name = f"{schedule.student.user.first_name} {schedule.student.user.last_name}"
                 session_date = schedule.date.strftime('%d/%m/%Y')
 
-                notification = Notification.objects.create(
+                create_notification(
                     recipient=driving_school_user,
                     notification_type='schedule_change',
                     title='Séance supprimée par moniteur',
@@ -255,31 +187,28 @@ class ScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
                     priority='medium'
                 )
 
-                # Envoyer via WebSocket
-                channel_layer = get_channel_layer()
-                if channel_layer:
-                    async_to_sync(channel_layer.group_send)(
-                        f"user_{driving_school_user.id}",
-                        {
-                            'type': 'notification_created',
-                            'notification': {
-                                'id': notification.id,
-                                'type': notification.notification_type,
-                                'title': notification.title,
-                                'message': notification.message,
-                                'priority': notification.priority,
-                                'icon': notification.get_icon(),
-                                'created_at': notification.created_at.isoformat(),
-                            }
-                        }
-                    )
-
-                print(f"📨 Notification envoyée à l'auto-école {driving_school_user.username}")
+                logger.debug("Notification envoyée à l'auto-école %s", driving_school_user.username)
 
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi des notifications de suppression: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Erreur lors de l'envoi des notifications de suppression: %s", e)
+
+
+# Couleur selon le type de séance
+CALENDAR_COLORS = {
+    'theory': '#3498db',
+    'practical': '#2ecc71',
+    'exam_theory': '#e74c3c',
+    'exam_practical_circuit': '#f39c12',
+    'exam_practical_park': '#9b59b6',
+}
+
+SESSION_TYPE_LABELS = dict(Schedule.SESSION_TYPES)
+
+
+def _full_name(row, relation):
+    if row[f'{relation}__first_name'] is None:
+        return None
+    return f"{row[f'{relation}__first_name']} {row[f'{relation}__last_name']}"
 
 
 @api_view(['GET'])
@@ -305,51 +234,68 @@ def calendar_events_view(request):
 
     # Récupérer les emplois du temps
     queryset = Schedule.objects.none()
+    driving_school_id = None
     if hasattr(user, 'driving_school'):
-        queryset = user.driving_school.schedules.all()
+        driving_school_id = user.driving_school.id
+        queryset = Schedule.objects.filter(driving_school_id=driving_school_id)
     elif user.user_type == 'student' and hasattr(user, 'student_profile'):
-        queryset = user.student_profile.schedules.all()
+        driving_school_id = user.student_profile.driving_school_id
+        queryset = Schedule.objects.filter(student_id=user.student_profile.id)
     elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
-        queryset = user.instructor_profile.schedules.all()
-
-    schedules = queryset.filter(
+        driving_school_id = user.instructor_profile.driving_school_id
+        queryset = Schedule.objects.filter(instructor_id=user.instructor_profile.id)
+
+    # ETag : version de l'emploi du temps de l'auto-école + périmètre demandé
+    etag = None
+    if driving_school_id:
+        version = get_schedule_version(driving_school_id)
+        etag = quote_etag(hashlib.md5(
+            f'{version}:{user.id}:{start_date}:{end_date}'.encode()
+        ).hexdigest())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+    rows = queryset.filter(
         date__gte=start_date,
         date__lte=end_date
+    ).values(
+        'id', 'date', 'start_time', 'end_time', 'session_type', 'status', 'notes',
+        'student__first_name', 'student__last_name',
+        'instructor__first_name', 'instructor__last_name',
+        'vehicle__brand', 'vehicle__model', 'vehicle__license_plate',
     )
 
-    # Convertir en événements de calendrier
+    # Convertir en événements de calendrier (une seule requête avec jointures)
     events = []
-    for schedule in schedules:
-        # Couleur selon le type de séance
-        color_map = {
-            'theory': '#3498db',
-            'practical': '#2ecc71',
-            'exam_theory': '#e74c3c',
-            'exam_practical_circuit': '#f39c12',
-            'exam_practical_park': '#9b59b6',
-        }
-
-        start_datetime = timezone.datetime.combine(schedule.date, schedule.start_time)
-        end_datetime = timezone.datetime.combine(schedule.date, schedule.end_time)
+    for row in rows:
+        student_name = _full_name(row, 'student')
+        vehicle = None
+        if row['vehicle__license_plate']:
+            vehicle = f"{row['vehicle__brand']} {row['vehicle__model']} ({row['vehicle__license_plate']})"
 
         events.append({
-            'id': schedule.id,
-            'title': f"{schedule.get_session_type_display()} - {schedule.student.full_name if schedule.student else 'Sans candidat'}",
-            'start': start_datetime.isoformat(),
-            'end': end_datetime.isoformat(),
-            'color': color_map.get(schedule.session_type, '#95a5a6'),
+            'id': row['id'],
+            'title': f"{SESSION_TYPE_LABELS.get(row['session_type'], row['session_type'])} - {student_name or 'Sans candidat'}",
+            'start': datetime.combine(row['date'], row['start_time']).isoformat(),
+            'end': datetime.combine(row['date'], row['end_time']).isoformat(),
+            'color': CALENDAR_COLORS.get(row['session_type'], '#95a5a6'),
             'extendedProps': {
-                'session_type': schedule.session_type,
-                'student_name': schedule.student.full_name if schedule.student else None,
-                'instructor_name': schedule.instructor.full_name if schedule.instructor else None,
-                'vehicle': str(schedule.vehicle) if schedule.vehicle else None,
-                'status': schedule.status,
-                'notes': schedule.notes,
+                'session_type': row['session_type'],
+                'student_name': student_name,
+                'instructor_name': _full_name(row, 'instructor'),
+                'vehicle': vehicle,
+                'status': row['status'],
+                'notes': row['notes'],
             }
         })
 
-    serializer = CalendarEventSerializer(events, many=True)
-    return Response(serializer.data)
+    response = Response(events)
+    if etag:
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @api_view(['POST'])
@@ -374,92 +320,33 @@ def check_availability_view(request):
         return Response({'error': _('Auto-école non trouvée')},
                        status=status.HTTP_404_NOT_FOUND)
 
-    print(f"🔍 Vérification de disponibilité pour {user.user_type} - Auto-école: {driving_school.name}")
-    print(f"📅 Données: {data}")
-
-    conflicts = []
-
-    # Vérifier la disponibilité du moniteur
-    if 'instructor_id' in data:
-        try:
-            instructor = driving_school.instructors.get(id=data['instructor_id'])
-            instructor_conflicts = Schedule.objects.filter(
-                instructor=instructor,
-                date=data['date'],
-                start_time__lt=data['end_time'],
-                end_time__gt=data['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if instructor_conflicts.exists():
-                conflicts.append({
-                    'type': 'instructor',
-                    'message': _('Le moniteur n\'est pas disponible à cette heure'),
-                    'conflicting_sessions': [
-                        {
-                            'start_time': conflict.start_time,
-                            'end_time': conflict.end_time,
-                            'student': conflict.student.full_name if conflict.student else None
-                        }
-                        for conflict in instructor_conflicts
-                    ]
-                })
-        except:
-            pass
-
-    # Vérifier la disponibilité du véhicule
-    if 'vehicle_id' in data:
-        try:
-            vehicle = driving_school.vehicles.get(id=data['vehicle_id'])
-            vehicle_conflicts = Schedule.objects.filter(
-                vehicle=vehicle,
-                date=data['date'],
-                start_time__lt=data['end_time'],
-                end_time__gt=data['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if vehicle_conflicts.exists():
-                conflicts.append({
-                    'type': 'vehicle',
-                    'message': _('Le véhicule n\'est pas disponible à cette heure'),
-                    'conflicting_sessions': [
-                        {
-                            'start_time': conflict.start_time,
-                            'end_time': conflict.end_time,
-                            'instructor': conflict.instructor.full_name if conflict.instructor else None
-                        }
-                        for conflict in vehicle_conflicts
-                    ]
-                })
-        except:
-            pass
-
-    # Vérifier la disponibilité de l'étudiant
-    if 'student_id' in data:
-        try:
-            student = driving_school.students.get(id=data['student_id'])
-            student_conflicts = Schedule.objects.filter(
-                student=student,
-                date=data['date'],
-                start_time__lt=data['end_time'],
-                end_time__gt=data['start_time'],
-                status__in=['scheduled', 'in_progress']
-            )
-            if student_conflicts.exists():
-                conflicts.append({
-                    'type': 'student',
-                    'message': _('L\'étudiant n\'est pas disponible à cette heure'),
-                    'conflicting_sessions': [
-                        {
-                            'start_time': conflict.start_time,
-                            'end_time': conflict.end_time,
-                            'instructor': conflict.instructor.full_name if conflict.instructor else None,
-                            'session_type': conflict.get_session_type_display()
-                        }
-                        for conflict in student_conflicts
-                    ]
-                })
-        except:
-            pass
+    logger.debug("Vérification de disponibilité pour %s - Auto-école: %s", user.user_type, driving_school.name)
+    logger.debug("Données: %s", data)
+
+    # Les séances des autres auto-écoles sont ignorées
+    conflicts = [
+        {
+            'type': conflict['type'],
+            'message': conflict['message'],
+            'conflicting_sessions': [
+                {
+                    'start_time': session.start_time,
+                    'end_time': session.end_time,
+                    'student': session.student.full_name if session.student else None,
+                    'instructor': session.instructor.full_name if session.instructor else None,
+                    'session_type': session.get_session_type_display()
+                }
+                for session in conflict['sessions']
+            ]
+        }
+        for conflict in find_conflicts(
+            data['date'], data['start_time'], data['end_time'],
+            instructor_id=data.get('instructor_id'),
+            vehicle_id=data.get('vehicle_id'),
+            student_id=data.get('student_id'),
+            queryset=driving_school.schedules.all(),
+        )
+    ]
 
     return Response({
         'available': len(conflicts) == 0,
@@ -467,6 +354,48 @@ def check_availability_view(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def find_slots_view(request):
+    """Vue pour rechercher les créneaux libres (moniteur, véhicule, candidat)"""
+    serializer = SlotSearchSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    driving_school = None
+    if hasattr(user, 'driving_school'):
+        driving_school = user.driving_school
+    elif user.user_type == 'instructor' and hasattr(user, 'instructor_profile'):
+        driving_school = user.instructor_profile.driving_school
+
+    if not driving_school:
+        return Response({'error': _('Auto-école non trouvée')},
+                       status=status.HTTP_404_NOT_FOUND)
+
+    data = serializer.validated_data
+    slots = find_slots(driving_school, **data)
+
+    return Response({
+        'count': len(slots),
+        'slots': slots
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_schedules_view(request):
+    """Vue pour créer une série de séances (créneaux ou récurrence hebdomadaire)"""
+    serializer = ScheduleBulkCreateSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    schedules = serializer.save()
+
+    return Response({
+        'created': len(schedules),
+        'schedules': ScheduleListSerializer(schedules, many=True).data
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def update_schedule_status_view(request, pk):
@@ -490,12 +419,9 @@ def update_schedule_status_view(request, pk):
         return Response({'error': _('Statut invalide')},
                        status=status.HTTP_400_BAD_REQUEST)
 
+    # Les heures du candidat sont ajustées par différence (signal post_save)
     schedule.status = new_status
     schedule.save()
 
-    # Recalculer les heures du candidat si le statut change
-    if schedule.student:
-        recalculate_student_hours(schedule.student)
-
     serializer = ScheduleSerializer(schedule)
     return Response(serializer.data)
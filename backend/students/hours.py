@@ -0,0 +1,181 @@
+from decimal import Decimal
+
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, ExtractHour, ExtractMinute, Mod
+
+from driving_schools.cache import invalidate_school_stats_on_commit
+
+from .models import Student
+
+HOURS_CHUNK_SIZE = 2000
+
+
+def _minutes_of_day(field):
+    return ExtractHour(field) * 60 + ExtractMinute(field)
+
+
+def completed_half_hours(queryset):
+    """
+    Annote chaque séance avec sa durée arrondie à la demi-heure (en demi-heures).
+
+    Reproduit en SQL `round(duration_minutes / 60 * 2)`, arrondi bancaire
+    compris : un reste d'exactement 15 minutes arrondit vers le nombre pair.
+    """
+    # EXTRACT renvoie un numeric sur PostgreSQL : forcer l'entier pour la division
+    queryset = queryset.annotate(
+        _minutes=Cast(
+            _minutes_of_day('end_time') - _minutes_of_day('start_time'),
+            IntegerField()
+        ),
+    ).annotate(
+        _quotient=F('_minutes') / 30,
+        _remainder=Mod('_minutes', 30),
+    ).annotate(
+        _quotient_parity=Mod('_quotient', 2),
+    )
+    return queryset.annotate(
+        half_hours=Case(
+            When(_remainder__gt=15, then=F('_quotient') + 1),
+            When(_remainder=15, _quotient_parity=1, then=F('_quotient') + 1),
+            default=F('_quotient'),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def completed_hours_by_student(student_ids):
+    """
+    Heures de code et de conduite terminées pour les candidats donnés,
+    calculées en une seule requête groupée.
+    Retourne {student_id: (theory_hours, practical_hours)}.
+    """
+    from schedules.models import Schedule
+
+    rows = (
+        completed_half_hours(
+            Schedule.objects.filter(
+                student_id__in=student_ids,
+                status='completed',
+                session_type__in=['theory', 'practical'],
+            )
+        )
+        .order_by()
+        .values('student_id')
+        .annotate(
+            theory=Coalesce(Sum('half_hours', filter=Q(session_type='theory')), Value(0)),
+            practical=Coalesce(Sum('half_hours', filter=Q(session_type='practical')), Value(0)),
+        )
+    )
+    return {
+        row['student_id']: (Decimal(row['theory']) / 2, Decimal(row['practical']) / 2)
+        for row in rows
+    }
+
+
+def recalculate_hours_chunk(student_ids, dry_run=False):
+    """
+    Recalcule les heures d'un lot de candidats et n'écrit que les lignes modifiées.
+    Retourne la liste des candidats mis à jour (ou divergents en mode dry_run).
+    """
+    students = list(
+        Student.objects.filter(pk__in=student_ids).only(
+            'id', 'driving_school_id', 'first_name', 'last_name',
+            'theory_hours_completed', 'practical_hours_completed',
+        )
+    )
+    hours = completed_hours_by_student([student.pk for student in students])
+
+    changed = []
+    for student in students:
+        theory, practical = hours.get(student.pk, (Decimal('0'), Decimal('0')))
+        if (student.theory_hours_completed != theory
+                or student.practical_hours_completed != practical):
+            student.previous_hours = (
+                student.theory_hours_completed, student.practical_hours_completed
+            )
+            student.theory_hours_completed = theory
+            student.practical_hours_completed = practical
+            changed.append(student)
+
+    if changed and not dry_run:
+        Student.objects.bulk_update(
+            changed, ['theory_hours_completed', 'practical_hours_completed']
+        )
+        # bulk_update n'émet pas post_save : invalider les statistiques en cache
+        for driving_school_id in {student.driving_school_id for student in changed}:
+            invalidate_school_stats_on_commit(driving_school_id)
+    return changed
+
+
+def iter_student_id_chunks(queryset, chunk_size=HOURS_CHUNK_SIZE):
+    """Découpe les identifiants de candidats en lots par plages de clés"""
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def recalculate_student_hours(student):
+    """Recalcule les heures d'un candidat basé sur ses séances terminées"""
+    theory, practical = completed_hours_by_student([student.pk]).get(
+        student.pk, (Decimal('0'), Decimal('0'))
+    )
+    if (student.theory_hours_completed != theory
+            or student.practical_hours_completed != practical):
+        student.theory_hours_completed = theory
+        student.practical_hours_completed = practical
+        student.save(update_fields=['theory_hours_completed', 'practical_hours_completed'])
+    return theory, practical
+
+
+ZERO_HOURS = (Decimal('0'), Decimal('0'))
+
+
+def session_hours(state):
+    """
+    Heures (code, conduite) comptabilisées pour une séance, à partir de son
+    `Schedule.hours_state()`. Même arrondi à la demi-heure que le recalcul complet.
+    """
+    _student_id, session_type, status, start_time, end_time = state
+    if (status != 'completed' or session_type not in ('theory', 'practical')
+            or not (start_time and end_time)):
+        return ZERO_HOURS
+    minutes = (end_time.hour * 60 + end_time.minute) - (start_time.hour * 60 + start_time.minute)
+    hours = Decimal(round(minutes / 30)) / 2
+    if session_type == 'theory':
+        return (hours, Decimal('0'))
+    return (Decimal('0'), hours)
+
+
+def add_student_hours(student_id, theory, practical):
+    """Incrémente atomiquement les compteurs d'heures d'un candidat"""
+    if not student_id or not (theory or practical):
+        return
+    Student.objects.filter(pk=student_id).update(
+        theory_hours_completed=F('theory_hours_completed') + theory,
+        practical_hours_completed=F('practical_hours_completed') + practical,
+    )
+
+
+def apply_schedule_transition(previous_state, current_state):
+    """
+    Répercute le passage d'une séance de `previous_state` à `current_state`
+    (None pour une création ou une suppression) sur les compteurs du candidat.
+    """
+    old_theory, old_practical = session_hours(previous_state) if previous_state else ZERO_HOURS
+    new_theory, new_practical = session_hours(current_state) if current_state else ZERO_HOURS
+    old_student_id = previous_state[0] if previous_state else None
+    new_student_id = current_state[0] if current_state else None
+
+    if old_student_id == new_student_id:
+        add_student_hours(new_student_id, new_theory - old_theory, new_practical - old_practical)
+    else:
+        add_student_hours(old_student_id, -old_theory, -old_practical)
+        add_student_hours(new_student_id, new_theory, new_practical)
@@ -1,58 +1,111 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Sum
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils import timezone
 from students.models import Student
-from schedules.models import Schedule
+from students.hours import HOURS_CHUNK_SIZE, iter_student_id_chunks, recalculate_hours_chunk
 
 
 class Command(BaseCommand):
     help = 'Recalcule les heures de formation de tous les candidats basé sur leurs séances terminées'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--school',
+            type=int,
+            help='Limiter le recalcul à une auto-école (ID)',
+        )
+        parser.add_argument(
+            '--since',
+            help='Limiter aux candidats dont une séance a changé depuis cette date (AAAA-MM-JJ)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Nombre de lots traités en parallèle',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Vérifier les compteurs incrémentaux sans rien modifier',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=HOURS_CHUNK_SIZE,
+            help='Nombre de candidats par lot',
+        )
+
     def handle(self, *args, **options):
         students = Student.objects.all()
-        updated_count = 0
-        
-        for student in students:
-            # Calculer les heures de code terminées
-            theory_schedules = Schedule.objects.filter(
-                student=student,
-                session_type='theory',
-                status='completed'
-            )
-            
-            theory_hours = 0
-            for schedule in theory_schedules:
-                duration_hours = round(schedule.duration_minutes / 60 * 2) / 2
-                theory_hours += duration_hours
-            
-            # Calculer les heures de conduite terminées
-            practical_schedules = Schedule.objects.filter(
-                student=student,
-                session_type='practical',
-                status='completed'
-            )
-            
-            practical_hours = 0
-            for schedule in practical_schedules:
-                duration_hours = round(schedule.duration_minutes / 60 * 2) / 2
-                practical_hours += duration_hours
-            
-            # Mettre à jour le candidat
-            old_theory = student.theory_hours_completed
-            old_practical = student.practical_hours_completed
-            
-            student.theory_hours_completed = theory_hours
-            student.practical_hours_completed = practical_hours
-            student.save()
-            
-            if old_theory != theory_hours or old_practical != practical_hours:
-                updated_count += 1
-                self.stdout.write(
-                    f"✅ {student.full_name}: Code {old_theory}h → {theory_hours}h, "
-                    f"Conduite {old_practical}h → {practical_hours}h"
+
+        if options['school']:
+            students = students.filter(driving_school_id=options['school'])
+
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since doit être au format AAAA-MM-JJ')
+            students = students.filter(
+                schedules__updated_at__gte=timezone.make_aware(since)
+            ).distinct()
+
+        self.dry_run = options['check']
+        workers = max(1, options['workers'])
+        chunks = iter_student_id_chunks(students, options['chunk_size'])
+
+        if workers == 1:
+            results = map(self._process_chunk, chunks)
+            updated_count = self._report(results)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(self._run_chunk, chunks)
+                updated_count = self._report(results)
+
+        if self.dry_run:
+            if updated_count:
+                raise CommandError(
+                    f'{updated_count} candidat(s) avec des heures incohérentes. '
+                    f'Relancez sans --check pour les corriger.'
                 )
-        
+            self.stdout.write(self.style.SUCCESS('✅ Heures cohérentes pour tous les candidats.'))
+            return
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'✅ Recalcul terminé ! {updated_count} candidat(s) mis à jour.'
             )
         )
+
+    def _process_chunk(self, student_ids):
+        return recalculate_hours_chunk(student_ids, dry_run=self.dry_run)
+
+    def _run_chunk(self, student_ids):
+        """Traite un lot dans un thread avec sa propre connexion à la base"""
+        close_old_connections()
+        try:
+            return self._process_chunk(student_ids)
+        finally:
+            connections.close_all()
+
+    def _report(self, results):
+        updated_count = 0
+        for changed in results:
+            for student in changed:
+                old_theory, old_practical = student.previous_hours
+                if self.dry_run:
+                    self.stdout.write(
+                        f"⚠️ {student.full_name}: Code {old_theory}h (attendu {student.theory_hours_completed}h), "
+                        f"Conduite {old_practical}h (attendu {student.practical_hours_completed}h)"
+                    )
+                    continue
+                self.stdout.write(
+                    f"✅ {student.full_name}: Code {old_theory}h → {student.theory_hours_completed}h, "
+                    f"Conduite {old_practical}h → {student.practical_hours_completed}h"
+                )
+            updated_count += len(changed)
+        return updated_count
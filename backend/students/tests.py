@@ -1,3 +1,193 @@
+from datetime import date, time
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from driving_schools.tests import create_school, create_student
+from exams.models import Exam
+from schedules.models import Schedule
+
+from .hours import completed_hours_by_student, recalculate_hours_chunk, recalculate_student_hours
+from .models import Student
+
+
+def create_session(student, session_type, start, end, status='completed'):
+    return Schedule.objects.create(
+        driving_school=student.driving_school, student=student,
+        session_type=session_type, date=date(2026, 1, 5),
+        start_time=start, end_time=end, status=status,
+    )
+
+
+class RecalculateHoursTests(TestCase):
+    """Recalcul des heures par lots avec agrégation SQL des durées"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.students = [create_student(cls.school, index) for index in range(3)]
+
+    def test_durations_rounded_to_half_hour(self):
+        student = self.students[0]
+        # 45 min → 1.0h, 75 min → 1.0h (arrondi au pair), 90 min → 1.5h
+        create_session(student, 'theory', time(8, 0), time(8, 45))
+        create_session(student, 'theory', time(9, 0), time(10, 15))
+        create_session(student, 'practical', time(10, 30), time(12, 0))
+        # Non terminées ou hors code/conduite : ignorées
+        create_session(student, 'practical', time(13, 0), time(14, 0), status='scheduled')
+        create_session(student, 'exam_theory', time(15, 0), time(16, 0))
+
+        hours = completed_hours_by_student([student.pk])
+
+        self.assertEqual(hours[student.pk], (Decimal('2'), Decimal('1.5')))
+
+    def test_chunk_uses_constant_queries_and_updates_changed_rows_only(self):
+        for student in self.students:
+            create_session(student, 'practical', time(8, 0), time(9, 0))
+        # Simuler des compteurs désynchronisés sauf pour le premier candidat
+        Student.objects.exclude(pk=self.students[0].pk).update(practical_hours_completed=0)
+
+        ids = [student.pk for student in self.students]
+        # Lecture des candidats, agrégat groupé, bulk_update
+        with self.assertNumQueries(3):
+            changed = recalculate_hours_chunk(ids)
+
+        self.assertEqual(
+            sorted(student.pk for student in changed), ids[1:]
+        )
+        self.assertEqual(changed[0].previous_hours, (Decimal('0'), Decimal('0')))
+        self.assertEqual(
+            set(Student.objects.values_list('practical_hours_completed', flat=True)),
+            {Decimal('1')}
+        )
+
+    def test_single_student_recalculation(self):
+        student = self.students[0]
+        create_session(student, 'theory', time(8, 0), time(9, 30))
+
+        self.assertEqual(recalculate_student_hours(student), (Decimal('1.5'), Decimal('0')))
+        student.refresh_from_db()
+        self.assertEqual(student.theory_hours_completed, Decimal('1.5'))
+
+    def test_command_filters_by_school(self):
+        other_school = create_school('other')
+        other_student = create_student(other_school, 10)
+        create_session(self.students[0], 'theory', time(8, 0), time(9, 0))
+        create_session(other_student, 'theory', time(8, 0), time(9, 0))
+        Student.objects.update(theory_hours_completed=0)
+
+        out = StringIO()
+        call_command(
+            'recalculate_hours', school=self.school.pk, chunk_size=2, stdout=out
+        )
+
+        self.assertIn('1 candidat(s) mis à jour', out.getvalue())
+        other_student.refresh_from_db()
+        self.assertEqual(other_student.theory_hours_completed, Decimal('0'))
+
+
+class IncrementalHoursTests(TestCase):
+    """Compteurs d'heures maintenus par différence sur les transitions de séance"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = create_school('owner')
+        cls.student = create_student(cls.school, 0)
+
+    def assertHours(self, theory, practical):
+        self.student.refresh_from_db()
+        self.assertEqual(
+            (self.student.theory_hours_completed, self.student.practical_hours_completed),
+            (Decimal(theory), Decimal(practical))
+        )
+
+    def test_status_and_time_transitions(self):
+        session = create_session(self.student, 'practical', time(8, 0), time(9, 0), status='scheduled')
+        self.assertHours('0', '0')
+
+        session.status = 'completed'
+        session.save()
+        self.assertHours('0', '1')
+
+        session = Schedule.objects.get(pk=session.pk)
+        session.end_time = time(9, 30)
+        session.save()
+        self.assertHours('0', '1.5')
+
+        session.session_type = 'theory'
+        session.save()
+        self.assertHours('1.5', '0')
+
+        session.status = 'cancelled'
+        session.save()
+        self.assertHours('0', '0')
+
+    def test_delete_and_student_change(self):
+        other = create_student(self.school, 1)
+        session = create_session(self.student, 'theory', time(8, 0), time(9, 0))
+        self.assertHours('1', '0')
+
+        session.student = other
+        session.save()
+        self.assertHours('0', '0')
+        other.refresh_from_db()
+        self.assertEqual(other.theory_hours_completed, Decimal('1'))
+
+        Schedule.objects.get(pk=session.pk).delete()
+        other.refresh_from_db()
+        self.assertEqual(other.theory_hours_completed, Decimal('0'))
+
+    def test_status_view_does_not_reread_history(self):
+        for hour in range(8, 18):
+            create_session(self.student, 'theory', time(hour, 0), time(hour, 45))
+        session = create_session(self.student, 'practical', time(18, 0), time(19, 0), status='scheduled')
+
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        url = reverse('schedules:update_status', args=[session.pk])
+        with self.assertNumQueries(5):
+            response = client.post(url, {'status': 'completed'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertHours('10', '1')
+
+    def test_stale_student_saves_keep_hours(self):
+        stale = Student.objects.get(pk=self.student.pk)
+        create_session(self.student, 'practical', time(8, 0), time(9, 0))
+
+        # Instance chargée avant la séance : seuls les champs modifiés sont écrits
+        Exam.objects.create(
+            driving_school=self.school, student=stale, exam_type='theory',
+            exam_date=timezone.now(),
+        )
+        self.assertHours('0', '1')
+        self.assertEqual(self.student.theory_exam_attempts, 1)
+
+        Student.objects.filter(pk=self.student.pk).update(payment_type='hourly')
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.school.owner_id))
+        response = client.post(
+            reverse('students:add_payment', args=[self.student.pk]), {'amount': '20'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertHours('0', '1')
+        self.assertEqual(self.student.paid_amount, Decimal('20'))
+
+    def test_consistency_check(self):
+        create_session(self.student, 'theory', time(8, 0), time(9, 0))
+        out = StringIO()
+        call_command('recalculate_hours', check=True, stdout=out)
+        self.assertIn('Heures cohérentes', out.getvalue())
 
-# Create your tests here.
+        Student.objects.update(theory_hours_completed=5)
+        with self.assertRaises(CommandError):
+            call_command('recalculate_hours', check=True, stdout=StringIO())
+        # --check ne corrige rien
+        self.assertHours('5', '0')
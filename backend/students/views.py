@@ -20,6 +20,10 @@ from .serializers import (
 )
 from payments.models import PaymentLog
 from notifications.utils import notify_new_student_registration
+from driving_schools.cache import cached_school_stats
+from driving_schools.timeline import EXAM_DURATION, build_timeline, exam_items, full_name, schedule_items, vehicle_label
+from exams.models import Exam
+from schedules.models import Schedule
 
 
 class StudentListCreateView(generics.ListCreateAPIView):
@@ -147,28 +151,8 @@ class StudentProgressView(generics.RetrieveUpdateAPIView):
         return Student.objects.none()
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def student_stats_view(request, pk):
-    """Vue pour les statistiques d'un candidat"""
-    user = request.user
-
-    try:
-        if hasattr(user, 'driving_school'):
-            student = user.driving_school.students.get(pk=pk)
-        elif user.user_type == 'student' and hasattr(user, 'student'):
-            if user.student.id != pk:
-                return Response({'error': _('Accès non autorisé')},
-                               status=status.HTTP_403_FORBIDDEN)
-            student = user.student
-        else:
-            return Response({'error': _('Candidat non trouvé')},
-                           status=status.HTTP_404_NOT_FOUND)
-    except Student.DoesNotExist:
-        return Response({'error': _('Candidat non trouvé')},
-                       status=status.HTTP_404_NOT_FOUND)
-
-    # Calculer les statistiques
+def _compute_student_stats(student):
+    """Calcule les statistiques d'un candidat"""
     total_payments = student.payments.filter(status='paid').aggregate(
         total=Sum('amount'))['total'] or 0
 
@@ -186,7 +170,7 @@ def student_stats_view(request, pk):
         status='completed'
     ).order_by('-date').first()
 
-    stats = {
+    return {
         'total_theory_hours': 30,  # Valeur par défaut, peut être configurée
         'total_practical_hours': 20,  # Valeur par défaut, peut être configurée
         'completed_theory_hours': student.theory_hours_completed,
@@ -199,6 +183,33 @@ def student_stats_view(request, pk):
         'last_lesson_date': last_lesson.date if last_lesson else None,
     }
 
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def student_stats_view(request, pk):
+    """Vue pour les statistiques d'un candidat"""
+    user = request.user
+
+    try:
+        if hasattr(user, 'driving_school'):
+            student = user.driving_school.students.get(pk=pk)
+        elif user.user_type == 'student' and hasattr(user, 'student'):
+            if user.student.id != pk:
+                return Response({'error': _('Accès non autorisé')},
+                               status=status.HTTP_403_FORBIDDEN)
+            student = user.student
+        else:
+            return Response({'error': _('Candidat non trouvé')},
+                           status=status.HTTP_404_NOT_FOUND)
+    except Student.DoesNotExist:
+        return Response({'error': _('Candidat non trouvé')},
+                       status=status.HTTP_404_NOT_FOUND)
+
+    stats = cached_school_stats(
+        student.driving_school_id, f'student:{student.pk}',
+        lambda: _compute_student_stats(student)
+    )
+
     serializer = StudentStatsSerializer(stats)
     return Response(serializer.data)
 
@@ -355,6 +366,21 @@ def student_sessions_view(request, pk):
         return Response({'error': 'Candidat non trouvé'}, status=status.HTTP_404_NOT_FOUND)
 
 
+# Couleur selon le statut pour les séances de formation
+SCHEDULE_STATUS_COLORS = {
+    'scheduled': '#3498db',  # Bleu
+    'completed': '#2ecc71',  # Vert
+    'cancelled': '#e74c3c',  # Rouge
+    'no_show': '#95a5a6'     # Gris
+}
+
+# Couleur unique pour tous les examens (orange)
+EXAM_COLOR = '#f39c12'
+
+SESSION_TYPE_LABELS = dict(Schedule.SESSION_TYPES)
+EXAM_TYPE_LABELS = dict(Exam.EXAM_TYPES)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def student_schedule_with_exams_view(request, student_id):
@@ -395,78 +421,62 @@ def student_schedule_with_exams_view(request, student_id):
     except ValueError:
         return Response({'error': _('Format de date invalide')}, status=status.HTTP_400_BAD_REQUEST)
 
-    events = []
-
-    # 1. Récupérer les séances de formation
-    schedules = student.schedules.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    )
-
-    for schedule in schedules:
-        start_datetime = datetime.combine(schedule.date, schedule.start_time)
-        end_datetime = datetime.combine(schedule.date, schedule.end_time)
-
-        # Couleur selon le statut pour les séances de formation
-        status_colors = {
-            'scheduled': '#3498db',  # Bleu
-            'completed': '#2ecc71',  # Vert
-            'cancelled': '#e74c3c',  # Rouge
-            'no_show': '#95a5a6'     # Gris
-        }
-
-        events.append({
-            'id': f"schedule_{schedule.id}",
-            'title': f"{schedule.get_session_type_display()} - {schedule.instructor.full_name if schedule.instructor else 'Sans moniteur'}",
-            'start': start_datetime.isoformat(),
-            'end': end_datetime.isoformat(),
-            'backgroundColor': status_colors.get(schedule.status, '#95a5a6'),
-            'borderColor': status_colors.get(schedule.status, '#95a5a6'),
-            'textColor': '#FFFFFF',
-            'extendedProps': {
-                'type': 'schedule',
-                'session_type': schedule.session_type,
-                'student_name': schedule.student.full_name,
-                'instructor_name': schedule.instructor.full_name if schedule.instructor else None,
-                'vehicle': str(schedule.vehicle) if schedule.vehicle else None,
-                'status': schedule.status,
-                'notes': schedule.notes,
-            }
-        })
-
-    # 2. Récupérer les examens
-    exams = student.exams.filter(
-        exam_date__date__gte=start_date,
-        exam_date__date__lte=end_date
+    # Séances de formation et examens fusionnés par ordre chronologique
+    timeline = build_timeline(
+        schedule_items(student.schedules.filter(
+            date__gte=start_date,
+            date__lte=end_date
+        )),
+        exam_items(student.exams.filter(
+            exam_date__date__gte=start_date,
+            exam_date__date__lte=end_date
+        )),
     )
 
-    for exam in exams:
-        # Couleur unique pour tous les examens (orange)
-        exam_color = '#f39c12'
-
-        # Durée estimée de l'examen (2h par défaut)
-        from datetime import timedelta
-        end_datetime = exam.exam_date + timedelta(hours=2)
-
-        events.append({
-            'id': f"exam_{exam.id}",
-            'title': f"EXAMEN - {exam.get_exam_type_display()}",
-            'start': exam.exam_date.isoformat(),
-            'end': end_datetime.isoformat(),
-            'backgroundColor': exam_color,
-            'borderColor': exam_color,
-            'textColor': '#FFFFFF',
-            'extendedProps': {
-                'type': 'exam',
-                'exam_type': exam.exam_type,
-                'student_name': exam.student.full_name,
-                'instructor_name': exam.instructor.full_name if exam.instructor else None,
-                'result': exam.result,
-                'score': str(exam.score) if exam.score else None,
-                'attempt_number': exam.attempt_number,
-                'exam_location': exam.exam_location,
-            }
-        })
+    events = []
+    for item in timeline:
+        row = item['data']
+        if item['type'] == 'schedule':
+            color = SCHEDULE_STATUS_COLORS.get(row['status'], '#95a5a6')
+            instructor_name = full_name(row, 'instructor')
+            events.append({
+                'id': f"schedule_{row['id']}",
+                'title': f"{SESSION_TYPE_LABELS.get(row['session_type'], row['session_type'])} - {instructor_name or 'Sans moniteur'}",
+                'start': item['start'].isoformat(),
+                'end': item['end'].isoformat(),
+                'backgroundColor': color,
+                'borderColor': color,
+                'textColor': '#FFFFFF',
+                'extendedProps': {
+                    'type': 'schedule',
+                    'session_type': row['session_type'],
+                    'student_name': full_name(row, 'student'),
+                    'instructor_name': instructor_name,
+                    'vehicle': vehicle_label(row),
+                    'status': row['status'],
+                    'notes': row['notes'],
+                }
+            })
+        else:
+            events.append({
+                'id': f"exam_{row['id']}",
+                'title': f"EXAMEN - {EXAM_TYPE_LABELS.get(row['exam_type'], row['exam_type'])}",
+                'start': row['exam_date'].isoformat(),
+                'end': (row['exam_date'] + EXAM_DURATION).isoformat(),
+                'backgroundColor': EXAM_COLOR,
+                'borderColor': EXAM_COLOR,
+                'textColor': '#FFFFFF',
+                'extendedProps': {
+                    'type': 'exam',
+                    'exam_type': row['exam_type'],
+                    'student_name': full_name(row, 'student'),
+                    'instructor_name': full_name(row, 'instructor'),
+                    'result': row['result'],
+                    'score': str(row['score']) if row['score'] else None,
+                    'attempt_number': row['attempt_number'],
+                    'exam_location': row['exam_location'],
+                }
+            })
 
     return Response(events)
 
@@ -511,7 +521,9 @@ def setup_student_pricing(request, pk):
         return Response({'error': _('Type de paiement invalide')},
                        status=status.HTTP_400_BAD_REQUEST)
 
-    student.save()
+    # Champs de tarification uniquement : ne pas réécrire les compteurs d'heures,
+    # incrémentés en base par les séances
+    student.save(update_fields=['payment_type', 'total_amount', 'total_sessions', 'updated_at'])
 
     serializer = StudentSerializer(student)
     return Response({
@@ -554,7 +566,7 @@ def add_payment(request, pk):
         student.paid_amount += Decimal(str(amount))
         if sessions_count > 0:
             student.paid_sessions += int(sessions_count)
-        student.save()
+        student.save(update_fields=['paid_amount', 'paid_sessions', 'updated_at'])
 
         # Créer l'entrée dans l'historique
         PaymentLog.objects.create(
@@ -69,24 +69,51 @@ const ChatBubble: React.FC<ChatBubbleProps> = ({
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [sending, setSending] = useState(false);
+  // Curseur de la page plus ancienne (null : début de la conversation atteint)
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const messagesContainerRef = useRef<HTMLDivElement>(null);
+  // Hauteur défilable avant l'ajout de messages plus anciens, pour garder la position
+  const previousScrollHeightRef = useRef<number | null>(null);
 
-  // Charger les messages avec ce contact
+  // Charger les messages avec ce contact (page la plus récente)
   const loadMessages = async () => {
     try {
       setLoading(true);
-      // Pour l'instant, on simule - il faudra créer un endpoint pour les messages directs
-      const data = await messagingService.getDirectMessages(contact.id);
-      setMessages(data);
+      const data = await messagingService.getDirectMessagesPage(contact.id);
+      setMessages(data.results);
+      setOlderCursor(data.before);
     } catch (error: any) {
       console.error('Erreur lors du chargement des messages:', error);
       // En cas d'erreur, on initialise avec un tableau vide
       setMessages([]);
+      setOlderCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  // Charger la page de messages précédant le plus ancien message affiché
+  const loadOlderMessages = async () => {
+    if (!olderCursor || loadingOlder) return;
+
+    try {
+      setLoadingOlder(true);
+      const data = await messagingService.getDirectMessagesPage(contact.id, { before: olderCursor });
+      previousScrollHeightRef.current = messagesContainerRef.current?.scrollHeight ?? null;
+      setMessages(prev => {
+        const known = new Set(prev.map(m => m.id));
+        return [...data.results.filter((m: Message) => !known.has(m.id)), ...prev];
+      });
+      setOlderCursor(data.before);
+    } catch (error: any) {
+      console.error('Erreur lors du chargement des messages précédents:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   // Envoyer un message
   const handleSendMessage = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -211,6 +238,13 @@ const ChatBubble: React.FC<ChatBubbleProps> = ({
   };
 
   useEffect(() => {
+    const container = messagesContainerRef.current;
+    if (previousScrollHeightRef.current !== null && container) {
+      // Messages plus anciens ajoutés en haut : rester sur le même message
+      container.scrollTop += container.scrollHeight - previousScrollHeightRef.current;
+      previousScrollHeightRef.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -312,7 +346,19 @@ const ChatBubble: React.FC<ChatBubbleProps> = ({
             style={{ height: '280px' }}
           >
             {/* Messages */}
-            <div className="flex-1 p-3 space-y-3 overflow-y-auto min-h-0" style={{ minHeight: '120px' }}>
+            <div ref={messagesContainerRef} className="flex-1 p-3 space-y-3 overflow-y-auto min-h-0" style={{ minHeight: '120px' }}>
+              {!loading && olderCursor && (
+                <div className="text-center">
+                  <button
+                    type="button"
+                    onClick={loadOlderMessages}
+                    disabled={loadingOlder}
+                    className="text-xs text-blue-500 hover:text-blue-600 disabled:opacity-50 disabled:cursor-not-allowed"
+                  >
+                    {loadingOlder ? 'Chargement...' : 'Charger les messages précédents'}
+                  </button>
+                </div>
+              )}
               {loading ? (
                 <div className="text-center py-4">
                   <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-blue-500 mx-auto"></div>
@@ -48,6 +48,7 @@ interface SystemStats {
   system_uptime: string;
   database_size: string;
   storage_used: string;
+  computed_at?: string;
 }
 
 interface DrivingSchool {
@@ -149,10 +150,11 @@ class AdminService {
   }
 
   // Statistiques
-  async getDashboardStats(): Promise<SystemStats> {
+  async getDashboardStats(fresh = false): Promise<SystemStats> {
     try {
       const response = await axios.get(`${API_URL}/dashboard/stats/`, {
-        headers: this.getAuthHeaders()
+        headers: this.getAuthHeaders(),
+        params: fresh ? { fresh: 1 } : undefined
       });
       return response.data;
     } catch (error: any) {
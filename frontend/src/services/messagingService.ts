@@ -1,6 +1,7 @@
 import axios from 'axios';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+const PARTICIPANTS_PAGE_SIZE = 500;
 
 // Fonction pour s'assurer que le token d'authentification est présent
 const ensureAuthToken = () => {
@@ -56,6 +57,9 @@ export interface CreateMessageData {
 }
 
 class MessagingService {
+  // Dernier annuaire reçu et son ETag
+  private participantsCache: { etag: string; participants: Participant[] } | null = null;
+
   // Conversations
   async getConversations(): Promise<{ results: Conversation[]; count: number }> {
     try {
@@ -153,22 +157,55 @@ class MessagingService {
     }
   }
 
+  // Page de l'annuaire des participants (recherche côté serveur)
+  async getParticipantsPage(params: { search?: string; page?: number; page_size?: number } = {}) {
+    try {
+      ensureAuthToken();
+      const response = await axios.get(`${API_URL}/messaging/participants/`, { params });
+      return response.data;
+    } catch (error: any) {
+      throw new Error(error.response?.data?.error || 'Erreur lors de la récupération des participants');
+    }
+  }
+
   // Obtenir les participants disponibles (membres de l'auto-école)
+  // L'annuaire n'est retéléchargé que si son ETag a changé
   async getAvailableParticipants(): Promise<Participant[]> {
     try {
       ensureAuthToken();
-      const response = await axios.get(`${API_URL}/messaging/participants/`);
-      return response.data;
+      const headers = this.participantsCache ? { 'If-None-Match': this.participantsCache.etag } : {};
+      const response = await axios.get(`${API_URL}/messaging/participants/`, {
+        params: { page_size: PARTICIPANTS_PAGE_SIZE },
+        headers,
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+      });
+      if (response.status === 304 && this.participantsCache) {
+        return this.participantsCache.participants;
+      }
+
+      const participants: Participant[] = [...response.data.results];
+      let page = 1;
+      let next = response.data.next;
+      while (next) {
+        page += 1;
+        const data = await this.getParticipantsPage({ page, page_size: PARTICIPANTS_PAGE_SIZE });
+        participants.push(...data.results);
+        next = data.next;
+      }
+
+      this.participantsCache = { etag: response.headers['etag'], participants };
+      return participants;
     } catch (error: any) {
       throw new Error(error.response?.data?.error || 'Erreur lors de la récupération des participants');
     }
   }
 
   // Messages directs (pour le système Messenger)
-  async getDirectMessages(contactId: number) {
+  // Page la plus récente par défaut ; `before` / `after` : curseurs renvoyés par l'API
+  async getDirectMessagesPage(contactId: number, params: { before?: string; after?: string; limit?: number } = {}) {
     try {
       ensureAuthToken();
-      const response = await axios.get(`${API_URL}/messaging/direct/${contactId}/`);
+      const response = await axios.get(`${API_URL}/messaging/direct/${contactId}/`, { params });
       return response.data;
     } catch (error: any) {
       console.error('❌ API Error:', error.response?.status, error.response?.data);
@@ -209,6 +246,18 @@ class MessagingService {
     }
   }
 
+  // Boîte de réception : dernier message et non lus par contact / conversation
+  async getInbox() {
+    try {
+      ensureAuthToken();
+      const response = await axios.get(`${API_URL}/messaging/inbox/`);
+      return response.data;
+    } catch (error: any) {
+      console.error('❌ API Error:', error.response?.status, error.response?.data);
+      throw new Error('Erreur lors de la récupération de la boîte de réception');
+    }
+  }
+
   // Récupérer tous les compteurs de messages non lus en une seule requête
   async getAllUnreadCounts(): Promise<Record<number, number>> {
     try {